@@ -0,0 +1,164 @@
+# benchmarks/fake_llm.py
+
+import asyncio
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from src.utils.unified_output import FILE_SEPARATOR, UNIFIED_STAGES
+
+FAKE_MODEL_NAME = 'fake-llm'
+
+# Repeated to build responses of the requested size
+RESPONSE_LINES = [
+    "const express = require('express');",
+    "const router = express.Router();",
+    "",
+    "// Handles the request and returns the result",
+    "async function handler(req, res, next) {",
+    "  try {",
+    "    const result = await service.run(req.body);",
+    "    res.status(200).json(result);",
+    "  } catch (error) {",
+    "    next(error);",
+    "  }",
+    "}",
+    "",
+    "module.exports = router;",
+]
+
+
+def fake_response(chars):
+    """JavaScript-looking text of exactly `chars` characters."""
+    text = '\n'.join(RESPONSE_LINES) + '\n'
+    return (text * (chars // len(text) + 1))[:chars]
+
+
+def fake_unified_response(chars):
+    """A unified generation response: one `chars`-sized file per stage, separated like the prompt asks."""
+    return f"\n{FILE_SEPARATOR}\n".join(f"// {stage} file\n{fake_response(chars)}" for stage in UNIFIED_STAGES)
+
+
+def fake_contract_response(contract, stage, chars):
+    """A `stage` file that follows `contract`, padded to about `chars` characters."""
+    route, controller, service = contract['route'], contract['controller'], contract['service']
+    handler = route['controller']['handler']
+    function = controller['service']['function']
+    header = {
+        'route': f"const controller = require('{route['controller']['require']}');\n"
+                 f"router.{route['method'].lower()}('{route['path']}', controller.{handler});\n",
+        'controller': f"const service = require('{controller['service']['require']}');\n"
+                      f"const {handler} = async (req, res, next) => res.json(await service.{function}(req.body));\n"
+                      f"module.exports = {{ {handler} }};\n",
+        'service': f"const {function} = async (inputs) => inputs;\nmodule.exports = {{ {function} }};\n",
+    }[stage]
+    return header + fake_response(max(0, chars - len(header)))
+
+CONTRACT_PROMPT = re.compile(r'Interface contract:\n(\{.*?\n\})', re.DOTALL)
+CONTRACT_STAGE = re.compile(r'Generate the (route|controller|service) file')
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for ChatOpenAI. Every call waits `latency` seconds and
+    returns `output_chars` characters (per file for unified prompts), with
+    OpenAI-style token usage, so the pipeline can be measured without
+    network calls or API costs. Streamed calls send the first chunk after
+    `time_to_first_token` seconds and spread the rest of the latency over
+    the remaining chunks.
+    """
+
+    model_name: str = FAKE_MODEL_NAME
+    latency: float = 0.0
+    time_to_first_token: Optional[float] = None
+    output_chars: int = 2000
+    chunk_chars: int = 64
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'fake-chat-model'
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {'model_name': self.model_name, 'output_chars': self.output_chars}
+
+    @staticmethod
+    def _count_tokens(text):
+        # Roughly four characters per token, like OpenAI's tokenizers on code
+        return max(1, len(text) // 4)
+
+    def _usage(self, messages, content):
+        prompt_tokens = self._count_tokens(''.join(str(message.content) for message in messages))
+        completion_tokens = self._count_tokens(content)
+        return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens}
+
+    def _content(self, messages):
+        prompt = '\n'.join(str(message.content) for message in messages)
+        # Answer a unified prompt with every file it asks for
+        if FILE_SEPARATOR in prompt:
+            return fake_unified_response(self.output_chars)
+        # and a contract prompt with a file that follows the contract
+        contract, stage = CONTRACT_PROMPT.search(prompt), CONTRACT_STAGE.search(prompt)
+        if contract and stage:
+            return fake_contract_response(json.loads(contract.group(1)), stage.group(1), self.output_chars)
+        return fake_response(self.output_chars)
+
+    def _result(self, messages):
+        self.calls += 1
+        content = self._content(messages)
+        usage = self._usage(messages, content)
+        message = AIMessage(
+            content=content,
+            response_metadata={'token_usage': usage, 'model_name': self.model_name},
+            usage_metadata={'input_tokens': usage['prompt_tokens'], 'output_tokens': usage['completion_tokens'],
+                            'total_tokens': usage['total_tokens']},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, messages):
+        self.calls += 1
+        content = self._content(messages)
+        parts = [content[i:i + self.chunk_chars] for i in range(0, len(content), self.chunk_chars)] or ['']
+        first = self.latency if self.time_to_first_token is None else min(self.time_to_first_token, self.latency)
+        delays = [first] + [(self.latency - first) / max(1, len(parts) - 1)] * (len(parts) - 1)
+        usage = self._usage(messages, content)
+        for i, (part, delay) in enumerate(zip(parts, delays)):
+            usage_metadata = None
+            if i == len(parts) - 1:
+                usage_metadata = {'input_tokens': usage['prompt_tokens'], 'output_tokens': usage['completion_tokens'],
+                                  'total_tokens': usage['total_tokens']}
+            yield delay, ChatGenerationChunk(message=AIMessageChunk(content=part, usage_metadata=usage_metadata))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for delay, chunk in self._chunks(messages):
+            time.sleep(delay)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for delay, chunk in self._chunks(messages):
+            await asyncio.sleep(delay)
+            yield chunk
+
+
+def install_fake_llms(agent, latency=0.0, output_chars=2000, time_to_first_token=None):
+    """Replace the agent's OpenAI models with fake ones; returns the fake models."""
+    models: List[FakeChatModel] = [
+        FakeChatModel(model_name=f"{FAKE_MODEL_NAME}-{role}", latency=latency, output_chars=output_chars,
+                      time_to_first_token=time_to_first_token)
+        for role in ('generation', 'other', 'strong')
+    ]
+    agent.llm_generation, agent.llm_other_tasks, agent.llm_strong = models
+    return models
@@ -0,0 +1,296 @@
+# benchmarks/run.py
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fake_llm import install_fake_llms
+from benchmarks.spec_generator import write_specs, PROJECT_ROOT
+
+RESULTS_VERSION = 1
+DEFAULT_RESULTS_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', 'results')
+
+# Metrics compared against a baseline, and whether a higher value is better
+COMPARED_METRICS = {
+    'specs_per_minute': True,
+    'wall_seconds': False,
+    'spec_load_seconds': False,
+    'prompt_build_seconds': False,
+    'peak_rss_mb': False,
+    'prompt_tokens': False,
+    'completion_tokens': False,
+}
+COMPARED_STAGE_METRICS = ('p50', 'p95')
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of `values`; None when there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def latency_summary(values):
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else None,
+        'p50': percentile(values, 0.5),
+        'p95': percentile(values, 0.95),
+    }
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure_prompt_build(agent, route_specs):
+    """
+    Time building every stage's prompt (inputs, token budget fitting and
+    rendering) without calling a model. Upstream stages are filled with the
+    fake model's output size so later prompts are realistically large.
+    """
+    from benchmarks.fake_llm import fake_response
+
+    timings = {stage: [] for stage in agent.stage_inputs}
+    upstream_content = fake_response(agent.llm_generation.output_chars)
+    for route_spec in route_specs:
+        upstream = {}
+        for stage in agent.stage_inputs:
+            started = time.perf_counter()
+            prepared = agent._prepare_stage(stage, route_spec, upstream)
+            content = upstream_content
+            if prepared['prompt'] is not None:
+                inputs, _ = agent._fit_token_budget(agent.call_stage(stage), prepared['prompt'], prepared['llm'],
+                                                    prepared['inputs'])
+                prepared['prompt'].invoke(inputs)
+            else:
+                # Local stages are built outright
+                content = agent.generate_local_stage(stage, route_spec, prepared)
+            timings[stage].append(time.perf_counter() - started)
+            upstream[stage] = {'content': content, 'file_name': prepared['file_name']}
+    return timings
+
+
+def run_benchmark(num_specs=20, latency=0.2, output_chars=2000, time_to_first_token=None, stream=False,
+                  max_concurrent_specs=4, max_concurrent_llm_calls=8, prompt_layout='legacy', seed=0,
+                  generation_mode='staged', model_routing=False, simple_fraction=0.0):
+    """
+    Generate `num_specs` synthetic specs and run them through main.py's
+    pipeline with fake models, in a scratch directory holding a copy of the
+    project data. Returns the benchmark result as a JSON-serialisable dict.
+    """
+    from src.ai_agent import AIAgent
+    from src.main import run_pipeline
+    from src.utils.rate_limiter import RateLimitScheduler
+    from src.utils.route_parser import load_route_specs
+
+    config = {
+        'specs': num_specs, 'latency': latency, 'output_chars': output_chars,
+        'time_to_first_token': time_to_first_token, 'stream': stream,
+        'max_concurrent_specs': max_concurrent_specs, 'max_concurrent_llm_calls': max_concurrent_llm_calls,
+        'prompt_layout': prompt_layout, 'seed': seed, 'generation_mode': generation_mode,
+        'model_routing': model_routing, 'simple_fraction': simple_fraction,
+    }
+    workdir = tempfile.mkdtemp(prefix='ai_agent_bench_')
+    previous_cwd = os.getcwd()
+    agent = None
+    try:
+        shutil.copytree(os.path.join(PROJECT_ROOT, 'data'), os.path.join(workdir, 'data'))
+        os.chdir(workdir)
+        write_specs('specs', num_specs, seed=seed, simple_fraction=simple_fraction)
+
+        started = time.perf_counter()
+        route_specs, errors = load_route_specs('specs', cache_path=None)
+        spec_load_seconds = time.perf_counter() - started
+        if errors:
+            raise ValueError(f"Synthetic specs failed validation: {errors[0]}")
+
+        agent = AIAgent(max_concurrent_llm_calls=max_concurrent_llm_calls, use_cache=False,
+                        prompt_layout=prompt_layout, stream_output=stream, generation_mode=generation_mode,
+                        model_routing=model_routing)
+        models = install_fake_llms(agent, latency, output_chars, time_to_first_token)
+        # Keep the provider's rate limits out of the measurement
+        agent.scheduler = RateLimitScheduler(limits={
+            model.model_name: {'rpm': 10 ** 9, 'tpm': 10 ** 12} for model in models
+        })
+
+        # The first spec also loads the project data and the tokenizer
+        measure_prompt_build(agent, route_specs[:1])
+        prompt_timings = measure_prompt_build(agent, route_specs)
+
+        agent.tracer.enabled = True
+        agent.tracer.reset()
+        started = time.perf_counter()
+        results = asyncio.run(run_pipeline(agent, route_specs, max_concurrent_specs, force=True))
+        wall_seconds = time.perf_counter() - started
+
+        tier_timings = {}
+        for result in results:
+            if result.get('tier'):
+                tier_timings.setdefault(result['tier'], []).append(result['duration'])
+        stage_timings = {}
+        for span in agent.tracer.spans:
+            if span.category == 'stage' and span.args.get('rebuilt'):
+                stage_timings.setdefault(span.name, []).append(span.duration)
+    finally:
+        if agent is not None:
+            # Queued writes use paths relative to the workdir
+            agent.output_sink.flush()
+            agent.output_sink.close()
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'version': RESULTS_VERSION,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': config,
+        'metrics': {
+            'specs': len(results),
+            'failed_specs': sum(1 for result in results if result['status'] != 'ok'),
+            'llm_calls': sum(model.calls for model in models),
+            'prompt_tokens': sum(usage['prompt_tokens'] for usage in agent.llm_usage.values()),
+            'completion_tokens': sum(usage['completion_tokens'] for usage in agent.llm_usage.values()),
+            'wall_seconds': wall_seconds,
+            'specs_per_minute': len(results) / wall_seconds * 60 if wall_seconds else None,
+            'spec_load_seconds': spec_load_seconds,
+            'prompt_build_seconds': sum(sum(values) for values in prompt_timings.values()),
+            'prompt_build': {stage: latency_summary(values) for stage, values in prompt_timings.items()},
+            'stage_latency': {stage: latency_summary(values) for stage, values in stage_timings.items()},
+            'tier_latency': {tier: latency_summary(values) for tier, values in tier_timings.items()},
+            'peak_rss_mb': peak_rss_mb(),
+        },
+    }
+
+
+def compare_results(current, baseline, threshold=0.1):
+    """
+    Compare two benchmark results. Returns (name, baseline, current, change)
+    for every metric that got worse by more than `threshold` (a fraction).
+    """
+    def flatten(result):
+        metrics = result['metrics']
+        values = {name: (metrics.get(name), higher_is_better) for name, higher_is_better in COMPARED_METRICS.items()}
+        for group in ('stage_latency', 'prompt_build'):
+            for stage, summary in metrics.get(group, {}).items():
+                for name in COMPARED_STAGE_METRICS:
+                    values[f"{group}.{stage}.{name}"] = (summary.get(name), False)
+        return values
+
+    regressions = []
+    old_values = flatten(baseline)
+    for name, (value, higher_is_better) in flatten(current).items():
+        old = old_values.get(name, (None, None))[0]
+        if not value or not old:
+            continue
+        change = (value - old) / old
+        if (-change if higher_is_better else change) > threshold:
+            regressions.append((name, old, value, change))
+    return regressions
+
+
+def save_results(result, path=None):
+    if path is None:
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        path = os.path.join(DEFAULT_RESULTS_DIR, f"{stamp}-{result['git_commit'] or 'unknown'}.json")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+    return path
+
+
+def print_results(result):
+    metrics = result['metrics']
+    print(f"{metrics['specs']} specs ({metrics['failed_specs']} failed), {metrics['llm_calls']} LLM calls "
+          f"in {metrics['wall_seconds']:.2f}s: {metrics['specs_per_minute']:.1f} specs/minute")
+    print(f"Tokens: {metrics['prompt_tokens']} prompt, {metrics['completion_tokens']} completion")
+    print(f"Spec loading: {metrics['spec_load_seconds'] * 1000:.1f} ms, "
+          f"prompt building: {metrics['prompt_build_seconds'] * 1000:.1f} ms, "
+          f"peak RSS: {metrics['peak_rss_mb'] or 0:.1f} MB")
+    for group, label in (('stage_latency', "Stage latency"), ('prompt_build', "Prompt build"),
+                         ('tier_latency', "Spec latency of tier")):
+        for stage, summary in metrics.get(group, {}).items():
+            if summary['count']:
+                print(f"{label} {stage}: p50 {summary['p50'] * 1000:.1f} ms, p95 {summary['p95'] * 1000:.1f} ms "
+                      f"over {summary['count']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the generation pipeline offline with fake models.")
+    parser.add_argument('-n', '--specs', type=int, default=20, help="Number of synthetic specs")
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds each fake LLM call takes")
+    parser.add_argument('--time-to-first-token', type=float, default=None,
+                        help="Seconds before the first streamed chunk (default: the whole latency)")
+    parser.add_argument('--output-chars', type=int, default=2000, help="Characters in each fake response")
+    parser.add_argument('--stream', action='store_true', help="Stream responses into the generated files")
+    parser.add_argument('--max-concurrent-specs', type=int, default=4)
+    parser.add_argument('--max-concurrent-llm-calls', type=int, default=8)
+    parser.add_argument('--prompt-layout', default='legacy')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--generation-mode', default='staged',
+                        help="'unified' generates route, controller and service with one call per spec")
+    parser.add_argument('--model-routing', action='store_true',
+                        help="Route specs to code templates, the fast or the strong model by complexity")
+    parser.add_argument('--simple-fraction', type=float, default=0.0,
+                        help="Fraction of the synthetic specs that are plain single-table CRUD")
+    parser.add_argument('--output', help=f"Result file (default: a timestamped file in {DEFAULT_RESULTS_DIR})")
+    parser.add_argument('--baseline', help="Earlier result file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="Relative change counted as a regression when comparing (default 0.1)")
+    args = parser.parse_args(argv)
+
+    # Per-call logging would dominate the measurement; errors still show
+    logging.disable(logging.WARNING)
+    result = run_benchmark(args.specs, args.latency, args.output_chars, args.time_to_first_token, args.stream,
+                           args.max_concurrent_specs, args.max_concurrent_llm_calls, args.prompt_layout, args.seed,
+                           args.generation_mode, args.model_routing, args.simple_fraction)
+    logging.disable(logging.NOTSET)
+    print_results(result)
+    print(f"Results written to {save_results(result, args.output)}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('config') != result['config']:
+            print(f"Warning: {args.baseline} was run with different settings: {baseline.get('config')}")
+        regressions = compare_results(result, baseline, args.threshold)
+        for name, old, value, change in regressions:
+            print(f"Regression in {name}: {old:.4g} -> {value:.4g} ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# benchmarks/spec_generator.py
+
+import argparse
+import json
+import os
+import random
+import yaml
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ACTIONS = [
+    ('POST', 'create', "Create a new {resource} record"),
+    ('GET', 'list', "List {resource} records with pagination"),
+    ('GET', 'details', "Get the details of one {resource} record"),
+    ('PUT', 'update', "Update an existing {resource} record"),
+    ('PATCH', 'archive', "Archive a {resource} record"),
+    ('DELETE', 'delete', "Delete a {resource} record"),
+]
+
+STEPS = [
+    ("Validate input", "Ensure all required fields are present and valid"),
+    ("Check permissions", "Verify that the user has the role required for this action"),
+    ("Load {resource}", "Fetch the {resource} record and return 404 if it does not exist"),
+    ("Check for duplicates", "Ensure no other {resource} record has the same unique fields"),
+    ("Write {resource}", "Insert or update the {resource} entry in the database"),
+    ("Update related records", "Keep the records that reference {resource} consistent"),
+    ("Log the action", "Record the change in the audit log"),
+    ("Send notification", "Optionally notify the affected users by email"),
+]
+
+# The steps of plain CRUD specs: validation and the read or write itself
+CRUD_STEPS = [STEPS[0], STEPS[2], STEPS[4]]
+
+INPUT_TYPES = ['string', 'integer', 'boolean', 'array', 'object']
+
+
+def _load_json(path, default):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _camel_case(*words):
+    parts = [part for word in words for part in word.replace('-', '_').split('_') if part]
+    return parts[0].lower() + ''.join(part.capitalize() for part in parts[1:])
+
+
+def generate_specs(count, seed=0, data_dir=None, simple_fraction=0.0):
+    """
+    Build `count` route specs shaped like data/route_specs.yaml. Tables,
+    middleware and utils are taken from the project data so prompts carry
+    realistic schema slices. The same seed always gives the same specs.
+    About `simple_fraction` of them are plain CRUD on one table, with few
+    steps and inputs and the record id in the path.
+    """
+    data_dir = data_dir or os.path.join(PROJECT_ROOT, 'data')
+    tables = sorted(_load_json(os.path.join(data_dir, 'db_schema.json'), {}).get('tables', {})) or ['users']
+    middleware_utils = _load_json(os.path.join(data_dir, 'middleware_utils.json'), {})
+    middleware = [f"{item['name']}.js" for item in middleware_utils.get('middleware', [])] or ['validateInputs.js']
+    utils = [item['name'] for item in middleware_utils.get('utils', [])] or ['logger']
+
+    rng = random.Random(seed)
+    # Drawn separately so the other specs stay the same whatever the fraction
+    simple_rng = random.Random(f"{seed}-simple")
+    specs = []
+    for i in range(count):
+        resource = tables[i % len(tables)]
+        method, action, description = ACTIONS[(i // len(tables)) % len(ACTIONS)]
+        name = _camel_case(resource, action, str(i))
+        if simple_fraction and simple_rng.random() < simple_fraction:
+            specs.append(_simple_spec(rng, i, resource, method, action, description, name, middleware))
+            continue
+        steps = rng.sample(STEPS, rng.randint(3, 7))
+        specs.append({
+            'route_details': {
+                'path': f"/app/{resource.replace('_', '-')}/{action}-{i}",
+                'method': method,
+                'description': description.format(resource=resource),
+            },
+            'file_names': {
+                'route': f"{name}Route.js",
+                'controller': f"{name}Controller.js",
+                'service': f"{name}Service.js",
+            },
+            'required_tables': [resource] + rng.sample(tables, min(len(tables), rng.randint(0, 2))),
+            'logical_steps': [
+                {'step': step.format(resource=resource), 'description': text.format(resource=resource)}
+                for step, text in steps
+            ],
+            'input': [
+                {'name': f"field_{n}", 'type': rng.choice(INPUT_TYPES), 'description': f"Input field {n} of {resource}"}
+                for n in range(rng.randint(1, 5))
+            ],
+            'required_middleware': rng.sample(middleware, rng.randint(1, len(middleware))),
+            'required_utils': rng.sample(utils, rng.randint(1, len(utils))),
+        })
+    return specs
+
+
+def _simple_spec(rng, i, resource, method, action, description, name, middleware):
+    path = f"/app/{resource.replace('_', '-')}/{action}-{i}"
+    if action in ('details', 'update', 'archive', 'delete'):
+        path += '/:id'
+    return {
+        'route_details': {'path': path, 'method': method, 'description': description.format(resource=resource)},
+        'file_names': {
+            'route': f"{name}Route.js",
+            'controller': f"{name}Controller.js",
+            'service': f"{name}Service.js",
+        },
+        'required_tables': [resource],
+        'logical_steps': [
+            {'step': step.format(resource=resource), 'description': text.format(resource=resource)}
+            for step, text in rng.sample(CRUD_STEPS, rng.randint(1, 2))
+        ],
+        'input': [
+            {'name': f"field_{n}", 'type': rng.choice(INPUT_TYPES), 'description': f"Input field {n} of {resource}"}
+            for n in range(rng.randint(1, 2))
+        ],
+        'required_middleware': rng.sample(middleware, 1),
+        'required_utils': [],
+    }
+
+
+def write_specs(directory, count, specs_per_file=25, seed=0, data_dir=None, simple_fraction=0.0):
+    """Write `count` synthetic specs as YAML files in `directory`; returns the file paths."""
+    specs = generate_specs(count, seed, data_dir, simple_fraction)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for start in range(0, len(specs), specs_per_file):
+        path = os.path.join(directory, f"specs_{start // specs_per_file:04d}.yaml")
+        with open(path, 'w') as f:
+            yaml.safe_dump(specs[start:start + specs_per_file], f, sort_keys=False)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic route specs for benchmarks.")
+    parser.add_argument('output', help="Directory to write the YAML spec files to")
+    parser.add_argument('-n', '--count', type=int, default=100, help="Number of specs")
+    parser.add_argument('--specs-per-file', type=int, default=25, help="Specs per YAML file")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    args = parser.parse_args(argv)
+
+    paths = write_specs(args.output, args.count, args.specs_per_file, args.seed)
+    print(f"Wrote {args.count} specs to {len(paths)} files in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
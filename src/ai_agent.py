@@ -1,53 +1,258 @@
+import asyncio
 import json
 import os
 import logging
-from openai import OpenAI
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnableSequence
+import time
+import uuid
 from dotenv import load_dotenv
 from src.utils.prompt_utils import (
     get_route_generation_chat_prompt, 
-    get_swagger_docs_prompt, 
     get_controller_generation_chat_prompt, 
     get_service_generation_chat_prompt,
-    get_test_suite_generation_prompt
+    get_test_suite_generation_prompt,
+    get_route_generation_prefix_prompt,
+    get_controller_generation_prefix_prompt,
+    get_service_generation_prefix_prompt,
+    get_test_suite_generation_prefix_prompt,
+    get_openapi_prose_prompt,
+    get_unified_generation_prompt,
+    get_contract_generation_prompt,
+    PROMPT_LAYOUTS,
+    GENERATION_MODES
 )
-from src.utils.route_parser import parse_and_validate_route_specs
-from src.utils.code_reviewer import review_code, suggest_improvements
-from src.utils.template_manager import get_template
+from src.utils.stage_graph import Stage, StageGraph
+from src.utils.llm_cache import LLMCache, DEFAULT_CACHE_PATH
+from src.utils.schema_slicer import SchemaIndex
+from src.utils.example_index import ExampleIndex, spec_query, DEFAULT_TOP_K
+from src.utils.openapi_generator import (
+    OpenAPIGenerator,
+    OpenAPIDocument,
+    DEFAULT_DOCUMENT_PATH,
+    GENERATOR_VERSION,
+    operation_id,
+    parse_prose
+)
+from src.utils.unified_output import SectionParser, UNIFIED_STAGES
+from src.utils.contract import build_contract, check_consistency, ContractMismatch, CONTRACT_VERSION
+from src.utils.model_router import ModelRouter
+from src.utils.code_templates import render_file, TEMPLATE_VERSION
+from src.utils.rate_limiter import RateLimitScheduler, STAGE_PRIORITIES, DEFAULT_PRIORITY, limit_concurrency
+from src.utils.token_budget import TokenBudget, DEFAULT_STAGE_BUDGETS
+from src.utils.build_manifest import BuildManifest, DEFAULT_MANIFEST_PATH, hash_content, spec_key
+from src.utils.tracing import get_tracer, traced, log_payload
+from src.utils.output_sink import get_output_sink
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Upstream stages each pipeline stage consumes, in pipeline order
+STAGE_INPUTS = {
+    'route': [],
+    'controller': ['route'],
+    'service': ['route', 'controller'],
+    # Built from the spec itself, not from the generated route file
+    'swagger': [],
+    'test': ['route', 'controller', 'service'],
+}
+
+# Stage inputs of generation mode 'contract': route, controller and service
+# are built from the interface contract instead of from each other
+CONTRACT_STAGE_INPUTS = {
+    'contract': [],
+    'route': ['contract'],
+    'controller': ['contract'],
+    'service': ['contract'],
+    'swagger': [],
+    'test': ['route', 'controller', 'service'],
+}
+
+# Completion tokens assumed per call when the model has no max_tokens set
+DEFAULT_COMPLETION_ESTIMATE = 2000
+
+# Attributes loaded on first access, and the method that sets them. Clients
+# and data files are only needed once a stage is planned or generated, so
+# commands that never get that far don't pay for them.
+LAZY_ATTRIBUTES = {
+    'client': '_create_client',
+    'llm_generation': '_create_llms',
+    'llm_other_tasks': '_create_llms',
+    'llm_strong': '_create_strong_llm',
+    'project_info': '_load_project_info',
+    'project_info_json': '_load_project_info',
+    'db_schema': '_load_db_schema',
+    'schema_index': '_load_db_schema',
+    'middleware_utils': '_load_middleware',
+    'example_files': '_load_example_files',
+    'example_index': '_load_example_index',
+    'example_swagger': '_load_example_swagger',
+    'openapi_generator': '_load_openapi',
+    'openapi_document': '_load_openapi',
+    'project_structure': '_load_project_structure',
+    'project_structure_json': '_load_project_structure',
+}
+
+# Data files (or directories) each loader reads, so a watcher can reload
+# only the attributes a changed file feeds
+DATA_FILES = {
+    '_load_project_info': ['data/project_info.json'],
+    '_load_db_schema': ['data/db_schema.json'],
+    '_load_middleware': ['data/middleware_utils.json'],
+    '_load_example_files': ['data/example_files'],
+    '_load_example_index': ['data/example_files'],
+    '_load_example_swagger': ['data/example_files/example_swagger.js'],
+    '_load_openapi': ['data/db_schema.json', 'data/project_info.json'],
+    '_load_project_structure': ['data/project_structure.json'],
+}
+
+DEFAULT_FILE_NAMES = {
+    'route': 'generatedRoute.js',
+    'controller': 'generatedController.js',
+    'service': 'generatedService.js',
+}
+
 class AIAgent:
-    def __init__(self):
+    # Stages generated locally rather than by the generation models
+    local_stages = ('swagger', 'contract')
+
+    def __init__(self, max_concurrent_llm_calls=None, use_cache=None, prompt_layout=None, stream_output=None,
+                 openapi_prose=None, generation_mode=None, model_routing=None):
         load_dotenv()
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.llm_generation = ChatOpenAI(
-            model="gpt-4o-mini",
-            openai_api_key=os.getenv("OPENAI_API_KEY")
+        if model_routing is None:
+            model_routing = os.getenv("MODEL_ROUTING", "").lower() in ("1", "true", "yes")
+        # Route each spec to code templates, the fast model or the strong model by its complexity
+        self.model_router = ModelRouter.from_env() if model_routing else None
+        self.generation_mode = generation_mode or os.getenv("GENERATION_MODE", "staged")
+        if self.generation_mode not in GENERATION_MODES:
+            raise ValueError(f"Unknown generation mode: {self.generation_mode}")
+        if openapi_prose is None:
+            openapi_prose = os.getenv("OPENAPI_PROSE", "").lower() in ("1", "true", "yes")
+        # Have the LLM write the summaries and descriptions of the OpenAPI operations
+        self.openapi_prose = openapi_prose
+        if stream_output is None:
+            stream_output = os.getenv("STREAM_OUTPUT", "").lower() in ("1", "true", "yes")
+        self.stream_output = stream_output
+        self.stream_metrics = []
+        self.prompt_layout = prompt_layout or os.getenv("PROMPT_LAYOUT", "legacy")
+        if self.prompt_layout not in PROMPT_LAYOUTS:
+            raise ValueError(f"Unknown prompt layout: {self.prompt_layout}")
+        self.llm_usage = {}
+        self.max_concurrent_llm_calls = max_concurrent_llm_calls or int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "8"))
+        self._llm_semaphore = None
+
+        if use_cache is None:
+            use_cache = os.getenv("LLM_CACHE_BYPASS", "").lower() not in ("1", "true", "yes")
+        self.llm_cache = LLMCache(
+            path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+            max_bytes=int(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024,
+            enabled=use_cache
         )
-        self.llm_other_tasks = ChatOpenAI(
-            model="gpt-3.5-turbo",
-            openai_api_key=os.getenv("OPENAI_API_KEY")
+        self.manifest = BuildManifest(os.getenv("BUILD_MANIFEST_PATH", DEFAULT_MANIFEST_PATH))
+        self.schema_fk_hops = int(os.getenv("SCHEMA_FK_HOPS", "1"))
+        # Also follow the foreign keys pointing at the spec's tables
+        self.schema_fk_incoming = os.getenv("SCHEMA_FK_INCOMING", "").lower() in ("1", "true", "yes")
+        # Example snippets per prompt; 0 sends the whole example files
+        self.example_top_k = int(os.getenv("EXAMPLE_TOP_K", str(DEFAULT_TOP_K)))
+        self.token_budget = TokenBudget(budgets={
+            stage: int(os.environ[f"TOKEN_BUDGET_{stage.upper()}"])
+            for stage in DEFAULT_STAGE_BUDGETS if os.getenv(f"TOKEN_BUDGET_{stage.upper()}")
+        })
+        self._prompt_overhead = {}
+        self.tracer = get_tracer()
+        self.output_sink = get_output_sink()
+        # Retries are left to the scheduler so they respect the shared rate limits
+        self.scheduler = RateLimitScheduler(limits=json.loads(os.getenv("RATE_LIMITS", "{}")))
+
+    def __getattr__(self, name):
+        # Only called for attributes that haven't been set yet
+        loader = LAZY_ATTRIBUTES.get(name)
+        if loader is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        getattr(self, loader)()
+        return self.__dict__[name]
+
+    def reload_data(self, changed_paths):
+        """
+        Forget the attributes loaded from any of `changed_paths`, so they are
+        loaded again on next use. Returns the names of the forgotten attributes.
+        """
+        changed = [os.path.normpath(path) for path in changed_paths]
+        loaders = {
+            loader for loader, sources in DATA_FILES.items()
+            for source in map(os.path.normpath, sources)
+            if any(path == source or path.startswith(source + os.sep) for path in changed)
+        }
+        if '_load_openapi' in loaders:
+            # Merges still queued for the combined document must land before it is read back
+            self.output_sink.flush()
+        forgotten = [name for name, loader in LAZY_ATTRIBUTES.items() if loader in loaders and name in self.__dict__]
+        for name in forgotten:
+            del self.__dict__[name]
+        return forgotten
+
+    @property
+    def stage_inputs(self):
+        """Upstream stages each pipeline stage consumes in this agent's generation mode."""
+        return CONTRACT_STAGE_INPUTS if self.generation_mode == 'contract' else STAGE_INPUTS
+
+    def _create_client(self):
+        from openai import OpenAI
+
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    def _chat_model(self, model):
+        from langchain_openai import ChatOpenAI
+
+        http_client, http_async_client = self._rate_limited_http_clients(model)
+        return ChatOpenAI(
+            model=model,
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            stream_usage=True,
+            max_retries=0,
+            http_client=http_client,
+            http_async_client=http_async_client
         )
 
-        self.project_info = {}
-        self.db_schema = {}
-        self.example_files = {}
-        self.middleware_utils = {}
+    def _create_llms(self):
+        self.llm_generation = self._chat_model("gpt-4o-mini")
+        self.llm_other_tasks = self._chat_model("gpt-3.5-turbo")
+
+    def _create_strong_llm(self):
+        # Only created once model routing sends a spec to the strong tier
+        self.llm_strong = self._chat_model(os.getenv("MODEL_STRONG", "gpt-4o"))
 
+    def _load_project_info(self):
         self.load_project_info('data/project_info.json')
+
+    def _load_db_schema(self):
         self.load_db_schema('data/db_schema.json')
+
+    def _load_middleware(self):
         self.load_middleware('data/middleware_utils.json')
+
+    def _load_example_files(self):
+        self.example_files = {}
         self.load_example_files(
             'data/example_files/example_route.js',
             'data/example_files/example_controller.js',
             'data/example_files/example_service.js',
             'data/example_files/example_test.js'
         )
+
+    def _load_example_index(self):
+        self.example_index = ExampleIndex.from_directory('data/example_files', ['route', 'controller', 'service', 'test'])
+
+    def _load_openapi(self):
+        self.openapi_generator = OpenAPIGenerator(self.db_schema)
+        self.openapi_document = OpenAPIDocument(
+            os.getenv("OPENAPI_DOCUMENT_PATH", DEFAULT_DOCUMENT_PATH),
+            info={'title': self.project_info.get('project_name', 'API'), 'version': '1.0.0',
+                  'description': self.project_info.get('description', '')}
+        )
+
+    def _load_example_swagger(self):
         self.load_example_swagger('data/example_files/example_swagger.js')
+
+    def _load_project_structure(self):
         self.load_project_structure('data/project_structure.json')
 
     def load_project_structure(self, file_path):
@@ -58,6 +263,8 @@ class AIAgent:
         except Exception as e:
             logger.error(f"Error loading project structure: {str(e)}")
             self.project_structure = {}
+        # Serialized once so every prompt gets byte-identical static context
+        self.project_structure_json = json.dumps(self.project_structure, indent=2, sort_keys=True)
 
     def load_project_info(self, file_path):
         try:
@@ -67,6 +274,7 @@ class AIAgent:
         except Exception as e:
             logger.error(f"Error loading project info: {str(e)}")
             self.project_info = {}
+        self.project_info_json = json.dumps(self.project_info, indent=2, sort_keys=True)
 
     def load_db_schema(self, file_path):
         try:
@@ -76,6 +284,8 @@ class AIAgent:
         except Exception as e:
             logger.error(f"Error loading DB schema: {str(e)}")
             self.db_schema = {}
+        self.schema_index = SchemaIndex(self.db_schema, fk_hops=self.schema_fk_hops,
+                                        follow_incoming=self.schema_fk_incoming)
 
     def load_example_files(self, route_path, controller_path, service_path, test_path):
         try:
@@ -111,137 +321,526 @@ class AIAgent:
             self.example_swagger = ""
 
     def save_generated_file(self, file_path, content):
-        try:
-            # Ensure the directory exists
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            
-            if os.path.exists(file_path):
-                logger.warning(f"Warning: File {file_path} already exists. Overwriting.")
-            
-            with open(file_path, 'w') as f:
-                f.write(content)
-            
-            logger.debug(f"File saved successfully at {file_path}")
-        except Exception as e:
-            logger.error(f"Error saving file {file_path}: {str(e)}")
-            raise
-    def generate_route_file(self, route_spec):
-        try:
-            logger.debug("Entering generate_route_file")
-            
-            if 'route_details' not in route_spec:
-                raise ValueError("Missing 'route_details' in route_spec")
+        """
+        Queue a generated file for writing on the output sink's thread. The
+        file is replaced atomically, and left alone if its content is
+        unchanged. Returns a future of whether the file was rewritten.
+        """
+        return self.output_sink.write(file_path, content)
 
-            prompt = get_route_generation_chat_prompt()
-            inputs = {
-                "route_details": json.dumps(route_spec['route_details'], indent=2),
-                "example_route": self.example_files['route'],
-                "project_info": json.dumps(self.project_info, indent=2),
-                "project_structure": json.dumps(self.project_structure, indent=2)
+    async def asave_generated_file(self, file_path, content):
+        return await self.output_sink.awrite(file_path, content)
+    def _get_llm_semaphore(self):
+        # Created on first use so it binds to the running event loop
+        if self._llm_semaphore is None:
+            self._llm_semaphore = asyncio.Semaphore(self.max_concurrent_llm_calls)
+        return self._llm_semaphore
+
+    def _cache_key(self, llm, prompt_value):
+        params = getattr(llm, '_identifying_params', {})
+        messages = [(message.type, message.content) for message in prompt_value.to_messages()]
+        return LLMCache.make_key(params, messages)
+
+    def _fit_token_budget(self, stage, prompt, llm, inputs):
+        if stage is None:
+            return inputs, sum(self.token_budget.counter.count(str(value)) for value in inputs.values())
+        if stage not in self._prompt_overhead:
+            template_only = prompt.format(**{name: '' for name in prompt.input_variables})
+            self._prompt_overhead[stage] = self.token_budget.counter.count(template_only, getattr(llm, 'model_name', None))
+        return self.token_budget.fit(stage, inputs, self._prompt_overhead[stage], getattr(llm, 'model_name', None))
+
+    def _record_usage(self, stage, result):
+        token_usage = getattr(result, 'response_metadata', {}).get('token_usage') or {}
+        if not token_usage and getattr(result, 'usage_metadata', None):
+            # Streamed responses only carry the usage on the aggregated chunk
+            token_usage = {
+                'prompt_tokens': result.usage_metadata.get('input_tokens'),
+                'completion_tokens': result.usage_metadata.get('output_tokens'),
             }
+        self._add_token_usage(stage, token_usage)
+
+    def _add_token_usage(self, stage, token_usage):
+        usage = self.llm_usage.setdefault(stage, {'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0})
+        usage['calls'] += 1
+        usage['prompt_tokens'] += token_usage.get('prompt_tokens') or 0
+        usage['completion_tokens'] += token_usage.get('completion_tokens') or 0
+        usage['cached_tokens'] += (token_usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+        span = self.tracer.current()
+        span.add('prompt_tokens', token_usage.get('prompt_tokens') or 0)
+        span.add('completion_tokens', token_usage.get('completion_tokens') or 0)
+
+    def cached_token_fraction(self, stage=None):
+        """Fraction of prompt tokens the provider served from its prompt cache."""
+        stages = [self.llm_usage[stage]] if stage else self.llm_usage.values()
+        prompt_tokens = sum(usage['prompt_tokens'] for usage in stages)
+        cached_tokens = sum(usage['cached_tokens'] for usage in stages)
+        return cached_tokens / prompt_tokens if prompt_tokens else 0.0
+
+    @staticmethod
+    def _model_name(llm):
+        return getattr(llm, 'model_name', None) or type(llm).__name__
+
+    @staticmethod
+    def _estimate_tokens(llm, prompt_tokens):
+        # Rate-limit budgets count the prompt plus the completion allowance
+        return prompt_tokens + (getattr(llm, 'max_tokens', None) or DEFAULT_COMPLETION_ESTIMATE)
+
+    def _rate_limited_http_clients(self, model):
+        """HTTP clients that feed every response's rate-limit headers to the scheduler."""
+        import httpx
+
+        def observe(response):
+            self.scheduler.observe_headers(model, response.headers)
+
+        async def aobserve(response):
+            observe(response)
+
+        return (httpx.Client(event_hooks={'response': [observe]}),
+                httpx.AsyncClient(event_hooks={'response': [aobserve]}))
+
+    @staticmethod
+    def _traced_call(span, call):
+        """Wrap an LLM call to record its queue wait and retries on `span`."""
+        queued = time.perf_counter()
+        attempts = 0
 
-            logger.debug(f"Route file inputs: {inputs}")
-            chain = RunnableSequence(prompt | self.llm_generation)
-            result = chain.invoke(inputs)
+        def run():
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                span.set(queue_wait_seconds=time.perf_counter() - queued)
+            span.set(retries=attempts - 1)
+            return call()
+        return run
 
+    def _invoke_chain(self, prompt, llm, inputs, stage=None):
+        with self.tracer.span('llm', 'llm', stage=stage, model=self._model_name(llm)) as span:
+            inputs, prompt_tokens = self._fit_token_budget(stage, prompt, llm, inputs)
+            prompt_value = prompt.invoke(inputs)
+            key = self._cache_key(llm, prompt_value)
+            cached = self.llm_cache.get(key)
+            if cached is not None:
+                logger.debug(f"LLM cache hit for {key[:12]}")
+                span.set(cache_hit=1)
+                return cached
+
+            result = self.scheduler.run_sync(
+                self._model_name(llm), self._estimate_tokens(llm, prompt_tokens),
+                self._traced_call(span, lambda: llm.invoke(prompt_value)), STAGE_PRIORITIES.get(stage, DEFAULT_PRIORITY))
+            self._record_usage(stage, result)
+            generated = result.content if hasattr(result, 'content') else result
+            self.llm_cache.set(key, generated, getattr(llm, 'model_name', None))
+            return generated
+
+    async def _ainvoke_chain(self, prompt, llm, inputs, stage=None, parser=None):
+        """
+        Run one LLM call. With a `parser` (see SectionParser) the response is
+        streamed and fed to it as it arrives.
+        """
+        with self.tracer.span('llm', 'llm', stage=stage, model=self._model_name(llm)) as span:
+            inputs, prompt_tokens = self._fit_token_budget(stage, prompt, llm, inputs)
+            prompt_value = await prompt.ainvoke(inputs)
+            key = self._cache_key(llm, prompt_value)
+            cached = self.llm_cache.get(key)
+            if cached is not None:
+                logger.debug(f"LLM cache hit for {key[:12]}")
+                span.set(cache_hit=1)
+                if parser is not None:
+                    parser.reset()
+                    parser.feed(cached)
+                    parser.finish()
+                return cached
+
+            if parser is None:
+                call = self._traced_call(span, lambda: llm.ainvoke(prompt_value))
+            else:
+                async def stream_into_parser():
+                    # Start over if a retry follows a failed attempt
+                    parser.reset()
+                    message = None
+                    async for chunk in llm.astream(prompt_value):
+                        message = chunk if message is None else message + chunk
+                        if chunk.content:
+                            parser.feed(chunk.content)
+                    parser.finish()
+                    return message
+                call = self._traced_call(span, stream_into_parser)
+            result = await self.scheduler.run(
+                self._model_name(llm), self._estimate_tokens(llm, prompt_tokens),
+                limit_concurrency(self._get_llm_semaphore(), call), STAGE_PRIORITIES.get(stage, DEFAULT_PRIORITY))
+            if result is None:
+                raise RuntimeError(f"Generated {stage} output is empty")
+            self._record_usage(stage, result)
+            generated = result.content if hasattr(result, 'content') else result
+            self.llm_cache.set(key, generated, getattr(llm, 'model_name', None))
+            return generated
+
+    async def _astream_chain_to_file(self, prompt, llm, inputs, stage, file_path, stream=None):
+        """
+        Stream the response straight into a temp file next to `file_path` and
+        rename it into place once complete, recording time-to-first-token and
+        throughput. Chunks are also published to `stream` for prefix consumers.
+        """
+        with self.tracer.span('llm', 'llm', stage=stage, model=self._model_name(llm), streamed=True) as span:
+            inputs, prompt_tokens = self._fit_token_budget(stage, prompt, llm, inputs)
+            prompt_value = await prompt.ainvoke(inputs)
+            key = self._cache_key(llm, prompt_value)
+            cached = self.llm_cache.get(key)
+            if cached is not None:
+                logger.debug(f"LLM cache hit for {key[:12]}")
+                span.set(cache_hit=1)
+                if stream is not None:
+                    await stream.append(cached)
+                await self.asave_generated_file(file_path, cached)
+                return cached
+
+            directory = os.path.dirname(file_path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = os.path.join(directory, f".{os.path.basename(file_path)}.{uuid.uuid4().hex}.partial")
+            parts = []
+            message = None
+            first_token_at = None
+            started = None
+            try:
+                with open(tmp_path, 'w') as f:
+                    async def consume_stream():
+                        nonlocal message, first_token_at, started
+                        # Start over if a retry follows a failed attempt
+                        f.seek(0)
+                        f.truncate()
+                        parts.clear()
+                        message = first_token_at = None
+                        started = time.perf_counter()
+                        async for chunk in llm.astream(prompt_value):
+                            message = chunk if message is None else message + chunk
+                            if not chunk.content:
+                                continue
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                            f.write(chunk.content)
+                            f.flush()
+                            parts.append(chunk.content)
+                            if stream is not None:
+                                await stream.append(chunk.content)
+
+                    call = self._traced_call(span, consume_stream)
+                    await self.scheduler.run(
+                        self._model_name(llm), self._estimate_tokens(llm, prompt_tokens),
+                        limit_concurrency(self._get_llm_semaphore(), call), STAGE_PRIORITIES.get(stage, DEFAULT_PRIORITY))
+                finished = time.perf_counter()
+                if not parts:
+                    raise RuntimeError(f"Generated {stage} file is empty")
+                generated = ''.join(parts)
+                written = self.output_sink.replace(tmp_path, file_path, generated)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            span.set(time_to_first_token=first_token_at - started)
+            if written:
+                span.set(bytes_written=len(generated.encode('utf-8')))
+            self._record_usage(stage, message)
+            usage = getattr(message, 'usage_metadata', None) or {}
+            tokens = usage.get('output_tokens') or self.token_budget.counter.count(generated, getattr(llm, 'model_name', None))
+            generation_time = finished - first_token_at
+            self.stream_metrics.append({
+                'stage': stage,
+                'file': file_path,
+                'time_to_first_token': first_token_at - started,
+                'duration': finished - started,
+                'tokens': tokens,
+                'tokens_per_second': tokens / generation_time if generation_time > 0 else None,
+            })
+            logger.debug(f"Streamed {stage} to {file_path}: first token after {first_token_at - started:.2f}s, {tokens} tokens")
+
+            self.llm_cache.set(key, generated, getattr(llm, 'model_name', None))
+            return generated
+
+    def _route_inputs(self, route_spec):
+        if 'route_details' not in route_spec:
+            raise ValueError("Missing 'route_details' in route_spec")
+
+        return {
+            "route_details": json.dumps(route_spec['route_details'], indent=2),
+            "example_route": self._example('route', spec_query(route_spec)),
+            "project_info": self.project_info_json,
+            "project_structure": self.project_structure_json
+        }
+
+    def _controller_inputs(self, route_file, route_spec):
+        return {
+            "route_file": route_file,
+            "example_controller": self._example('controller', spec_query(route_spec)),
+            "project_info": self.project_info_json,
+            "project_structure": self.project_structure_json,
+            "route_path": route_spec['route_details']['path']
+        }
+
+    def _service_inputs(self, route_file, controller_file, route_spec):
+        return {
+            "route_file": route_file,
+            "controller_file": controller_file,
+            "example_service": self._example('service', spec_query(route_spec)),
+            "project_info": self.project_info_json,
+            "db_schema": self.schema_index.slice_json(route_spec.get('required_tables')),
+            "project_structure": self.project_structure_json
+        }
+
+    def _contract_inputs(self, stage, route_spec, contract):
+        spec = {field: route_spec[field] for field in ('route_details', 'logical_steps', 'input') if field in route_spec}
+        inputs = {
+            "route_spec": json.dumps(spec, indent=2),
+            "contract": contract,
+            f"example_{stage}": self._example(stage, spec_query(route_spec)),
+            "project_info": self.project_info_json,
+            "project_structure": self.project_structure_json
+        }
+        if stage == 'service':
+            inputs["db_schema"] = self.schema_index.slice_json(route_spec.get('required_tables'))
+        return inputs
+
+    def _unified_inputs(self, route_spec):
+        if 'route_details' not in route_spec:
+            raise ValueError("Missing 'route_details' in route_spec")
+
+        query = spec_query(route_spec)
+        return {
+            "route_details": json.dumps(route_spec['route_details'], indent=2),
+            "logical_steps": json.dumps(route_spec.get('logical_steps', []), indent=2),
+            "db_schema": self.schema_index.slice_json(route_spec.get('required_tables')),
+            "middleware_utils": json.dumps(self.middleware_utils, indent=2, sort_keys=True),
+            "example_route": self._example('route', query),
+            "example_controller": self._example('controller', query),
+            "example_service": self._example('service', query)
+        }
+
+    def _example(self, stage, query):
+        """
+        The example code for a stage's prompt: the snippets of the example
+        library most relevant to `query`, or the whole example file when
+        retrieval is off. The prefix layout always sends the whole file, as
+        it has to stay identical across specs to be cached.
+        """
+        if self.prompt_layout == 'prefix' or self.example_top_k <= 0:
+            return self.example_files[stage]
+        return self.example_index.select(stage, query, self.example_top_k) or self.example_files[stage]
+
+    def _prompt(self, stage):
+        if self.prompt_layout == 'prefix':
+            return {
+                'route': get_route_generation_prefix_prompt,
+                'controller': get_controller_generation_prefix_prompt,
+                'service': get_service_generation_prefix_prompt,
+                'swagger': get_openapi_prose_prompt,
+                'test': get_test_suite_generation_prefix_prompt,
+            }[stage]()
+
+        if stage == 'swagger':
+            return get_openapi_prose_prompt()
+        return {
+            'route': get_route_generation_chat_prompt,
+            'controller': get_controller_generation_chat_prompt,
+            'service': get_service_generation_chat_prompt,
+            'test': get_test_suite_generation_prompt,
+        }[stage]()
+
+    def _test_suite_inputs(self, route_file, controller_file, service_file, example_test_file):
+        inputs = {
+            "route_file": route_file,
+            "controller_file": controller_file,
+            "service_file": service_file,
+            "example_test_file": example_test_file,
+            "project_structure": self.project_structure_json
+        }
+        if self.prompt_layout == 'prefix':
+            # The shared static prefix also carries the project info
+            inputs["project_info"] = self.project_info_json
+        return inputs
+
+    def _save_stage_output(self, stage, generated_file, route_spec, default_name):
+        log_payload(logger, f"Generated {stage} content", generated_file)
+        file_name = route_spec.get('file_names', {}).get(stage, default_name)
+        self.save_generated_file(f'generated/{file_name}', generated_file)
+        return generated_file, file_name
+
+    @traced('route')
+    def generate_route_file(self, route_spec):
+        try:
+            logger.debug("Entering generate_route_file")
+            inputs = self._route_inputs(route_spec)
+            log_payload(logger, "Route file inputs", inputs)
+            generated_file = self._invoke_chain(self._prompt('route'), self.llm_generation, inputs, stage='route')
             logger.debug("Route file generated successfully")
-            generated_file = result.content if hasattr(result, 'content') else result
-            logger.debug(f"Generated route file content: {generated_file[:500]}...") 
-            file_name = route_spec.get('file_names', {}).get('route', 'generatedRoute.js')
-            self.save_generated_file(f'generated/{file_name}', generated_file)
-            
-            return generated_file, file_name
+            return self._save_stage_output('route', generated_file, route_spec, 'generatedRoute.js')
         except Exception as e:
             logger.error(f"Error in generate_route_file: {str(e)}")
             raise
 
+    @traced('route')
+    async def agenerate_route_file(self, route_spec):
+        try:
+            logger.debug("Entering agenerate_route_file")
+            inputs = self._route_inputs(route_spec)
+            log_payload(logger, "Route file inputs", inputs)
+            generated_file = await self._ainvoke_chain(self._prompt('route'), self.llm_generation, inputs, stage='route')
+            logger.debug("Route file generated successfully")
+            return self._save_stage_output('route', generated_file, route_spec, 'generatedRoute.js')
+        except Exception as e:
+            logger.error(f"Error in agenerate_route_file: {str(e)}")
+            raise
+
+    @traced('controller')
     def generate_controller_file(self, route_file, route_spec):
         try:
             logger.debug("Entering generate_controller_file")
-            
-            prompt = get_controller_generation_chat_prompt()
-            inputs = {
-                "route_file": route_file,
-                "example_controller": self.example_files['controller'],
-                "project_info": json.dumps(self.project_info, indent=2),
-                "project_structure": json.dumps(self.project_structure, indent=2),
-                "route_path": route_spec['route_details']['path']
-            }
-
-            logger.debug(f"Controller file inputs: {inputs}")
-            chain = RunnableSequence(prompt | self.llm_generation)
+            inputs = self._controller_inputs(route_file, route_spec)
+            log_payload(logger, "Controller file inputs", inputs)
             logger.debug(f"Generating controller for route path: {route_spec['route_details']['path']}")
-            result = chain.invoke(inputs)
-
+            generated_file = self._invoke_chain(self._prompt('controller'), self.llm_generation, inputs, stage='controller')
             logger.debug("Controller file generated successfully")
-            generated_file = result.content if hasattr(result, 'content') else result
-            logger.debug(f"Generated controller content: {generated_file[:500]}...") 
-            file_name = route_spec.get('file_names', {}).get('controller', 'generatedController.js')
-            self.save_generated_file(f'generated/{file_name}', generated_file)
-            
-            return generated_file, file_name
+            return self._save_stage_output('controller', generated_file, route_spec, 'generatedController.js')
         except Exception as e:
             logger.error(f"Error in generate_controller_file: {str(e)}")
             raise
 
+    @traced('controller')
+    async def agenerate_controller_file(self, route_file, route_spec):
+        try:
+            logger.debug("Entering agenerate_controller_file")
+            inputs = self._controller_inputs(route_file, route_spec)
+            log_payload(logger, "Controller file inputs", inputs)
+            generated_file = await self._ainvoke_chain(self._prompt('controller'), self.llm_generation, inputs, stage='controller')
+            logger.debug("Controller file generated successfully")
+            return self._save_stage_output('controller', generated_file, route_spec, 'generatedController.js')
+        except Exception as e:
+            logger.error(f"Error in agenerate_controller_file: {str(e)}")
+            raise
+
+    @traced('service')
     def generate_service_file(self, route_file, controller_file, route_spec):
         try:
             logger.debug("Entering generate_service_file")
-            
-            prompt = get_service_generation_chat_prompt()
-            inputs = {
-                "route_file": route_file,
-                "controller_file": controller_file,
-                "example_service": self.example_files['service'],
-                "project_info": json.dumps(self.project_info, indent=2),
-                "db_schema": json.dumps(self.db_schema, indent=2),
-                "project_structure": json.dumps(self.project_structure, indent=2)
-            }
-
-            logger.debug(f"Service file inputs: {inputs}")
-            chain = RunnableSequence(prompt | self.llm_generation)
-            result = chain.invoke(inputs)
-
+            inputs = self._service_inputs(route_file, controller_file, route_spec)
+            log_payload(logger, "Service file inputs", inputs)
+            generated_file = self._invoke_chain(self._prompt('service'), self.llm_generation, inputs, stage='service')
             logger.debug("Service file generated successfully")
-            generated_file = result.content if hasattr(result, 'content') else result
-            logger.debug(f"Generated service content: {generated_file[:500]}...") 
-            file_name = route_spec.get('file_names', {}).get('service', 'generatedService.js')
-            self.save_generated_file(f'generated/{file_name}', generated_file)
-            
-            return generated_file, file_name
+            return self._save_stage_output('service', generated_file, route_spec, 'generatedService.js')
         except Exception as e:
             logger.error(f"Error in generate_service_file: {str(e)}")
             raise
 
+    @traced('service')
+    async def agenerate_service_file(self, route_file, controller_file, route_spec):
+        try:
+            logger.debug("Entering agenerate_service_file")
+            inputs = self._service_inputs(route_file, controller_file, route_spec)
+            log_payload(logger, "Service file inputs", inputs)
+            generated_file = await self._ainvoke_chain(self._prompt('service'), self.llm_generation, inputs, stage='service')
+            logger.debug("Service file generated successfully")
+            return self._save_stage_output('service', generated_file, route_spec, 'generatedService.js')
+        except Exception as e:
+            logger.error(f"Error in agenerate_service_file: {str(e)}")
+            raise
+
+    @traced('swagger')
     def generate_swagger_docs(self, route_file, example_swagger, route_spec):
+        # Built from the spec; route_file and example_swagger are kept for existing callers
         try:
             logger.debug("Entering generate_swagger_docs")
-            
-            template = get_template('swagger_template')
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", template),
-                ("user", "Generate the Swagger documentation based on the route provided.")
-            ])
-            chain = RunnableSequence(prompt | self.llm_other_tasks)
-
-            inputs = {
-                "route_file": route_file,
-                "example_swagger": example_swagger
-            }
-            logger.debug(f"Swagger docs inputs: {inputs}")
-            result = chain.invoke(inputs)
-
-            logger.debug("Swagger documentation generated successfully")
-            generated_file = result.content if hasattr(result, 'content') else result
-            logger.debug(f"Generated swagger content: {generated_file[:500]}...") 
-            file_name = route_spec.get('file_names', {}).get('swagger', 'swaggerDocs.json')
-            self.save_generated_file(f'generated/{file_name}', generated_file)
-
-            return generated_file, file_name
+            prepared = self._prepare_stage('swagger', route_spec, {})
+            generated_file = self.generate_openapi(route_spec, prepared)
+            self.save_generated_file(prepared['file_path'], generated_file)
+            self.merge_openapi_fragment(generated_file)
+            return generated_file, prepared['file_name']
         except Exception as e:
             logger.error(f"Error in generate_swagger_docs: {str(e)}")
             raise
 
+    @traced('swagger')
+    async def agenerate_swagger_docs(self, route_file, example_swagger, route_spec):
+        try:
+            logger.debug("Entering agenerate_swagger_docs")
+            prepared = self._prepare_stage('swagger', route_spec, {})
+            generated_file = await self.agenerate_openapi(route_spec, prepared)
+            await self.asave_generated_file(prepared['file_path'], generated_file)
+            self.merge_openapi_fragment(generated_file)
+            return generated_file, prepared['file_name']
+        except Exception as e:
+            logger.error(f"Error in agenerate_swagger_docs: {str(e)}")
+            raise
+
+    def generate_openapi(self, route_spec, prepared):
+        """
+        Output of the swagger stage: the spec's OpenAPI fragment, with prose
+        written by the LLM when openapi_prose is set.
+        """
+        prose = None
+        if prepared['llm'] is not None:
+            prose = parse_prose(self._invoke_chain(prepared['prompt'], prepared['llm'], prepared['inputs'], stage='swagger'))
+        return json.dumps(self.openapi_generator.fragment(route_spec, prose), indent=2) + '\n'
+
+    async def agenerate_openapi(self, route_spec, prepared):
+        prose = None
+        if prepared['llm'] is not None:
+            prose = parse_prose(await self._ainvoke_chain(prepared['prompt'], prepared['llm'], prepared['inputs'], stage='swagger'))
+        return json.dumps(self.openapi_generator.fragment(route_spec, prose), indent=2) + '\n'
+
+    def generate_contract(self, route_spec):
+        """Output of the contract stage: the interface the route, controller and service files share."""
+        return json.dumps(build_contract(route_spec, self.project_structure), indent=2, sort_keys=True) + '\n'
+
+    def check_contract(self, route_spec, outputs):
+        """
+        Check the route, controller and service outputs of a spec against its
+        contract, logging every mismatch. Returns (stage, problem) pairs.
+        """
+        if 'contract' not in outputs:
+            return []
+        files = {stage: outputs[stage]['content'] for stage in UNIFIED_STAGES if stage in outputs}
+        problems = check_consistency(json.loads(outputs['contract']['content']), files)
+        for stage, problem in problems:
+            logger.warning(f"Generated {stage} file of {spec_key(route_spec)} {problem}")
+        return problems
+
+    def render_template(self, stage, route_spec, upstream):
+        """Render the route, controller or service file of a template-tier spec."""
+        if 'contract' in upstream:
+            contract = json.loads(upstream['contract']['content'])
+        else:
+            contract = build_contract(route_spec, self.project_structure)
+        return render_file(stage, route_spec, contract, self.db_schema, self.project_structure)
+
+    def generate_local_stage(self, stage, route_spec, prepared):
+        """Output of a stage that is built without the generation models."""
+        if stage == 'contract':
+            return self.generate_contract(route_spec)
+        if stage in UNIFIED_STAGES:
+            return self.render_template(stage, route_spec, prepared['upstream'])
+        return self.generate_openapi(route_spec, prepared)
+
+    async def agenerate_local_stage(self, stage, route_spec, prepared):
+        if stage == 'contract':
+            return self.generate_contract(route_spec)
+        if stage in UNIFIED_STAGES:
+            return self.render_template(stage, route_spec, prepared['upstream'])
+        return await self.agenerate_openapi(route_spec, prepared)
+
+    def is_local(self, stage, prepared):
+        """Whether a prepared stage is built without an LLM call."""
+        return stage in self.local_stages or prepared['llm'] is None
+
+    def publish_local_output(self, stage, content):
+        """Add a local stage's output to the documents combined across specs."""
+        if stage == 'swagger':
+            self.merge_openapi_fragment(content)
+
+    def merge_openapi_fragment(self, content):
+        """Merge a swagger stage output into the combined OpenAPI document and queue it for writing."""
+        self.openapi_document.merge(json.loads(content))
+        # Serialized by the sink only if no later update supersedes this write
+        self.output_sink.write(self.openapi_document.path, self.openapi_document.to_json)
+
     def generate_files_sequentially(self, route_spec):
         route_file, route_file_name = self.generate_route_file(route_spec)
         controller_file, controller_file_name = self.generate_controller_file(route_file, route_spec)
@@ -255,53 +854,354 @@ class AIAgent:
             'swagger': {'content': swagger_docs, 'file_name': swagger_file_name}
         }
 
-    def generate_test_suite(self, route_file_name, controller_file_name, service_file_name):
-        logger.info(f"Starting test suite generation for {route_file_name}")
-        
-        try:
+    async def agenerate_files_sequentially(self, route_spec):
+        route_file, route_file_name = await self.agenerate_route_file(route_spec)
+        controller_file, controller_file_name = await self.agenerate_controller_file(route_file, route_spec)
+        service_file, service_file_name = await self.agenerate_service_file(route_file, controller_file, route_spec)
+        swagger_docs, swagger_file_name = await self.agenerate_swagger_docs(route_file, self.example_swagger, route_spec)
+
+        return {
+            'route': {'content': route_file, 'file_name': route_file_name},
+            'controller': {'content': controller_file, 'file_name': controller_file_name},
+            'service': {'content': service_file, 'file_name': service_file_name},
+            'swagger': {'content': swagger_docs, 'file_name': swagger_file_name}
+        }
+
+    def route_tier(self, route_spec):
+        """The model tier of a spec, or None when model routing is off."""
+        if self.model_router is None:
+            return None
+        return self.model_router.tier(route_spec)
+
+    def _generation_llm(self, route_spec):
+        if self.route_tier(route_spec) == 'strong':
+            return self.llm_strong
+        return self.llm_generation
+
+    def _stage_request(self, stage, route_spec, upstream):
+        """Return the prompt, model and prompt inputs for one pipeline stage."""
+        if stage in UNIFIED_STAGES and self.route_tier(route_spec) == 'template':
+            # Rendered from the code templates, so no prompt or model
+            inputs = {
+                "route_spec": json.dumps(route_spec, indent=2, sort_keys=True),
+                "project_structure": self.project_structure_json,
+                "db_schema": self.schema_index.slice_json(route_spec.get('required_tables')),
+                "template_version": str(TEMPLATE_VERSION)
+            }
+            return None, None, inputs
+        if stage == 'contract':
+            spec = {field: route_spec.get(field) for field in
+                    ('route_details', 'file_names', 'input', 'required_middleware', 'required_utils', 'required_tables')}
+            inputs = {
+                "route_spec": json.dumps(spec, indent=2, sort_keys=True),
+                "project_structure": self.project_structure_json,
+                "contract_version": str(CONTRACT_VERSION)
+            }
+            return None, None, inputs
+        llm = self._generation_llm(route_spec)
+        if stage in UNIFIED_STAGES and self.generation_mode == 'contract':
+            prompt = get_contract_generation_prompt(stage, self.prompt_layout)
+            return prompt, llm, self._contract_inputs(stage, route_spec, upstream['contract']['content'])
+        if stage == 'route':
+            if self.generation_mode == 'unified':
+                # The route stage asks for the controller and service files too
+                return get_unified_generation_prompt(), llm, self._unified_inputs(route_spec)
+            return self._prompt('route'), llm, self._route_inputs(route_spec)
+        if stage == 'controller':
+            inputs = self._controller_inputs(upstream['route']['content'], route_spec)
+            return self._prompt('controller'), llm, inputs
+        if stage == 'service':
+            inputs = self._service_inputs(upstream['route']['content'], upstream['controller']['content'], route_spec)
+            return self._prompt('service'), llm, inputs
+        if stage == 'swagger':
+            inputs = {
+                "route_spec": json.dumps(route_spec, indent=2, sort_keys=True),
+                "db_schema": self.schema_index.slice_json(route_spec.get('required_tables')),
+                "generator_version": str(GENERATOR_VERSION)
+            }
+            if not self.openapi_prose:
+                return None, None, inputs
+            return self._prompt('swagger'), self.llm_other_tasks, inputs
+        if stage == 'test':
+            inputs = self._read_test_suite_inputs(None, None, None, generated_files=upstream, route_spec=route_spec)
+            return self._prompt('test'), llm, inputs
+        raise ValueError(f"Unknown stage: {stage}")
+
+    def _stage_file_name(self, stage, route_spec, upstream):
+        if stage == 'test':
+            return f"test_{upstream['route']['file_name'].replace('.js', '.test.js')}", os.path.join('generated', 'tests')
+        if stage == 'contract':
+            return f"{operation_id(route_spec)}.json", os.path.join('generated', 'contracts')
+        if stage == 'swagger' and 'swagger' not in route_spec.get('file_names', {}):
+            # One OpenAPI fragment per spec, merged into the combined document
+            return f"{operation_id(route_spec)}.json", os.path.join('generated', 'openapi')
+        return route_spec.get('file_names', {}).get(stage, DEFAULT_FILE_NAMES[stage]), 'generated'
+
+    def _stage_input_hashes(self, stage, prompt, llm, inputs):
+        hashes = BuildManifest.hash_inputs(inputs)
+        hashes['__model__'] = hash_content(getattr(llm, '_identifying_params', {}))
+        hashes['__prompt__'] = hash_content(repr(prompt))
+        hashes['__budget__'] = hash_content([self.token_budget.budgets.get(stage),
+                                             self.token_budget.trimmable_slots.get(stage)])
+        return hashes
+
+    def call_stage(self, stage):
+        """The name a stage's LLM call is budgeted, prioritised and counted under."""
+        if stage == 'route' and self.generation_mode == 'unified':
+            return 'unified'
+        return stage
+
+    def _prepare_stage(self, stage, route_spec, upstream):
+        """Collect everything needed to check, run and record one stage of a spec."""
+        prompt, llm, inputs = self._stage_request(stage, route_spec, upstream)
+        file_name, directory = self._stage_file_name(stage, route_spec, upstream)
+        return {
+            'prompt': prompt,
+            'llm': llm,
+            'inputs': inputs,
+            'upstream': upstream,
+            'file_name': file_name,
+            'file_path': os.path.join(directory, file_name),
+            'key': spec_key(route_spec),
+            'input_hashes': self._stage_input_hashes(stage, prompt, llm, inputs),
+        }
+
+    def _check_stage(self, stage, prepared):
+        return self.manifest.check(prepared['key'], stage, prepared['input_hashes'], prepared['file_path'])
+
+    async def _arun_stage(self, stage, route_spec, upstream, force=False, stream=None):
+        with self.tracer.span(stage, 'stage', stage=stage, spec=spec_key(route_spec),
+                              tier=self.route_tier(route_spec)) as span:
+            with self.tracer.span('prepare', 'prepare'):
+                prepared = self._prepare_stage(stage, route_spec, upstream)
+            prompt, llm, inputs = prepared['prompt'], prepared['llm'], prepared['inputs']
+            file_name, file_path, key = prepared['file_name'], prepared['file_path'], prepared['key']
+
+            # Files taken from this run's unified response are recorded as up to date
+            from_unified = stage in upstream.get('route', {}).get('unified', ())
+            if not force or from_unified:
+                fresh, reason = self._check_stage(stage, prepared)
+                if fresh:
+                    logger.info(f"Skipping {stage} for {key}: {reason}")
+                    content = self.read_file(file_path)
+                    if stream is not None:
+                        await stream.append(content)
+                    if self.is_local(stage, prepared):
+                        # Keeps the combined documents complete if they were deleted
+                        self.publish_local_output(stage, content)
+                    span.set(rebuilt=False)
+                    return {'content': content, 'file_name': file_name, 'rebuilt': False}
+                logger.info(f"Rebuilding {stage} for {key}: {reason}")
+
+            log_payload(logger, f"{stage} inputs", inputs)
+            unified = None
+            if self.is_local(stage, prepared):
+                generated_file = await self.agenerate_local_stage(stage, route_spec, prepared)
+                if stream is not None:
+                    await stream.append(generated_file)
+                await self.asave_generated_file(file_path, generated_file)
+                self.publish_local_output(stage, generated_file)
+            elif stage == 'route' and self.generation_mode == 'unified':
+                generated_file, unified = await self._agenerate_unified(route_spec, prepared, stream)
+            elif self.stream_output:
+                generated_file = await self._astream_chain_to_file(prompt, llm, inputs, stage, file_path, stream)
+            else:
+                generated_file = await self._ainvoke_chain(prompt, llm, inputs, stage=stage)
+                if not generated_file:
+                    raise RuntimeError(f"Generated {stage} file is empty")
+                if stream is not None:
+                    await stream.append(generated_file)
+                await self.asave_generated_file(file_path, generated_file)
+            log_payload(logger, f"Generated {stage} content", generated_file)
+
+            self.manifest.record(key, stage, prepared['input_hashes'], file_path, generated_file)
+            span.set(rebuilt=True)
+            result = {'content': generated_file, 'file_name': file_name, 'rebuilt': True}
+            if unified is not None:
+                result['unified'] = unified
+            return result
+
+    async def _agenerate_unified(self, route_spec, prepared, stream=None):
+        """
+        Generate the route, controller and service files of a spec with one
+        LLM call. Each file is written as soon as its section has streamed in.
+        Returns the route file and the stages whose files were taken from the
+        response; a missing route section falls back to a route call.
+        """
+        paths = {}
+        for stage in UNIFIED_STAGES:
+            file_name, directory = self._stage_file_name(stage, route_spec, {})
+            paths[stage] = os.path.join(directory, file_name)
+        writes = []
+
+        def write_section(stage, content):
+            writes.append(self.save_generated_file(paths[stage], content))
+
+        parser = SectionParser(write_section)
+        await self._ainvoke_chain(prepared['prompt'], prepared['llm'], prepared['inputs'],
+                                  stage=self.call_stage('route'), parser=parser)
+        sections = parser.sections
+
+        route_file = sections.get('route')
+        if not route_file:
+            logger.warning(f"Unified output for {prepared['key']} has no route section, falling back to a route call")
+            route_file = await self._ainvoke_chain(self._prompt('route'), self.llm_generation,
+                                                   self._route_inputs(route_spec), stage='route')
+            if not route_file:
+                raise RuntimeError("Generated route file is empty")
+            writes.append(self.save_generated_file(prepared['file_path'], route_file))
+        if stream is not None:
+            await stream.append(route_file)
+
+        unified, recorded_writes = self.record_unified_sections(route_spec, route_file, prepared['file_name'], sections)
+        await asyncio.gather(*(asyncio.wrap_future(write) for write in writes + recorded_writes))
+        return route_file, unified
+
+    def record_unified_sections(self, route_spec, route_file, route_file_name, sections):
+        """
+        Save the controller and service sections of a unified response and
+        record them in the build manifest under the inputs their own stages
+        compute, so those stages find them up to date. A section is only kept
+        if the files it builds on came from the same response; the rest fall
+        back to per-file calls. Returns the stages kept and their write futures.
+        """
+        upstream = {'route': {'content': route_file, 'file_name': route_file_name}}
+        kept = []
+        writes = []
+        for stage in UNIFIED_STAGES[1:]:
+            content = sections.get(stage)
+            if not content:
+                logger.info(f"Unified output for {spec_key(route_spec)} has no {stage} section, "
+                            f"falling back to per-file calls from {stage} on")
+                break
+            prepared = self._prepare_stage(stage, route_spec, upstream)
+            writes.append(self.save_generated_file(prepared['file_path'], content))
+            self.manifest.record(prepared['key'], stage, prepared['input_hashes'], prepared['file_path'], content)
+            upstream[stage] = {'content': content, 'file_name': prepared['file_name']}
+            kept.append(stage)
+        return kept, writes
+
+    def _build_stage_graph(self, route_spec, force=False):
+        def make_run(stage):
+            async def run(upstream, stream=None):
+                return await self._arun_stage(stage, route_spec, upstream, force, stream)
+            return run
+
+        return StageGraph([Stage(stage, make_run(stage), inputs) for stage, inputs in self.stage_inputs.items()])
+
+    async def agenerate_all(self, route_spec, force=False):
+        """
+        Generate every file for a spec, running independent stages concurrently.
+        Stages whose inputs are unchanged since the last run are loaded from
+        disk instead of regenerated unless `force` is set. Returns the outputs
+        keyed by stage and the errors of any failed stages. In contract mode
+        a mismatch between the files and their contract is reported as a
+        'consistency' error.
+        """
+        results, errors = await self._build_stage_graph(route_spec, force).run()
+        if self.generation_mode == 'contract':
+            problems = self.check_contract(route_spec, results)
+            if problems:
+                errors['consistency'] = ContractMismatch("; ".join(f"{stage} {problem}" for stage, problem in problems))
+        return results, errors
+
+    def plan_spec(self, route_spec):
+        """
+        Work out which stages of a spec would be rebuilt, without calling the
+        LLM. Returns a list of (stage, rebuild, reason) in pipeline order.
+        """
+        plan = []
+        upstream = {}
+        rebuilt = set()
+
+        for stage in StageGraph([Stage(name, None, inputs) for name, inputs in self.stage_inputs.items()]).order:
+            stale_inputs = [dep for dep in self.stage_inputs[stage] if dep in rebuilt]
+            if stale_inputs:
+                plan.append((stage, True, f"upstream rebuilt: {', '.join(stale_inputs)}"))
+                rebuilt.add(stage)
+                continue
+
+            prepared = self._prepare_stage(stage, route_spec, upstream)
+            fresh, reason = self._check_stage(stage, prepared)
+            plan.append((stage, not fresh, reason))
+            if fresh:
+                upstream[stage] = {'content': self.read_file(prepared['file_path']), 'file_name': prepared['file_name']}
+            else:
+                rebuilt.add(stage)
+
+        return plan
+
+    def _save_test_suite(self, generated_test_suite, route_file_name):
+        if not generated_test_suite:
+            logger.error("Generated test suite is empty!")
+            return None, None
+
+        logger.info(f"Test suite generated. Length: {len(generated_test_suite)} characters")
+        log_payload(logger, "Generated test suite", generated_test_suite)
+
+        test_file_name = f"test_{route_file_name.replace('.js', '.test.js')}"
+        full_path = os.path.join('generated', 'tests', test_file_name)
+
+        self.save_generated_file(full_path, generated_test_suite)
+        logger.info(f"Test suite saved to {full_path}")
+
+        return generated_test_suite, test_file_name
+
+    def _read_test_suite_inputs(self, route_file_name, controller_file_name, service_file_name, generated_files=None,
+                                route_spec=None):
+        if generated_files is not None:
+            # Contents are already in memory when called from the stage graph
+            route_file = generated_files['route']['content']
+            controller_file = generated_files['controller']['content']
+            service_file = generated_files['service']['content']
+        else:
             # Read the newly generated files
             route_file = self.read_file(f'generated/{route_file_name}')
             controller_file = self.read_file(f'generated/{controller_file_name}')
             service_file = self.read_file(f'generated/{service_file_name}')
-            example_test_file = self.read_file('data/example_files/example_test.js')
-            
             logger.info("Successfully read all required files")
 
-            prompt = get_test_suite_generation_prompt()
-            inputs = {
-                "route_file": route_file,
-                "controller_file": controller_file,
-                "service_file": service_file,
-                "example_test_file": example_test_file,
-                "project_structure": json.dumps(self.project_structure, indent=2)
-            }
-            
+        # Without the spec, the route file says best which tests are relevant
+        query = spec_query(route_spec) if route_spec is not None else route_file
+        return self._test_suite_inputs(route_file, controller_file, service_file, self._example('test', query))
+
+    @traced('test')
+    def generate_test_suite(self, route_file_name, controller_file_name, service_file_name):
+        logger.info(f"Starting test suite generation for {route_file_name}")
+        
+        try:
+            inputs = self._read_test_suite_inputs(route_file_name, controller_file_name, service_file_name)
+
             logger.info("Invoking AI model for test suite generation")
-            chain = RunnableSequence(prompt | self.llm_generation)
-            result = chain.invoke(inputs)
-            
+            generated_test_suite = self._invoke_chain(self._prompt('test'), self.llm_generation, inputs, stage='test')
             logger.info("AI model invocation completed")
-            
-            generated_test_suite = result.content if hasattr(result, 'content') else result
-            if not generated_test_suite:
-                logger.error("Generated test suite is empty!")
-                return None, None
-            
-            logger.info(f"Test suite generated. Length: {len(generated_test_suite)} characters")
-            logger.debug(f"Generated test suite preview: {generated_test_suite[:500]}...")
-
-            test_file_name = f"test_{route_file_name.replace('.js', '.test.js')}"
-            full_path = os.path.join('generated', 'tests', test_file_name)
-            
-            self.save_generated_file(full_path, generated_test_suite)
-            logger.info(f"Test suite saved to {full_path}")
-            
-            return generated_test_suite, test_file_name
+
+            return self._save_test_suite(generated_test_suite, route_file_name)
         except Exception as e:
             logger.error(f"Error in generate_test_suite: {str(e)}", exc_info=True)
             return None, None
 
+    @traced('test')
+    async def agenerate_test_suite(self, route_file_name, controller_file_name, service_file_name, generated_files=None):
+        logger.info(f"Starting test suite generation for {route_file_name}")
+
+        try:
+            inputs = self._read_test_suite_inputs(route_file_name, controller_file_name, service_file_name, generated_files)
+
+            logger.info("Invoking AI model for test suite generation")
+            generated_test_suite = await self._ainvoke_chain(self._prompt('test'), self.llm_generation, inputs, stage='test')
+            logger.info("AI model invocation completed")
+
+            return self._save_test_suite(generated_test_suite, route_file_name)
+        except Exception as e:
+            logger.error(f"Error in agenerate_test_suite: {str(e)}", exc_info=True)
+            return None, None
+
     def read_file(self, file_path):
+        pending = self.output_sink.pending_content(file_path)
+        if pending is not None:
+            # Queued for writing but not on disk yet
+            return pending
         try:
             with open(file_path, 'r') as f:
                 content = f.read()
@@ -1,49 +1,442 @@
+import argparse
 import logging
-from ai_agent import AIAgent
-from utils.route_parser import parse_and_validate_route_specs
+import math
+import os
+import sys
+import time
+from src.utils.route_parser import load_route_specs
+from src.utils.prompt_utils import PROMPT_LAYOUTS, GENERATION_MODES
+from src.utils.job_queue import DEFAULT_JOB_STORE_PATH
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def main():
-    agent = AIAgent()
-    
-    try:
-        route_specs = parse_and_validate_route_specs('data/route_specs.yaml')
-        logger.info(f"Total route specs: {len(route_specs)}")
-    except Exception as e:
-        logger.error(f"Error parsing route specs: {str(e)}", exc_info=True)
-        return
+# The agent pulls in openai and langchain, so it is only imported by the
+# commands that need it; `validate` never loads it.
+COMMANDS = ('validate', 'plan', 'generate', 'worker', 'watch')
+
+# Project data the watch command follows besides the specs
+WATCHED_DATA = ('data/example_files', 'data/db_schema.json', 'data/middleware_utils.json',
+                'data/project_info.json', 'data/project_structure.json')
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Without a subcommand, behave like the original single-command CLI
+    if not argv or argv[0] not in COMMANDS + ('-h', '--help'):
+        argv = ['generate'] + argv
+
+    spec_options = argparse.ArgumentParser(add_help=False)
+    spec_options.add_argument('--specs', default='data/route_specs.yaml', help="Route specs YAML file, directory of YAML files or glob pattern")
+
+    agent_options = argparse.ArgumentParser(add_help=False)
+    agent_options.add_argument('--prompt-layout', choices=PROMPT_LAYOUTS, default=os.getenv('PROMPT_LAYOUT', 'legacy'),
+                               help="'prefix' puts static project context first so provider prompt caching can reuse it")
+    agent_options.add_argument('--generation-mode', choices=GENERATION_MODES,
+                               default=os.getenv('GENERATION_MODE', 'staged'),
+                               help="'unified' generates the route, controller and service of a spec in one LLM call; "
+                                    "'contract' generates them at the same time against an interface derived from the spec")
+    agent_options.add_argument('--model-routing', action='store_true', default=None,
+                               help="Render plain CRUD specs from code templates and send complex specs to the strong model")
+    agent_options.add_argument('--swagger-prose', action='store_true', default=None,
+                               help="Have the LLM write the summaries and descriptions of the generated OpenAPI operations")
+
+    concurrency_options = argparse.ArgumentParser(add_help=False)
+    concurrency_options.add_argument('--max-concurrent-specs', type=int, default=int(os.getenv('MAX_CONCURRENT_SPECS', '4')),
+                                     help="Maximum number of specs processed at the same time (per worker)")
+    concurrency_options.add_argument('--max-concurrent-llm-calls', type=int, default=int(os.getenv('MAX_CONCURRENT_LLM_CALLS', '8')),
+                                     help="Maximum number of in-flight LLM requests across all specs")
+
+    queue_options = argparse.ArgumentParser(add_help=False)
+    queue_options.add_argument('--job-store', default=os.getenv('JOB_STORE_PATH', DEFAULT_JOB_STORE_PATH),
+                               help="SQLite job store the workers claim spec stages from; machines sharing the file split the work")
+    queue_options.add_argument('--workers', type=int, default=int(os.getenv('WORKERS', '0')),
+                               help="Generate through the job store with this many worker processes")
+
+    parser = argparse.ArgumentParser(description="Generate route, controller, service, swagger and test files from route specs.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('validate', parents=[spec_options],
+                        help="Parse and validate the route specs without loading the agent")
+    commands.add_parser('plan', parents=[spec_options, agent_options],
+                        help="List the stages that would be rebuilt and why")
+    generate = commands.add_parser('generate', parents=[spec_options, agent_options, concurrency_options, queue_options],
+                                   help="Generate the files of every spec (the default)")
+    commands.add_parser('worker', parents=[agent_options, concurrency_options, queue_options],
+                        help="Work through the jobs of a run started elsewhere on the same job store")
+    watch = commands.add_parser('watch', parents=[spec_options, agent_options, concurrency_options],
+                                help="Keep the agent loaded and regenerate the stages affected by each change to the specs or project data")
+    watch.add_argument('--interval', type=float, default=float(os.getenv('WATCH_INTERVAL', '0.5')),
+                       help="Seconds between checks for changed files")
+    generate.add_argument('--resume', action='store_true',
+                          help="Continue the run recorded in the job store where it stopped instead of starting over")
+    generate.add_argument('--no-cache', action='store_true',
+                          help="Bypass the on-disk LLM response cache for this run")
+    generate.add_argument('--dry-run', action='store_true',
+                          help="Same as the plan command")
+    generate.add_argument('--force', action='store_true',
+                          help="Rebuild every stage even when the build manifest says it is up to date")
+    generate.add_argument('--stream', action='store_true', default=None,
+                          help="Stream LLM output straight into the generated files and report time-to-first-token")
+    generate.add_argument('--batch', action='store_true',
+                          help="Regenerate through the provider batch API, one batch per wave of stages")
+    generate.add_argument('--batch-poll-interval', type=float, default=30,
+                          help="Seconds between batch status polls")
+    generate.add_argument('--batch-restart', action='store_true',
+                          help="Discard the state of an interrupted batch run instead of resuming it")
+    generate.add_argument('--trace', default=os.getenv('TRACE_PATH'),
+                          help="Write a Chrome trace (chrome://tracing, Perfetto) of every stage, LLM call and file write")
+    generate.add_argument('--metrics', default=os.getenv('METRICS_PATH'),
+                          help="Write per-stage timings, tokens, retries and bytes written in Prometheus text format")
+    return parser.parse_args(argv)
+
+async def process_spec(agent, spec, i, spec_semaphore, force=False):
+    path = spec['route_details']['path']
+    result = {'index': i, 'path': path, 'status': 'failed', 'files': {}, 'rebuilt': [], 'error': None,
+              'tier': agent.route_tier(spec)}
+
+    async with spec_semaphore:
+        agent.tracer.set_lane(f"spec {i}: {path}")
+        logger.info(f"Processing spec {i}: {path}")
+        started = time.perf_counter()
 
-    for i, spec in enumerate(route_specs, 1):
-        logger.info(f"Processing spec {i}: {spec['route_details']['path']}")
-        
         try:
-            generated_files = agent.generate_files_sequentially(spec)
-            if not generated_files:
-                logger.error(f"Failed to generate files for spec {i}")
-                continue
+            generated_files, errors = await agent.agenerate_all(spec, force=force)
 
-            logger.info(f"Generated files for {spec['route_details']['path']}:")
+            logger.info(f"Generated files for {path}:")
             for file_type, file_info in generated_files.items():
-                logger.info(f"- {file_type}: {file_info['file_name']}")
-            
-            # Generate test suite
-            test_suite, test_file_name = agent.generate_test_suite(
-                generated_files['route']['file_name'],
-                generated_files['controller']['file_name'],
-                generated_files['service']['file_name']
-            )
-            
-            if test_suite and test_file_name:
-                logger.info(f"Generated test suite: {test_file_name}")
-                logger.debug(f"Test suite content preview: {test_suite[:500]}...")
+                state = "rebuilt" if file_info['rebuilt'] else "up to date"
+                logger.info(f"- {file_type}: {file_info['file_name']} ({state})")
+                result['files'][file_type] = file_info['file_name']
+                if file_info['rebuilt']:
+                    result['rebuilt'].append(file_type)
+
+            if 'test' in generated_files:
+                logger.debug(f"Test suite content preview: {generated_files['test']['content'][:500]}...")
+
+            if not errors:
+                result['status'] = 'ok'
             else:
-                logger.error(f"Failed to generate test suite for {spec['route_details']['path']}")
-            
+                for stage, error in errors.items():
+                    logger.error(f"{stage} failed for {path}: {str(error)}")
+                result['status'] = 'partial' if generated_files else 'failed'
+                result['error'] = "; ".join(f"{stage}: {error}" for stage, error in errors.items())
+
         except Exception as e:
             logger.error(f"Error processing spec {i}: {str(e)}", exc_info=True)
+            result['error'] = str(e)
+        finally:
+            result['duration'] = time.perf_counter() - started
+            agent.manifest.save()
+
+    return result
+
+async def run_pipeline(agent, route_specs, max_concurrent_specs, force=False):
+    import asyncio
+
+    spec_semaphore = asyncio.Semaphore(max_concurrent_specs)
+    tasks = [process_spec(agent, spec, i, spec_semaphore, force) for i, spec in enumerate(route_specs, 1)]
+    return await asyncio.gather(*tasks)
+
+def log_summary(results, elapsed):
+    succeeded = [r for r in results if r['status'] == 'ok']
+    partial = [r for r in results if r['status'] == 'partial']
+    failed = [r for r in results if r['status'] == 'failed']
+
+    rebuilt = sum(len(r['rebuilt']) for r in results)
+    logger.info(f"Summary: {len(succeeded)} succeeded, {len(partial)} partial, {len(failed)} failed "
+                f"out of {len(results)} specs in {elapsed:.1f}s")
+    logger.info(f"Stages rebuilt: {rebuilt}, up to date: {sum(len(r['files']) for r in results) - rebuilt}")
+    for r in partial + failed:
+        logger.info(f"- spec {r['index']} ({r['path']}): {r['status']} - {r['error']}")
+
+    tiers = {}
+    for r in results:
+        if r.get('tier'):
+            tiers.setdefault(r['tier'], []).append(r['duration'])
+    for tier, durations in sorted(tiers.items()):
+        durations.sort()
+        p95 = durations[max(0, math.ceil(0.95 * len(durations)) - 1)]
+        logger.info(f"Tier {tier}: {len(durations)} specs, mean {sum(durations) / len(durations):.2f}s, p95 {p95:.2f}s")
+
+def print_plan(agent, route_specs):
+    total = 0
+    for spec in route_specs:
+        plan = agent.plan_spec(spec)
+        stale = [(stage, reason) for stage, rebuild, reason in plan if rebuild]
+        total += len(stale)
+        print(f"{spec['route_details']['method']} {spec['route_details']['path']}: "
+              f"{len(stale)} of {len(plan)} stages to rebuild")
+        for stage, reason in stale:
+            print(f"  - {stage}: {reason}")
+    print(f"{total} stages would be rebuilt")
+
+def create_agent(args):
+    from src.ai_agent import AIAgent
+
+    return AIAgent(max_concurrent_llm_calls=getattr(args, 'max_concurrent_llm_calls', None),
+                   use_cache=False if getattr(args, 'no_cache', False) else None,
+                   prompt_layout=args.prompt_layout,
+                   stream_output=getattr(args, 'stream', None),
+                   openapi_prose=args.swagger_prose,
+                   generation_mode=args.generation_mode,
+                   model_routing=args.model_routing)
+
+def load_specs(args):
+    try:
+        route_specs, errors = load_route_specs(args.specs)
+        logger.info(f"Total route specs: {len(route_specs)}")
+        return route_specs, errors
+    except Exception as e:
+        logger.error(f"Error parsing route specs: {str(e)}", exc_info=True)
+        return None, [str(e)]
+
+def run_validate(args):
+    route_specs, errors = load_specs(args)
+    if route_specs is None:
+        return 1
+    print(f"{len(route_specs)} valid route specs, {len(errors)} errors")
+    return 1 if errors else 0
+
+def run_plan(args):
+    route_specs, _ = load_specs(args)
+    if route_specs is None:
+        return 1
+    print_plan(create_agent(args), route_specs)
+    return 0
+
+def export_traces(agent, args):
+    if args.trace:
+        agent.tracer.write_chrome_trace(args.trace)
+    if args.metrics:
+        agent.tracer.write_prometheus(args.metrics)
+
+def log_output_stats(agent):
+    agent.output_sink.flush()
+    stats = agent.output_sink.stats
+    logger.info(f"Output files: {stats['written']} written, {stats['unchanged']} unchanged, "
+                f"{stats['failed']} failed ({stats['bytes_written']} bytes written)")
+
+def run_generate(args):
+    route_specs, _ = load_specs(args)
+    if route_specs is None:
+        return 1
+    agent = create_agent(args)
+    agent.tracer.enabled = bool(args.trace or args.metrics)
+    try:
+        return generate(agent, route_specs, args)
+    finally:
+        export_traces(agent, args)
+
+def generate(agent, route_specs, args):
+    import asyncio
+
+    if args.batch:
+        from src.utils.batch_runner import BatchRunner
+
+        runner = BatchRunner(agent, agent.stage_inputs, poll_interval=args.batch_poll_interval)
+        if args.batch_restart:
+            runner.reset()
+        runner.run(route_specs, force=args.force)
+        log_output_stats(agent)
+        logger.info("Processing complete.")
+        return 0
+    if args.workers or args.resume:
+        return run_queue(agent, route_specs, args)
+
+    started = time.perf_counter()
+    results = asyncio.run(run_pipeline(agent, route_specs, args.max_concurrent_specs, args.force))
+    log_summary(results, time.perf_counter() - started)
+    log_output_stats(agent)
+    logger.info(f"LLM cache: {agent.llm_cache.stats()}")
+    for model, stats in agent.scheduler.stats.items():
+        logger.info(f"Rate limiting for {model}: {stats['requests']} requests, {stats['retries']} retries "
+                    f"({stats['rate_limited']} rate limited), {stats['wait_seconds']:.1f}s spent waiting")
+    for metric in agent.stream_metrics:
+        rate = f"{metric['tokens_per_second']:.1f} tokens/s" if metric['tokens_per_second'] else "n/a"
+        logger.info(f"Streamed {metric['stage']} to {metric['file']}: "
+                    f"first token after {metric['time_to_first_token']:.2f}s, {rate}")
+    for stage, usage in agent.llm_usage.items():
+        logger.info(f"LLM usage for {stage}: {usage['prompt_tokens']} prompt tokens, "
+                    f"{agent.cached_token_fraction(stage):.0%} served from the provider prompt cache")
+    for stage, usage in agent.token_budget.summary().items():
+        logger.info(f"Prompt tokens for {stage}: {usage['total_tokens']} over {usage['calls']} calls "
+                    f"({usage['trimmed_calls']} trimmed), by slot: {usage['slot_tokens']}")
 
     logger.info("Processing complete.")
+    return 0 if all(r['status'] == 'ok' for r in results) else 1
+
+def run_worker(args):
+    """Work through the job store until no job is left; the body of each worker process."""
+    import asyncio
+    from src.utils.job_queue import JobQueue, QueueWorker
+
+    agent = create_agent(args)
+    queue = JobQueue(args.job_store)
+    try:
+        return asyncio.run(QueueWorker(agent, queue, concurrency=args.max_concurrent_specs).run())
+    finally:
+        agent.output_sink.flush()
+        queue.close()
+
+def worker_status(stats):
+    """Exit status of a worker: non-zero if any of its jobs failed for good."""
+    return 1 if stats['failed'] else 0
+
+def run_worker_process(args):
+    sys.exit(worker_status(run_worker(args)))
+
+def run_workers(args, agent=None):
+    """
+    Run `args.workers` worker processes, or a single worker in this process
+    with `agent`. Returns non-zero if a job failed or a worker process exited
+    with an error.
+    """
+    import asyncio
+    import multiprocessing
+    from src.utils.job_queue import JobQueue, QueueWorker
+
+    if args.workers <= 1 and agent is None:
+        return worker_status(run_worker(args))
+    if args.workers <= 1:
+        queue = JobQueue(args.job_store)
+        try:
+            return worker_status(asyncio.run(QueueWorker(agent, queue, concurrency=args.max_concurrent_specs).run()))
+        finally:
+            queue.close()
+    # Spawned rather than forked, so no worker inherits the parent's threads or connections
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=run_worker_process, args=(args,), name=f"worker-{n}")
+                 for n in range(max(args.workers, 1))]
+    for process in processes:
+        process.start()
+    status = 0
+    for process in processes:
+        process.join()
+        if process.exitcode:
+            logger.error(f"{process.name} exited with status {process.exitcode}")
+            status = 1
+    return status
+
+def log_queue_summary(queue, elapsed):
+    summary = queue.summary()
+    jobs = summary['jobs']
+    logger.info(f"Jobs: {jobs['done']} done, {jobs['failed']} failed, {jobs['skipped']} skipped, "
+                f"{jobs['pending'] + jobs['running']} unfinished in {elapsed:.1f}s")
+    for stage, stats in summary['stages'].items():
+        logger.info(f"- {stage}: {stats['count']} done, mean {stats['mean_duration']:.2f}s")
+    for key, stage, error in queue.failures():
+        logger.info(f"- {stage} of {key} failed: {error}")
+    return jobs
+
+def run_queue(agent, route_specs, args):
+    """
+    Generate through the job store. A new run replaces whatever the store
+    held; `--resume` keeps the finished jobs and requeues the interrupted
+    and failed ones.
+    """
+    from src.utils.job_queue import JobQueue
+
+    queue = JobQueue(args.job_store)
+    if args.resume:
+        interrupted = queue.requeue_stale()
+        failed = queue.retry_failed()
+        logger.info(f"Resuming from {args.job_store}: {interrupted} interrupted and {failed} failed jobs requeued")
+    else:
+        queue.reset()
+        queue.set_options(force=args.force)
+    added = queue.enqueue(route_specs, agent.stage_inputs, prune=args.resume)
+    logger.info(f"Queued {added} new jobs in {args.job_store}")
+
+    started = time.perf_counter()
+    try:
+        run_workers(args, agent)
+    except KeyboardInterrupt:
+        logger.info(f"Interrupted; run again with --resume to continue from {args.job_store}")
+        return 130
+    jobs = log_queue_summary(queue, time.perf_counter() - started)
+    queue.close()
+    log_output_stats(agent)
+    logger.info("Processing complete.")
+    return 0 if jobs['done'] == sum(jobs.values()) else 1
+
+def stale_stages(agent, route_specs):
+    """The stages of each spec that are out of date, keyed by spec index; up-to-date specs are left out."""
+    stale = {}
+    for i, spec in enumerate(route_specs, 1):
+        stages = [stage for stage, rebuild, _ in agent.plan_spec(spec) if rebuild]
+        if stages:
+            stale[i] = stages
+    return stale
+
+async def regenerate_stale(agent, route_specs, args):
+    """Generate the out-of-date stages of every spec and log what was affected."""
+    import asyncio
+
+    # A watch session runs for hours; keep only the current cycle's spans, metrics and usage
+    agent.tracer.reset()
+    agent.token_budget.reset()
+    agent.stream_metrics.clear()
+    agent.llm_usage.clear()
+    stale = stale_stages(agent, route_specs)
+    if not stale:
+        logger.info("All specs are up to date")
+        return []
+    logger.info(f"{sum(len(stages) for stages in stale.values())} stages of {len(stale)} specs affected:")
+    for i, stages in stale.items():
+        logger.info(f"- spec {i} ({route_specs[i - 1]['route_details']['path']}): {', '.join(stages)}")
+
+    started = time.perf_counter()
+    spec_semaphore = asyncio.Semaphore(args.max_concurrent_specs)
+    results = await asyncio.gather(*(process_spec(agent, route_specs[i - 1], i, spec_semaphore) for i in stale))
+    log_summary(results, time.perf_counter() - started)
+    agent.output_sink.flush()
+    return results
+
+async def watch(agent, args):
+    """
+    Regenerate whatever is out of date, then wait for changes to the specs
+    or project data. Each change drops only the agent data loaded from the
+    changed files, and the build manifest works out which stages of which
+    specs it affects; only those are regenerated.
+    """
+    from src.utils.file_watcher import FileWatcher
+
+    spec_paths = [args.specs] + [path for path in WATCHED_DATA if os.path.normpath(path) != os.path.normpath(args.specs)]
+    watcher = FileWatcher(spec_paths, interval=args.interval)
+    while True:
+        route_specs, _ = load_specs(args)
+        if route_specs is not None:
+            await regenerate_stale(agent, route_specs, args)
+        logger.info(f"Watching {', '.join(spec_paths)} for changes")
+        changed = await watcher.wait()
+        logger.info(f"Changed: {', '.join(sorted(changed))}")
+        reloaded = agent.reload_data(changed)
+        if reloaded:
+            logger.debug(f"Reloading {', '.join(reloaded)}")
+
+def run_watch(args):
+    import asyncio
+
+    agent = create_agent(args)
+    try:
+        # One event loop for the whole session, so clients and semaphores stay bound to it
+        asyncio.run(watch(agent, args))
+    except KeyboardInterrupt:
+        logger.info("Stopped watching")
+    finally:
+        agent.output_sink.flush()
+        agent.manifest.save()
+    return 0
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'watch':
+        return run_watch(args)
+    if args.command == 'validate':
+        return run_validate(args)
+    if args.command == 'worker':
+        return run_workers(args)
+    if args.command == 'plan' or args.dry_run:
+        return run_plan(args)
+    return run_generate(args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
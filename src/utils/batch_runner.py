@@ -0,0 +1,310 @@
+# src/utils/batch_runner.py
+
+import json
+import logging
+import os
+import time
+from src.utils.stage_graph import Stage, StageGraph
+from src.utils.unified_output import split_sections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_DIR = '.batch'
+BATCH_ENDPOINT = '/v1/chat/completions'
+FINISHED_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+# langchain message types to chat completion roles
+ROLE_NAMES = {'system': 'system', 'human': 'user', 'ai': 'assistant'}
+
+
+def stage_order(stage_inputs):
+    return StageGraph([Stage(name, None, deps) for name, deps in stage_inputs.items()]).order
+
+
+def stage_waves(stage_inputs):
+    """
+    Group stages into waves that can be submitted as one batch each: every
+    stage lands in the first wave after all of its inputs.
+    """
+    levels = {}
+    for stage in stage_order(stage_inputs):
+        levels[stage] = 1 + max((levels[dep] for dep in stage_inputs[stage]), default=-1)
+
+    waves = [[] for _ in range(max(levels.values()) + 1)]
+    for stage in stage_inputs:
+        waves[levels[stage]].append(stage)
+    return waves
+
+
+class BatchRunner:
+    """
+    Regenerates specs through the provider's batch endpoint. The prompts of
+    each wave of stages are rendered into a JSONL file, submitted as one batch
+    and polled; the results are written to the usual stage outputs and the
+    build manifest before the next wave is rendered from them.
+
+    Progress is kept in a state file so a crashed run picks up the in-flight
+    batch again instead of resubmitting it.
+    """
+
+    def __init__(self, agent, stage_inputs, client=None, work_dir=DEFAULT_BATCH_DIR, poll_interval=30):
+        self.agent = agent
+        self.stage_inputs = stage_inputs
+        self.client = client or agent.client
+        self.work_dir = work_dir
+        self.state_path = os.path.join(work_dir, 'state.json')
+        self.poll_interval = poll_interval
+        self.order = stage_order(stage_inputs)
+        self.waves = stage_waves(stage_inputs)
+        self.stats = {'submitted': 0, 'succeeded': 0, 'failed': 0, 'cached': 0, 'local': 0, 'skipped': 0,
+                      'inconsistent': 0}
+        # (spec index, stage) of files taken from a unified route response in this run
+        self.unified = set()
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+            logger.info(f"Resuming batch run from {self.state_path}")
+            return state
+        except FileNotFoundError:
+            return {'waves': {}}
+
+    def _save_state(self):
+        os.makedirs(self.work_dir, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def reset(self):
+        """Forget any previous run so every wave is rendered and submitted again."""
+        self.state = {'waves': {}}
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def run(self, route_specs, force=False):
+        for index, stages in enumerate(self.waves):
+            self.run_wave(index, stages, route_specs, force)
+        if getattr(self.agent, 'generation_mode', None) == 'contract':
+            for route_spec in route_specs:
+                outputs = self._upstream_outputs('test', route_spec)
+                if outputs is not None and self.agent.check_contract(route_spec, outputs):
+                    self.stats['inconsistent'] += 1
+
+        self.agent.manifest.save()
+        self.reset()
+        logger.info(f"Batch run complete: {self.stats}")
+        return self.stats
+
+    def run_wave(self, index, stages, route_specs, force=False, wait=True):
+        wave_state = self.state['waves'].get(str(index))
+        if wave_state and wave_state['status'] == 'collected':
+            logger.info(f"Batch wave {index} ({', '.join(stages)}) already collected")
+            return
+
+        if not wave_state:
+            requests = self._render_wave(stages, route_specs, force)
+            if not requests:
+                logger.info(f"Batch wave {index} ({', '.join(stages)}): nothing to rebuild")
+                # Locally built stages must be on disk before the next wave checks them
+                self.agent.output_sink.flush()
+                self.state['waves'][str(index)] = {'status': 'collected', 'requests': {}}
+                self._save_state()
+                return
+            wave_state = self._submit(index, requests)
+
+        if not wait:
+            return
+        batch = self._poll(wave_state['batch_id'])
+        self._collect(batch, wave_state, route_specs)
+        # The next wave's manifest checks read the outputs from disk
+        self.agent.output_sink.flush()
+        wave_state['status'] = 'collected'
+        self._save_state()
+
+    def _upstream_outputs(self, stage, route_spec):
+        """
+        Load the outputs the stage depends on. Returns None when one of them
+        is not up to date, e.g. because its request failed in an earlier wave.
+        """
+        needed = set()
+        pending = list(self.stage_inputs[stage])
+        while pending:
+            dep = pending.pop()
+            if dep not in needed:
+                needed.add(dep)
+                pending.extend(self.stage_inputs[dep])
+
+        upstream = {}
+        for dep in self.order:
+            if dep not in needed:
+                continue
+            prepared = self.agent._prepare_stage(dep, route_spec, upstream)
+            fresh, reason = self.agent._check_stage(dep, prepared)
+            if not fresh:
+                return None
+            upstream[dep] = {'content': self.agent.read_file(prepared['file_path']), 'file_name': prepared['file_name']}
+        return upstream
+
+    def _render_wave(self, stages, route_specs, force):
+        requests = {}
+        for spec_index, route_spec in enumerate(route_specs):
+            for stage in stages:
+                upstream = self._upstream_outputs(stage, route_spec)
+                if upstream is None:
+                    logger.warning(f"Skipping {stage} for spec {spec_index}: an input stage is not up to date")
+                    self.stats['skipped'] += 1
+                    continue
+
+                prepared = self.agent._prepare_stage(stage, route_spec, upstream)
+                local = self.agent.is_local(stage, prepared)
+                if not force or (spec_index, stage) in self.unified:
+                    fresh, reason = self.agent._check_stage(stage, prepared)
+                    if fresh:
+                        if local:
+                            self.agent.publish_local_output(stage, self.agent.read_file(prepared['file_path']))
+                        continue
+
+                if local:
+                    # Built from the spec, so nothing to submit
+                    content = self.agent.generate_local_stage(stage, route_spec, prepared)
+                    self._write_output(stage, prepared['key'], prepared['file_path'], prepared['input_hashes'], content)
+                    self.agent.publish_local_output(stage, content)
+                    self.stats['local'] += 1
+                    continue
+
+                llm = prepared['llm']
+                inputs, _ = self.agent._fit_token_budget(self.agent.call_stage(stage), prepared['prompt'], llm,
+                                                         prepared['inputs'])
+                prompt_value = prepared['prompt'].invoke(inputs)
+                cache_key = self.agent._cache_key(llm, prompt_value)
+                cached = self.agent.llm_cache.get(cache_key)
+                if cached is not None:
+                    if self._store(spec_index, route_spec, stage, prepared['key'], prepared['file_path'],
+                                   prepared['input_hashes'], cached):
+                        self.stats['cached'] += 1
+                    continue
+
+                params = {k: v for k, v in getattr(llm, '_default_params', {}).items() if k != 'stream'}
+                body = dict(params, messages=[
+                    {'role': ROLE_NAMES.get(message.type, message.type), 'content': message.content}
+                    for message in prompt_value.to_messages()
+                ])
+                requests[f"{spec_index}:{stage}"] = {
+                    'body': body,
+                    'stage': stage,
+                    'key': prepared['key'],
+                    'file_path': prepared['file_path'],
+                    'input_hashes': prepared['input_hashes'],
+                    'cache_key': cache_key,
+                    'model': getattr(llm, 'model_name', None),
+                }
+        return requests
+
+    def _submit(self, index, requests):
+        os.makedirs(self.work_dir, exist_ok=True)
+        input_path = os.path.join(self.work_dir, f"wave_{index}.jsonl")
+        with open(input_path, 'w') as f:
+            for custom_id, request in requests.items():
+                f.write(json.dumps({
+                    'custom_id': custom_id,
+                    'method': 'POST',
+                    'url': BATCH_ENDPOINT,
+                    'body': request['body'],
+                }) + '\n')
+
+        with open(input_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose='batch')
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window='24h'
+        )
+        logger.info(f"Submitted batch wave {index} as {batch.id} with {len(requests)} requests")
+        self.stats['submitted'] += len(requests)
+
+        # The request bodies are in the JSONL file; only keep what is needed to fan results back out
+        wave_state = {
+            'status': 'submitted',
+            'batch_id': batch.id,
+            'input_file_id': input_file.id,
+            'requests': {custom_id: {k: v for k, v in request.items() if k != 'body'}
+                         for custom_id, request in requests.items()},
+        }
+        self.state['waves'][str(index)] = wave_state
+        self._save_state()
+        return wave_state
+
+    def _poll(self, batch_id):
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in FINISHED_STATUSES:
+                logger.info(f"Batch {batch_id} finished with status {batch.status}")
+                return batch
+            logger.debug(f"Batch {batch_id} is {batch.status}, polling again in {self.poll_interval}s")
+            time.sleep(self.poll_interval)
+
+    def _collect(self, batch, wave_state, route_specs):
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    result = json.loads(line)
+                    results[result['custom_id']] = result
+
+        for custom_id, request in wave_state['requests'].items():
+            result = results.get(custom_id)
+            response = (result or {}).get('response') or {}
+            if not result or result.get('error') or response.get('status_code') != 200:
+                error = (result or {}).get('error') or response.get('body', {}).get('error') or batch.status
+                logger.error(f"Batch request {custom_id} failed: {error}")
+                self.stats['failed'] += 1
+                continue
+
+            body = response['body']
+            content = body['choices'][0]['message']['content']
+            if not content:
+                logger.error(f"Batch request {custom_id} returned an empty {request['stage']} file")
+                self.stats['failed'] += 1
+                continue
+
+            spec_index = int(custom_id.split(':')[0])
+            self.agent._add_token_usage(self.agent.call_stage(request['stage']), body.get('usage') or {})
+            self.agent.llm_cache.set(request['cache_key'], content, request['model'])
+            if self._store(spec_index, route_specs[spec_index], request['stage'], request['key'],
+                           request['file_path'], request['input_hashes'], content):
+                self.stats['succeeded'] += 1
+
+        self.agent.manifest.save()
+
+    def _store(self, spec_index, route_spec, stage, key, file_path, input_hashes, content):
+        """
+        Write a stage's response. A unified route response is split into its
+        files first; its controller and service files are recorded so the
+        next waves don't request them again. Returns False if the response
+        had no usable output.
+        """
+        if self.agent.call_stage(stage) != 'unified':
+            self._write_output(stage, key, file_path, input_hashes, content)
+            return True
+
+        sections = split_sections(content)
+        if not sections.get('route'):
+            logger.error(f"Unified response for spec {spec_index} has no route section")
+            self.stats['failed'] += 1
+            return False
+        self._write_output(stage, key, file_path, input_hashes, sections['route'])
+        kept, writes = self.agent.record_unified_sections(route_spec, sections['route'], os.path.basename(file_path),
+                                                          sections)
+        for write in writes:
+            write.result()
+        self.unified.update((spec_index, kept_stage) for kept_stage in kept)
+        return True
+
+    def _write_output(self, stage, key, file_path, input_hashes, content):
+        self.agent.save_generated_file(file_path, content)
+        self.agent.manifest.record(key, stage, input_hashes, file_path, content)
@@ -0,0 +1,125 @@
+# src/utils/build_manifest.py
+
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves from concurrent workers are not serialised
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_PATH = 'build_manifest.json'
+
+
+def hash_content(value):
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def spec_key(route_spec):
+    details = route_spec.get('route_details', {})
+    return f"{details.get('method', '')} {details.get('path', '')}"
+
+
+class BuildManifest:
+    """
+    Records, for every spec and stage, a hash of each input the stage used and
+    a hash of the output it wrote. A stage only needs rebuilding when one of
+    those inputs changed or its output file is missing or was edited.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self.entries = {}
+        # (key, stage) of the entries recorded since the last save
+        self._recorded = set()
+        self.load()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f).get('specs', {})
+            logger.debug(f"Build manifest loaded from {self.path}")
+            return entries
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Error loading build manifest {self.path}: {str(e)}")
+            return {}
+
+    def load(self):
+        self.entries = self._read()
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._locked():
+            # Worker processes share the manifest, so keep what others saved since it was loaded
+            entries = self._read() if self._recorded else self.entries
+            for key, stage in self._recorded:
+                entries.setdefault(key, {})[stage] = self.entries[key][stage]
+            self.entries = entries
+            self._recorded = set()
+
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': 1, 'specs': self.entries}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def hash_inputs(inputs):
+        """Hash every named input of a stage."""
+        return {name: hash_content(value) for name, value in inputs.items()}
+
+    def check(self, key, stage, input_hashes, output_path):
+        """
+        Return (fresh, reason). `fresh` is True when the recorded inputs match
+        and the output on disk is the one that was recorded.
+        """
+        entry = self.entries.get(key, {}).get(stage)
+        if entry is None:
+            return False, "not built yet"
+
+        recorded = entry.get('inputs', {})
+        changed = sorted(name for name in set(recorded) | set(input_hashes)
+                         if recorded.get(name) != input_hashes.get(name))
+        if changed:
+            return False, f"inputs changed: {', '.join(changed)}"
+
+        if entry.get('output_path') != output_path or not os.path.exists(output_path):
+            return False, "output missing"
+
+        with open(output_path, 'r') as f:
+            if hash_content(f.read()) != entry.get('output_hash'):
+                return False, "output modified"
+
+        return True, "up to date"
+
+    def record(self, key, stage, input_hashes, output_path, content):
+        self.entries.setdefault(key, {})[stage] = {
+            'inputs': input_hashes,
+            'output_path': output_path,
+            'output_hash': hash_content(content),
+            'updated_at': time.time(),
+        }
+        self._recorded.add((key, stage))
@@ -1,109 +1,357 @@
-import ast
+import atexit
+import functools
+import json
+import logging
+import os
 import re
+import subprocess
+import threading
+from src.utils.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ESLINT_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eslint_worker.js')
+
+# Files sent to the worker per round trip
+LINT_BATCH_SIZE = 100
+
+
+class ESLintWorker:
+    """
+    A Node process that keeps ESLint and the project's .eslintrc.json loaded
+    and lints batches of files sent over stdin/stdout as JSON lines.
+    """
+
+    def __init__(self, cwd=PROJECT_ROOT, node=None):
+        self.cwd = cwd
+        self.node = node or os.getenv('NODE_BINARY', 'node')
+        self._process = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _start(self):
+        self._process = subprocess.Popen(
+            [self.node, ESLINT_WORKER_SCRIPT],
+            cwd=self.cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding='utf-8'
+        )
+
+    def lint(self, files):
+        """
+        Lint `files`, a list of (name, code) pairs. Names are paths relative to
+        the project root and decide which ESLint config applies. Returns one
+        list of ESLint messages per file.
+        """
+        results = []
+        with self._lock:
+            for start in range(0, len(files), LINT_BATCH_SIZE):
+                results.extend(self._request(files[start:start + LINT_BATCH_SIZE]))
+        return results
+
+    def _request(self, files):
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+        self._next_id += 1
+        request = {'id': self._next_id, 'files': [{'name': name, 'code': code} for name, code in files]}
+        try:
+            self._process.stdin.write(json.dumps(request) + '\n')
+            self._process.stdin.flush()
+            line = self._process.stdout.readline()
+        except BrokenPipeError:
+            line = ''
+        if not line:
+            self.close()
+            raise RuntimeError("ESLint worker exited unexpectedly")
+
+        response = json.loads(line)
+        if response.get('error'):
+            raise RuntimeError(f"ESLint worker failed: {response['error']}")
+        return [result['messages'] for result in response['results']]
+
+    def close(self):
+        if self._process is None:
+            return
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+
+_worker = None
+_worker_unavailable = False
+
+
+def get_eslint_worker():
+    """Shared worker, started on first use. Returns None when Node.js is not installed."""
+    global _worker, _worker_unavailable
+    if _worker is None and not _worker_unavailable:
+        worker = ESLintWorker()
+        try:
+            worker._start()
+        except FileNotFoundError:
+            logger.warning(f"'{worker.node}' not found, skipping ESLint checks")
+            _worker_unavailable = True
+            return None
+        _worker = worker
+        atexit.register(worker.close)
+    return _worker
+
+
+def format_lint_message(message):
+    location = f"line {message['line']}:{message['column']}" if message.get('line') else "file"
+    if message.get('fatal'):
+        return f"Syntax error at {location}: {message['message']}"
+    level = 'error' if message['severity'] == 2 else 'warning'
+    return f"ESLint {level} at {location}: {message['message']} ({message['ruleId']})"
+
+# Identifiers, optionally chained with member access (`module.exports`)
+TOKEN_PATTERN = re.compile(r'[A-Za-z_$][\w$]*(?:\s*\.\s*[A-Za-z_$][\w$]*)*')
+CAMEL_CASE_PATTERN = re.compile(r'[a-z][a-zA-Z0-9]*')
+IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_$][\w$]*')
+DECLARATION_KEYWORDS = ('let', 'const', 'var', 'function')
+MAX_LINE_LENGTH = 80
+
+
+class CodeIndex:
+    """
+    A generated file tokenized in one pass: where each identifier (lower
+    cased) occurs, member accesses, declarations and per-line layout facts.
+    Every check reads from the index instead of rescanning the source.
+    """
+
+    def __init__(self, code):
+        self.code = code
+        self.identifiers = {}
+        self.members = set()
+        self.objects = set()
+        self.declarations = []
+        self.misindented_lines = []
+        self.long_lines = []
+        self.has_jsdoc = False
+        self.ends_with_newline = code.endswith('\n')
+
+        previous = None
+        jsdoc_open = False
+        for line_number, line in enumerate(code.split('\n'), 1):
+            if line.startswith(' ') and not line.startswith('  '):
+                self.misindented_lines.append(line_number)
+            if len(line) > MAX_LINE_LENGTH:
+                self.long_lines.append(line_number)
+
+            if not self.has_jsdoc:
+                start = 0
+                if not jsdoc_open:
+                    start = line.find('/**')
+                    jsdoc_open = start != -1
+                    start += 3
+                if jsdoc_open and line.find('*/', start) != -1:
+                    self.has_jsdoc = True
+
+            last_end = 0
+            for match in TOKEN_PATTERN.finditer(line):
+                parts = [part.strip() for part in match.group().split('.')]
+                # `const name`, `function name`; not `function (` or `const {`
+                if previous in DECLARATION_KEYWORDS and not line[last_end:match.start()].strip():
+                    self.declarations.append(parts[0])
+                previous = parts[-1]
+                last_end = match.end()
+                for part in parts:
+                    self.identifiers.setdefault(part.lower(), []).append(line_number)
+                for obj, member in zip(parts, parts[1:]):
+                    self.objects.add(obj)
+                    self.members.add(f"{obj}.{member}")
+
+    def contains(self, word):
+        """Whether `word` occurs as an identifier, ignoring case."""
+        return word.lower() in self.identifiers
+
+    def contains_fragment(self, fragment):
+        """Whether any identifier contains `fragment`, ignoring case."""
+        fragment = fragment.lower()
+        return any(fragment in identifier for identifier in self.identifiers)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_index(code):
+    return CodeIndex(code)
+
+def _index(code):
+    # Cached, so the checks of one file called one after another share an index
+    return code if isinstance(code, CodeIndex) else _cached_index(code)
+
+
+class ReviewEngine:
+    """
+    Runs every heuristic check against a CodeIndex. The schema and
+    middleware lookups are built once when the engine is created, so
+    reviewing a file costs time in proportion to the file, not to the
+    size of db_schema.json.
+    """
+
+    def __init__(self, db_schema=None, middleware_list=None):
+        self.db_schema = db_schema
+        self.middleware_list = middleware_list
+        self.tables = {}
+        for table, details in (db_schema or {}).get('tables', {}).items():
+            self.tables[table.lower()] = (table, [(column['name'].lower(), column['name'])
+                                                  for column in details.get('columns', [])])
+        self.middleware = {}
+        self.middleware_fragments = []
+        for middleware in middleware_list or []:
+            if IDENTIFIER_PATTERN.fullmatch(middleware):
+                self.middleware.setdefault(middleware.lower(), []).append(middleware)
+            else:
+                # Names such as 'express-validator' never form a single identifier
+                self.middleware_fragments.append(middleware)
+
+    def naming_issues(self, index):
+        return [f"'{name}' is not in camelCase" for name in index.declarations if not CAMEL_CASE_PATTERN.fullmatch(name)]
+
+    def formatting_issues(self, index):
+        issues = []
+        if index.misindented_lines:
+            issues.append("Indentation should be 2 spaces")
+        if index.long_lines:
+            issues.append(f"Some lines are longer than {MAX_LINE_LENGTH} characters")
+        if not index.ends_with_newline:
+            issues.append("File should end with a newline")
+        return issues
+
+    def documentation_issues(self, index):
+        return [] if index.has_jsdoc else ["Missing JSDoc comments"]
+
+    def structure_issues(self, index, file_type):
+        issues = []
+        if file_type == 'route':
+            if 'router' not in index.objects:
+                issues.append("Route file doesn't use Express router")
+            if 'module.exports' not in index.members:
+                issues.append("Route file doesn't export the router")
+        elif file_type == 'controller':
+            if 'exports' not in index.objects and 'module.exports' not in index.members:
+                issues.append("Controller doesn't export any functions")
+        elif file_type == 'service':
+            if not index.contains('class') and not index.contains('function'):
+                issues.append("Service file doesn't define any classes or functions")
+
+        if not index.contains('async'):
+            issues.append("Consider using async/await for asynchronous operations")
+        if not index.contains('try'):
+            issues.append("Consider adding try-catch blocks for error handling")
+        return issues
+
+    def suggestions(self, index, file_type):
+        suggestions = []
+        if file_type in ['controller', 'service'] and not index.contains('await'):
+            suggestions.append("Consider using async/await for database operations")
+        if file_type == 'route' and not index.contains_fragment('validate'):
+            suggestions.append("Consider adding input validation to the route")
+        if file_type in ['controller', 'service'] and not index.contains_fragment('transaction'):
+            suggestions.append("Consider using database transactions for data integrity")
+        return suggestions
+
+    def schema_issues(self, index):
+        issues = []
+        for identifier in index.identifiers:
+            if identifier not in self.tables:
+                continue
+            table, columns = self.tables[identifier]
+            for column_lower, column in columns:
+                if column_lower not in index.identifiers:
+                    issues.append(f"The column '{column}' of table '{table}' is defined in the schema but not used in the code")
+        return issues
+
+    def used_middleware(self, index):
+        used = [name for identifier in index.identifiers for name in self.middleware.get(identifier, [])]
+        if self.middleware_fragments:
+            code = index.code.lower()
+            used.extend(name for name in self.middleware_fragments if name.lower() in code)
+        return used
+
+    def review(self, code, file_type):
+        """All heuristic checks for one file, from a single tokenizing pass."""
+        index = _index(code)
+        return {
+            'issues': self.structure_issues(index, file_type),
+            'naming': self.naming_issues(index),
+            'formatting': self.formatting_issues(index),
+            'documentation': self.documentation_issues(index),
+            'suggestions': self.suggestions(index, file_type),
+            'schema': self.schema_issues(index),
+            'middleware': self.used_middleware(index),
+        }
+
+
+_engine = None
+
+def get_review_engine(db_schema=None, middleware_list=None):
+    """
+    Shared engine for the run. It is only rebuilt when given a schema or
+    middleware list other than the ones it was built from, so checking
+    many files builds the lookups once.
+    """
+    global _engine
+    if _engine is None:
+        _engine = ReviewEngine(db_schema, middleware_list)
+    elif (db_schema is not None and db_schema is not _engine.db_schema) or \
+            (middleware_list is not None and middleware_list is not _engine.middleware_list):
+        _engine = ReviewEngine(_engine.db_schema if db_schema is None else db_schema,
+                               _engine.middleware_list if middleware_list is None else middleware_list)
+    return _engine
 
 def check_naming_conventions(code):
-    issues = []
-    # Check for camelCase variables and functions
-    variable_pattern = re.compile(r'\b[a-z][a-zA-Z0-9]*\b')
-    variables = re.findall(r'\b(?:let|const|var)\s+(\w+)', code)
-    functions = re.findall(r'\bfunction\s+(\w+)', code)
-    
-    for var in variables + functions:
-        if not variable_pattern.match(var):
-            issues.append(f"'{var}' is not in camelCase")
-    
-    return issues
+    return get_review_engine().naming_issues(_index(code))
 
 def check_formatting(code):
-    issues = []
-    lines = code.split('\n')
-    
-    # Check indentation
-    if any(line.startswith(' ') and not line.startswith('  ') for line in lines):
-        issues.append("Indentation should be 2 spaces")
-    
-    # Check line length
-    if any(len(line) > 80 for line in lines):
-        issues.append("Some lines are longer than 80 characters")
-    
-    # Check newline at EOF
-    if not code.endswith('\n'):
-        issues.append("File should end with a newline")
-    
-    return issues
+    return get_review_engine().formatting_issues(_index(code))
 
 def check_documentation(code):
-    issues = []
-    
-    # Check for JSDoc comments
-    if not re.search(r'/\*\*[\s\S]*?\*/', code):
-        issues.append("Missing JSDoc comments")
-    
-    return issues
-
-def review_code(code, file_type):
-    issues = []
-    
-    # General checks
-    try:
-        ast.parse(code)
-    except SyntaxError as e:
-        issues.append(f"Syntax error: {str(e)}")
-    
-    if 'TODO' in code:
-        issues.append("Code contains TODO comments")
-    
-    if 'console.log' in code:
-        issues.append("Code contains console.log statements")
-    
-    # File-specific checks
-    if file_type == 'route':
-        if 'router.' not in code:
-            issues.append("Route file doesn't use Express router")
-        if 'module.exports' not in code:
-            issues.append("Route file doesn't export the router")
-    elif file_type == 'controller':
-        if 'exports.' not in code and 'module.exports' not in code:
-            issues.append("Controller doesn't export any functions")
-    elif file_type == 'service':
-        if 'class' not in code.lower() and 'function' not in code.lower():
-            issues.append("Service file doesn't define any classes or functions")
-    
-    # Check for common patterns
-    if 'async' not in code:
-        issues.append("Consider using async/await for asynchronous operations")
-    if 'try' not in code:
-        issues.append("Consider adding try-catch blocks for error handling")
-    
-    return issues
+    return get_review_engine().documentation_issues(_index(code))
+
+def review_files(files, engine=None):
+    """
+    Review several generated files with a single round trip to the ESLint
+    worker. `files` is a list of (code, file_type, name) tuples; returns the
+    results of every check for each file in the same order, as returned by
+    ReviewEngine.review with the lint messages first in 'issues'. Without
+    an engine the shared one from get_review_engine is used.
+    """
+    engine = engine or get_review_engine()
+    with get_tracer().span('review', 'review', files=len(files)):
+        lint_messages = [[] for _ in files]
+        worker = get_eslint_worker()
+        if worker is not None and files:
+            try:
+                with get_tracer().span('eslint', 'review', files=len(files)):
+                    lint_messages = worker.lint([(name or f"generated/{file_type}.js", code) for code, file_type, name in files])
+            except RuntimeError as e:
+                logger.error(f"Error running ESLint: {str(e)}")
+
+        reviews = []
+        for (code, file_type, name), messages in zip(files, lint_messages):
+            review = engine.review(code, file_type)
+            review['issues'] = [format_lint_message(message) for message in messages] + review['issues']
+            reviews.append(review)
+        return reviews
+
+def review_code(code, file_type, name=None):
+    return review_files([(code, file_type, name)])[0]
+
+def check_file_structure(code, file_type):
+    return get_review_engine().structure_issues(_index(code), file_type)
 
 def suggest_improvements(code, file_type):
-    suggestions = []
-    
-    if file_type in ['controller', 'service'] and 'await' not in code:
-        suggestions.append("Consider using async/await for database operations")
-    
-    if file_type == 'route' and 'validate' not in code.lower():
-        suggestions.append("Consider adding input validation to the route")
-    
-    if 'transaction' not in code.lower() and file_type in ['controller', 'service']:
-        suggestions.append("Consider using database transactions for data integrity")
-    
-    return suggestions
+    return get_review_engine().suggestions(_index(code), file_type)
 
 def check_db_schema_usage(code, db_schema):
-    issues = []
-    for table, details in db_schema.get('tables', {}).items():
-        if table.lower() not in code.lower():
-            continue
-        for column in details.get('columns', []):
-            if column['name'].lower() not in code.lower():
-                issues.append(f"The column '{column['name']}' of table '{table}' is defined in the schema but not used in the code")
-    return issues
+    return get_review_engine(db_schema=db_schema).schema_issues(_index(code))
 
 def check_middleware_usage(code, middleware_list):
-    used_middleware = []
-    for middleware in middleware_list:
-        if middleware.lower() in code.lower():
-            used_middleware.append(middleware)
-    return used_middleware
\ No newline at end of file
+    return get_review_engine(middleware_list=middleware_list).used_middleware(_index(code))
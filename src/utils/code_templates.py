@@ -0,0 +1,195 @@
+# src/utils/code_templates.py
+
+import posixpath
+import re
+from typing import Any, Dict, List
+from src.utils.contract import PATH_PARAMETER, index_modules, require_path
+
+# Bump when the rendered files change so build manifests rebuild them
+TEMPLATE_VERSION = 2
+
+# Layout of the project's .prettierrc, so rendered files pass review as they are
+INDENT = '  '
+PRINT_WIDTH = 80
+
+
+def model_name(table: str) -> str:
+    """Sequelize model name of a table, e.g. `LearningHub` for `learning_hubs`."""
+    words = [word for word in re.split(r'[^A-Za-z0-9]+', table) if word]
+    if not words:
+        return 'Model'
+    last = words[-1]
+    if last.endswith('ies'):
+        last = last[:-3] + 'y'
+    elif re.search(r'(?:ss|x|ch|sh)es$', last):
+        last = last[:-2]
+    elif last.endswith('s') and not last.endswith('ss'):
+        last = last[:-1]
+    words[-1] = last
+    return ''.join(word[0].upper() + word[1:] for word in words)
+
+
+def primary_key(db_schema: Dict[str, Any], table: str) -> str:
+    columns = db_schema.get('tables', {}).get(table, {}).get('columns', [])
+    return next((column['name'] for column in columns if column.get('primary_key')), 'id')
+
+
+def _destructure(names: List[str]) -> str:
+    return f"{{ {', '.join(names)} }}"
+
+
+def _object(prefix: str, items: List[str], suffix: str, depth: int = 0) -> List[str]:
+    """`prefix{ items }suffix` on one line if it fits, else one item per line as prettier breaks it."""
+    indent = INDENT * depth
+    line = f"{indent}{prefix}{_destructure(items) if items else '{}'}{suffix}"
+    if len(line) <= PRINT_WIDTH:
+        return [line]
+    return [f"{indent}{prefix}{{"] + [f"{indent}{INDENT}{item}," for item in items] + [f"{indent}}}{suffix}"]
+
+
+def _call(prefix: str, args: List[str], suffix: str, depth: int = 0) -> List[str]:
+    """`prefix(args)suffix` on one line if it fits, else one argument per line."""
+    indent = INDENT * depth
+    line = f"{indent}{prefix}({', '.join(args)}){suffix}"
+    if len(line) <= PRINT_WIDTH:
+        return [line]
+    return ([f"{indent}{prefix}("] + [f"{indent}{INDENT}{arg}," for arg in args[:-1]]
+            + [f"{indent}{INDENT}{args[-1]}", f"{indent}){suffix}"])
+
+
+def _defined(names: List[str]) -> List[str]:
+    # Only the fields the caller sent, so updates and filters leave the rest alone
+    return _object('const values = ', names, ';') + [
+        'for (const field of Object.keys(values)) {',
+        f"{INDENT}if (values[field] === undefined) {{",
+        f"{INDENT * 2}delete values[field];",
+        f"{INDENT}}}",
+        '}',
+    ]
+
+
+def _header(file_path: str, description: str) -> List[str]:
+    return ['/**', f" * {posixpath.basename(file_path)}", ' *', f" * {description}", ' */', '']
+
+
+def render_route(route_spec: Dict[str, Any], contract: Dict[str, Any]) -> str:
+    route = contract['route']
+    lines = _header(route['file'], route_spec['route_details'].get('description', ''))
+    lines += [
+        "const express = require('express');",
+        "const router = express.Router();",
+        f"const controller = require('{route['controller']['require']}');",
+    ]
+    lines += [f"const {middleware['name']} = require('{middleware['require']}');" for middleware in route['middleware']]
+    handlers = [middleware['name'] for middleware in route['middleware']] + [f"controller.{route['controller']['handler']}"]
+    lines.append('')
+    lines += _call(f"router.{route['method'].lower()}", [f"'{route['path']}'"] + handlers, ';')
+    lines += ['', 'module.exports = router;']
+    return '\n'.join(lines) + '\n'
+
+
+def render_controller(route_spec: Dict[str, Any], contract: Dict[str, Any]) -> str:
+    controller = contract['controller']
+    details = route_spec['route_details']
+    method = details['method'].upper()
+    handler = controller['exports'][0]['name']
+    path_names = [match.group(1) or match.group(2) for match in PATH_PARAMETER.finditer(details['path'])]
+    parameters = contract['service']['exports'][0]['parameters']
+    other_names = [name for name in parameters if name not in path_names]
+    source = 'req.query' if method in ('GET', 'DELETE') else 'req.body'
+    status = 201 if method == 'POST' else 200
+
+    lines = _header(controller['file'], details.get('description', ''))
+    lines += [
+        f"const service = require('{controller['service']['require']}');",
+        '',
+        '/**',
+        f" * {details.get('description', '')}",
+        ' *',
+        ' * @param {object} req - Express request object.',
+        ' * @param {object} res - Express response object used to send the response.',
+        ' * @param {function} next - Express next middleware function for error handling.',
+        ' */',
+        f"const {handler} = async (req, res, next) => {{",
+        f"{INDENT}try {{",
+    ]
+    if path_names:
+        lines += _object('const ', path_names, ' = req.params;', 2)
+    if other_names:
+        lines += _object('const ', other_names, f" = {source};", 2)
+    call = f"const result = await service.{controller['service']['function']}("
+    lines += _object(call, parameters, ');', 2) if parameters else [f"{INDENT * 2}{call});"]
+    lines += [
+        f"{INDENT * 2}res.status({status}).json(result);",
+        f"{INDENT}}} catch (error) {{",
+        f"{INDENT * 2}next(error);",
+        f"{INDENT}}}",
+        '};',
+        '',
+        f"module.exports = {{ {handler} }};",
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def render_service(route_spec: Dict[str, Any], contract: Dict[str, Any], db_schema: Dict[str, Any],
+                   project_structure: Dict[str, Any]) -> str:
+    service = contract['service']
+    details = route_spec['route_details']
+    method = details['method'].upper()
+    function = service['exports'][0]
+    table = service['tables'][0]
+    model = model_name(table)
+    key = primary_key(db_schema, table)
+    path_names = [match.group(1) or match.group(2) for match in PATH_PARAMETER.finditer(details['path'])]
+    fields = [name for name in function['parameters'] if name not in path_names]
+    record_id = path_names[0] if path_names else None
+    # The models directory's index.js, wherever the project structure puts it
+    models = next((module[:-len('/index')] for module in index_modules(project_structure).values()
+                   if module.endswith('models/index')), 'models')
+
+    lines = _header(service['file'], details.get('description', ''))
+    # Reads and deletes of one record only use its id
+    uses_fields = method in ('POST', 'PUT', 'PATCH') or (method == 'GET' and not record_id)
+    parameters = function['parameters'] if uses_fields else path_names
+    lines += [f"const {{ {model} }} = require('{require_path(service['file'], models)}');", '']
+    signature = f"const {function['name']} = async ("
+    lines += _object(signature, parameters, ') => {') if parameters else [f"{signature}) => {{"]
+    body = []
+    if record_id and method != 'POST':
+        body += [
+            f"const record = await {model}.findByPk({record_id});",
+            'if (!record) {',
+            f"{INDENT}const error = new Error('{model} not found');",
+            f"{INDENT}error.statusCode = 404;",
+            f"{INDENT}throw error;",
+            '}',
+        ]
+    values = 'values' if fields else '{}'
+    if fields and uses_fields:
+        body += _defined(fields)
+    if method == 'POST':
+        body.append(f"return {model}.create({values});")
+    elif method in ('PUT', 'PATCH'):
+        body += [f"await record.update({values});", 'return record;']
+    elif method == 'DELETE':
+        body.append('await record.destroy();')
+        body += _object('return ', [f"message: '{model} deleted'", f"{key}: {record_id}"], ';', 0)
+    elif record_id:
+        body.append('return record;')
+    else:
+        body.append(f"return {model}.findAll({{ where: {values} }});")
+    lines += [INDENT + line for line in body]
+    lines += ['};', '', f"module.exports = {{ {function['name']} }};"]
+    return '\n'.join(lines) + '\n'
+
+
+def render_file(stage: str, route_spec: Dict[str, Any], contract: Dict[str, Any], db_schema: Dict[str, Any],
+                project_structure: Dict[str, Any]) -> str:
+    """The route, controller or service file of a plain CRUD spec, rendered without an LLM call."""
+    if stage == 'route':
+        return render_route(route_spec, contract)
+    if stage == 'controller':
+        return render_controller(route_spec, contract)
+    if stage == 'service':
+        return render_service(route_spec, contract, db_schema, project_structure)
+    raise ValueError(f"No code template for stage: {stage}")
@@ -0,0 +1,193 @@
+# src/utils/contract.py
+
+import logging
+import posixpath
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from src.utils.openapi_generator import operation_id
+
+logger = logging.getLogger(__name__)
+
+# Bump when the contracts change so build manifests rebuild them
+CONTRACT_VERSION = 2
+
+# Where each kind of module lives when project_structure.json doesn't say
+DEFAULT_DIRECTORIES = {
+    'route': 'routes',
+    'controller': 'controllers',
+    'service': 'services',
+    'middleware': 'middleware',
+    'util': 'utils',
+}
+DEFAULT_FILE_NAMES = {
+    'route': '{name}Route.js',
+    'controller': '{name}Controller.js',
+    'service': '{name}Service.js',
+}
+# Directories that mark the backend root in project_structure.json
+ROOT_MARKERS = ('routes', 'controllers', 'services')
+PATH_PARAMETER = re.compile(r':(\w+)|\{(\w+)\}')
+
+
+class ContractMismatch(Exception):
+    """Raised when generated files don't match the interface contract they were built from."""
+
+
+def _module_name(name: str) -> str:
+    return re.sub(r'\.js$', '', posixpath.basename(str(name)))
+
+
+def _camel_case(name: str) -> str:
+    parts = [part for part in re.split(r'[^A-Za-z0-9]+', name) if part]
+    if not parts:
+        return name
+    return parts[0][0].lower() + parts[0][1:] + ''.join(part[0].upper() + part[1:] for part in parts[1:])
+
+
+def find_backend_root(project_structure: Dict[str, Any]) -> Dict[str, Any]:
+    """The directory of project_structure.json holding the routes, controllers and services."""
+    pending = [project_structure]
+    while pending:
+        node = pending.pop(0)
+        if not isinstance(node, dict):
+            continue
+        if any(marker in node for marker in ROOT_MARKERS):
+            return node
+        pending.extend(node.values())
+    return {}
+
+
+def index_modules(project_structure: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Every JavaScript module of the backend, keyed by its lowercased name,
+    with its path relative to the backend root and without `.js`.
+    """
+    modules = {}
+
+    def visit(node, directory):
+        if isinstance(node, dict):
+            for name, child in node.items():
+                visit(child, directory if name == '.' else posixpath.join(directory, name))
+        elif isinstance(node, list):
+            for entry in node:
+                if isinstance(entry, str) and entry.endswith('.js'):
+                    modules.setdefault(_module_name(entry).lower(), posixpath.join(directory, _module_name(entry)))
+
+    visit(find_backend_root(project_structure), '')
+    return modules
+
+
+def require_path(from_file: str, module: str) -> str:
+    """The `require()` path of `module` from `from_file`, both relative to the backend root."""
+    path = posixpath.relpath(module, posixpath.dirname(from_file) or '.')
+    return path if path.startswith('.') else f"./{path}"
+
+
+def build_contract(route_spec: Dict[str, Any], project_structure: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The interface the route, controller and service files of a spec agree
+    on, derived from the spec and the project structure without an LLM
+    call: file locations, the controller handler, the service function and
+    its parameters, and the require paths between them and to the
+    middleware and utils the spec uses.
+    """
+    details = route_spec['route_details']
+    modules = index_modules(project_structure)
+    name = operation_id(route_spec)
+    file_names = route_spec.get('file_names', {})
+
+    files = {}
+    for stage in ('route', 'controller', 'service'):
+        file_name = file_names.get(stage) or DEFAULT_FILE_NAMES[stage].format(name=name)
+        existing = modules.get(_module_name(file_name).lower())
+        files[stage] = f"{existing}.js" if existing else posixpath.join(DEFAULT_DIRECTORIES[stage], file_name)
+
+    def dependency(item, kind, from_file):
+        module_name = _module_name(item)
+        existing = modules.get(module_name.lower())
+        module = existing or posixpath.join(DEFAULT_DIRECTORIES[kind], module_name)
+        return {'name': _camel_case(module_name), 'require': require_path(from_file, module), 'exists': bool(existing)}
+
+    # Path parameters first, then the spec's inputs
+    parameters = [match.group(1) or match.group(2) for match in PATH_PARAMETER.finditer(details['path'])]
+    for field in route_spec.get('input', []) or []:
+        if isinstance(field, dict) and field.get('name') and str(field['name']) not in parameters:
+            parameters.append(str(field['name']))
+    # Named apart so a controller calling its service can't be mistaken for its own handler
+    handler = f"handle{name[0].upper()}{name[1:]}"
+    service_function = name
+    controller_module = files['controller'][:-len('.js')]
+    service_module = files['service'][:-len('.js')]
+
+    return {
+        'version': CONTRACT_VERSION,
+        'route': {
+            'file': files['route'],
+            'method': details['method'].upper(),
+            'path': details['path'],
+            'middleware': [dependency(item, 'middleware', files['route'])
+                           for item in route_spec.get('required_middleware', []) or []],
+            'controller': {'require': require_path(files['route'], controller_module), 'handler': handler},
+        },
+        'controller': {
+            'file': files['controller'],
+            'exports': [{'name': handler, 'signature': f"async function {handler}(req, res, next)"}],
+            'inputs': parameters,
+            'service': {'require': require_path(files['controller'], service_module), 'function': service_function},
+        },
+        'service': {
+            'file': files['service'],
+            'exports': [{'name': service_function, 'parameters': parameters,
+                         'signature': f"async function {service_function}({{ {', '.join(parameters)} }})"}],
+            'tables': list(route_spec.get('required_tables', []) or []),
+            'utils': [dependency(item, 'util', files['service']) for item in route_spec.get('required_utils', []) or []],
+        },
+    }
+
+
+def _requires(code: str, path: str) -> bool:
+    return re.search(rf"""require\(\s*['"]{re.escape(path)}(?:\.js)?['"]\s*\)""", code) is not None
+
+
+def _exports(code: str, name: str) -> bool:
+    name = re.escape(name)
+    return re.search(rf'(?:module\.)?exports\.{name}\b|module\.exports\s*=\s*\{{[^}}]*\b{name}\b', code) is not None
+
+
+def check_consistency(contract: Dict[str, Any], files: Dict[str, Optional[str]]) -> List[Tuple[str, str]]:
+    """
+    Cheap static check that generated files match their contract: the
+    requires, exports and calls it names are present. Returns (stage,
+    problem) pairs; stages missing from `files` are not checked.
+    """
+    problems = []
+    route, controller, service = contract['route'], contract['controller'], contract['service']
+    handler = route['controller']['handler']
+    function = controller['service']['function']
+
+    code = files.get('route')
+    if code is not None:
+        if not _requires(code, route['controller']['require']):
+            problems.append(('route', f"does not require the controller from '{route['controller']['require']}'"))
+        if not re.search(rf'\b{re.escape(handler)}\b', code):
+            problems.append(('route', f"does not use the controller handler {handler}"))
+        if not re.search(rf"\.{route['method'].lower()}\s*\(", code):
+            problems.append(('route', f"does not register a {route['method']} route"))
+
+    code = files.get('controller')
+    if code is not None:
+        for export in controller['exports']:
+            if not _exports(code, export['name']):
+                problems.append(('controller', f"does not export {export['name']}"))
+        if not _requires(code, controller['service']['require']):
+            problems.append(('controller', f"does not require the service from '{controller['service']['require']}'"))
+        if not re.search(rf'\b{re.escape(function)}\s*\(', code):
+            problems.append(('controller', f"does not call the service function {function}"))
+
+    code = files.get('service')
+    if code is not None:
+        for export in service['exports']:
+            if not _exports(code, export['name']):
+                problems.append(('service', f"does not export {export['name']}"))
+
+    return problems
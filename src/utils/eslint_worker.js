@@ -0,0 +1,68 @@
+// src/utils/eslint_worker.js
+//
+// Long-lived lint worker for code_reviewer.py. Reads one JSON request per
+// line on stdin:
+//   {"id": 1, "files": [{"name": "generated/userRoute.js", "code": "..."}]}
+// and answers each with one JSON line on stdout:
+//   {"id": 1, "results": [{"name": "...", "messages": [...]}]}
+// ESLint and the project's .eslintrc.json are loaded once, so a batch of
+// files costs one round trip rather than one Node start per file.
+
+const path = require('path');
+const readline = require('readline');
+const { LegacyESLint } = require('eslint/use-at-your-own-risk');
+
+const eslint = new LegacyESLint({
+  cwd: process.cwd(),
+  overrideConfig: {
+    rules: {
+      'no-console': 'warn',
+      'no-warning-comments': ['warn', { terms: ['todo', 'fixme'] }],
+    },
+  },
+});
+
+async function lintFile(file) {
+  const filePath = path.resolve(process.cwd(), file.name || 'generated/file.js');
+  const [result] = await eslint.lintText(file.code, { filePath });
+  return {
+    name: file.name,
+    messages: result.messages.map((message) => ({
+      ruleId: message.ruleId,
+      severity: message.severity,
+      fatal: Boolean(message.fatal),
+      message: message.message,
+      line: message.line,
+      column: message.column,
+    })),
+  };
+}
+
+async function handle(line) {
+  let request;
+  try {
+    request = JSON.parse(line);
+    const results = [];
+    for (const file of request.files) {
+      results.push(await lintFile(file));
+    }
+    return { id: request.id, results };
+  } catch (error) {
+    return { id: request ? request.id : null, error: String(error.stack || error) };
+  }
+}
+
+const input = readline.createInterface({ input: process.stdin });
+let queue = Promise.resolve();
+
+input.on('line', (line) => {
+  if (!line.trim()) {
+    return;
+  }
+  // Answer requests in the order they arrived
+  queue = queue
+    .then(() => handle(line))
+    .then((response) => {
+      process.stdout.write(JSON.stringify(response) + '\n');
+    });
+});
@@ -0,0 +1,220 @@
+# src/utils/example_index.py
+
+import glob
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lines that start a function-sized snippet of an example file
+SNIPPET_START = re.compile(
+    r'^\s*(?:'
+    r'(?:export\s+)?(?:async\s+)?function\b'
+    r'|(?:export\s+)?(?:const|let|var)\s+\w+\s*=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|\w+\s*=>)'
+    r'|(?:module\.)?exports\.\w+\s*='
+    r'|(?:it|test|beforeEach|afterEach|beforeAll|afterAll)\s*\('
+    r'|(?:router|app)\.\w+\s*\('
+    r')'
+)
+# Blocks that only group snippets; their children are split instead
+CONTAINER_START = re.compile(r'^\s*describe\s*\(')
+COMMENT_LINE = re.compile(r'^\s*(?:/\*\*?|\*|//)')
+# String literals and line comments, which may hold unbalanced braces
+STRIPPED = re.compile(r'''(?:'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*"|`(?:\\.|[^`\\])*`|//.*$)''')
+
+WORD = re.compile(r'[A-Za-z][a-z]+|[A-Z]+(?![a-z])|\d+')
+STOP_WORDS = {
+    'the', 'and', 'for', 'with', 'that', 'this', 'from', 'are', 'not', 'all', 'any', 'its', 'into',
+    'const', 'let', 'var', 'await', 'async', 'return', 'require', 'function', 'new', 'true', 'false',
+    'null', 'undefined', 'module', 'exports', 'should', 'expect', 'res', 'req', 'next', 'status',
+}
+
+DEFAULT_TOP_K = 3
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words of `text`, splitting camelCase, snake_case, kebab-case and paths."""
+    return [word for word in (match.lower() for match in WORD.findall(text))
+            if len(word) > 2 and word not in STOP_WORDS]
+
+
+def spec_query(route_spec: Dict[str, Any]) -> str:
+    """The parts of a spec that say what its examples should look like."""
+    details = route_spec.get('route_details', {})
+    parts = [details.get('method', ''), details.get('path', ''), details.get('description', '')]
+    for step in route_spec.get('logical_steps', []) or []:
+        if isinstance(step, dict):
+            parts.extend([step.get('step', ''), step.get('description', '')])
+    for field in ('required_middleware', 'required_utils', 'required_tables'):
+        parts.extend(str(item) for item in route_spec.get(field, []) or [])
+    parts.extend(str(item.get('name', '')) for item in route_spec.get('input', []) or [] if isinstance(item, dict))
+    return ' '.join(str(part) for part in parts)
+
+
+def split_into_snippets(code: str) -> List[Dict[str, Any]]:
+    """
+    Split a JavaScript file at function boundaries into consecutive parts.
+    Snippets (functions, handlers, route registrations and test cases, each
+    with the comments right above it) are marked `snippet`; the code around
+    them, such as requires, `describe(` lines and exports, is `glue`.
+    Joining every part's text gives back the file.
+    """
+    lines = code.splitlines(keepends=True)
+    parts = []
+    depth = 0
+    start = None
+    start_depth = 0
+    opened = False
+    comment_start = None
+    glue_start = 0
+
+    for i, line in enumerate(lines):
+        stripped = STRIPPED.sub('', line)
+        if start is None:
+            if SNIPPET_START.match(line) and not CONTAINER_START.match(line):
+                start = comment_start if comment_start is not None else i
+                start_depth = depth
+                opened = False
+                if start > glue_start:
+                    parts.append({'kind': 'glue', 'text': ''.join(lines[glue_start:start])})
+            elif COMMENT_LINE.match(line):
+                if comment_start is None:
+                    comment_start = i
+            elif line.strip():
+                comment_start = None
+
+        depth += stripped.count('{') + stripped.count('(') - stripped.count('}') - stripped.count(')')
+        if start is not None:
+            opened = opened or depth > start_depth
+            if depth <= start_depth and (opened or stripped.rstrip().endswith(';')):
+                parts.append({'kind': 'snippet', 'text': ''.join(lines[start:i + 1])})
+                start = None
+                comment_start = None
+                glue_start = i + 1
+
+    if start is not None:
+        # Unbalanced file: keep the rest as one snippet
+        parts.append({'kind': 'snippet', 'text': ''.join(lines[start:])})
+    elif glue_start < len(lines):
+        parts.append({'kind': 'glue', 'text': ''.join(lines[glue_start:])})
+    return parts
+
+
+class BM25:
+    """Okapi BM25 ranking over tokenized documents."""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(document) for document in documents]
+        self.lengths = [len(document) for document in documents]
+        self.average_length = sum(self.lengths) / len(documents) if documents else 0
+        frequencies = Counter(term for counts in self.term_counts for term in counts)
+        self.idf = {term: math.log(1 + (len(documents) - df + 0.5) / (df + 0.5)) for term, df in frequencies.items()}
+
+    def scores(self, query: Iterable[str]) -> List[float]:
+        terms = [term for term in set(query) if term in self.idf]
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            scores.append(sum(
+                self.idf[term] * counts[term] * (self.k1 + 1) / (counts[term] + norm)
+                for term in terms if term in counts
+            ))
+        return scores
+
+
+class ExampleIndex:
+    """
+    Example files of each stage, split into function-sized snippets and
+    indexed with BM25, so a prompt can carry the few snippets most relevant
+    to a spec instead of every example file in full. Selected snippets are
+    rendered with the code around them (requires, `describe` blocks,
+    exports) so they still read like an example file.
+    """
+
+    def __init__(self, examples: Dict[str, Dict[str, str]]):
+        # stage -> list of (file name, parts)
+        self.files = {}
+        # stage -> list of (file position, part position) of every snippet
+        self.snippets = {}
+        self.rankers = {}
+        self._selections = {}
+        for stage, files in examples.items():
+            self.files[stage] = [(name, split_into_snippets(code)) for name, code in sorted(files.items())]
+            self.snippets[stage] = [
+                (f, p) for f, (_, parts) in enumerate(self.files[stage])
+                for p, part in enumerate(parts) if part['kind'] == 'snippet'
+            ]
+            self.rankers[stage] = BM25([tokenize(self.files[stage][f][1][p]['text']) for f, p in self.snippets[stage]])
+
+    @classmethod
+    def from_directory(cls, directory: str, stages: Iterable[str]) -> 'ExampleIndex':
+        """
+        Index `example_<stage>.js` in `directory` plus every `.js` file under
+        `<directory>/<stage>/`, where a library of further examples can grow.
+        """
+        examples = {}
+        for stage in stages:
+            paths = [os.path.join(directory, f"example_{stage}.js")]
+            paths += sorted(glob.glob(os.path.join(directory, stage, '**', '*.js'), recursive=True))
+            examples[stage] = {}
+            for path in paths:
+                try:
+                    with open(path, 'r') as f:
+                        examples[stage][os.path.relpath(path, directory)] = f.read()
+                except FileNotFoundError:
+                    continue
+                except Exception as e:
+                    logger.error(f"Error loading example file {path}: {str(e)}")
+        index = cls(examples)
+        logger.debug(f"Indexed {sum(len(refs) for refs in index.snippets.values())} example snippets from {directory}")
+        return index
+
+    def select(self, stage: str, query: str, top_k: int = DEFAULT_TOP_K) -> Optional[str]:
+        """
+        The `top_k` snippets of `stage` most relevant to `query`, rendered as
+        example files. None when the stage has no indexed examples.
+        """
+        if not self.files.get(stage):
+            return None
+        key = (stage, query, top_k)
+        if key in self._selections:
+            return self._selections[key]
+
+        refs = self.snippets[stage]
+        scores = self.rankers[stage].scores(tokenize(query))
+        ranked = sorted(range(len(refs)), key=lambda i: (-scores[i], i))[:top_k]
+        chosen = {}
+        for i in ranked:
+            file_position, part_position = refs[i]
+            chosen.setdefault(file_position, set()).add(part_position)
+        if not chosen:
+            # No snippets to rank: use the first file as it is
+            chosen = {0: set(range(len(self.files[stage][0][1])))}
+
+        rendered = []
+        for file_position in sorted(chosen):
+            name, parts = self.files[stage][file_position]
+            text = []
+            skipped = False
+            for position, part in enumerate(parts):
+                if part['kind'] == 'glue' or position in chosen[file_position]:
+                    text.append(part['text'])
+                    skipped = False
+                elif not skipped:
+                    # One marker per run of left-out snippets
+                    text.append("// ...\n")
+                    skipped = True
+            rendered.append((name, ''.join(text)))
+
+        if len(rendered) == 1:
+            selection = rendered[0][1]
+        else:
+            selection = '\n'.join(f"// Example: {name}\n{text}" for name, text in rendered)
+        self._selections[key] = selection
+        return selection
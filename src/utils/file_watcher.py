@@ -0,0 +1,68 @@
+# src/utils/file_watcher.py
+
+import asyncio
+import glob
+import logging
+import os
+from typing import Dict, Iterable, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 0.5
+
+
+class FileWatcher:
+    """
+    Watches files, directories and glob patterns for changes by polling
+    their modification times and sizes, so it needs no platform file
+    notification support.
+    """
+
+    def __init__(self, paths: Iterable[str], interval: float = DEFAULT_POLL_INTERVAL):
+        self.paths = list(paths)
+        self.interval = interval
+        self._snapshot = self.snapshot()
+
+    def _files(self):
+        for path in self.paths:
+            if glob.has_magic(path):
+                yield from glob.glob(path, recursive=True)
+            elif os.path.isdir(path):
+                for directory, _, names in os.walk(path):
+                    for name in names:
+                        yield os.path.join(directory, name)
+            else:
+                yield path
+
+    def snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """(mtime in ns, size) of every watched file that exists."""
+        files = {}
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files[os.path.normpath(path)] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def changes(self) -> Set[str]:
+        """Files added, modified or removed since the last call."""
+        snapshot = self.snapshot()
+        changed = {path for path in set(snapshot) | set(self._snapshot) if snapshot.get(path) != self._snapshot.get(path)}
+        self._snapshot = snapshot
+        return changed
+
+    async def wait(self) -> Set[str]:
+        """
+        Wait for the next change and return the changed files. Changes are
+        collected until the files have been quiet for one interval, so an
+        editor saving several files at once yields a single batch.
+        """
+        changed = set()
+        while True:
+            await asyncio.sleep(self.interval)
+            new = self.changes()
+            if new:
+                changed |= new
+            elif changed:
+                return changed
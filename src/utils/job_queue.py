@@ -0,0 +1,374 @@
+# src/utils/job_queue.py
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from src.utils.build_manifest import hash_content, spec_key
+from src.utils.stage_graph import Stage, StageGraph
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_STORE_PATH = '.jobs/jobs.sqlite3'
+# Seconds a claimed job stays with its worker before other workers may take it over
+DEFAULT_LEASE_SECONDS = 900
+DEFAULT_MAX_ATTEMPTS = 3
+
+JOB_STATUSES = ('pending', 'running', 'done', 'failed', 'skipped')
+
+
+def worker_name():
+    """Identifies a worker process across the machines sharing a job store."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    Job store backed by a SQLite file, with one job per spec and stage. Each
+    job tracks its status, attempts, output hash and timings, and the output
+    itself so the stages that depend on it can run in any process.
+
+    Workers claim a job only once the jobs it depends on are done; a claim
+    is a lease that other workers may take over once it expires or its
+    process on this machine has died. Several processes, or machines sharing
+    the file, can work through the same store.
+    """
+
+    def __init__(self, path=DEFAULT_JOB_STORE_PATH, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit, so each claim can take the write lock with BEGIN IMMEDIATE
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS specs ("
+                "spec_key TEXT PRIMARY KEY, spec_index INTEGER NOT NULL, spec TEXT NOT NULL, spec_hash TEXT);"
+                "CREATE TABLE IF NOT EXISTS stage_deps (stage TEXT NOT NULL, dep TEXT NOT NULL, "
+                "PRIMARY KEY (stage, dep));"
+                "CREATE TABLE IF NOT EXISTS options (name TEXT PRIMARY KEY, value TEXT NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "spec_key TEXT NOT NULL, stage TEXT NOT NULL, spec_index INTEGER NOT NULL, "
+                "position INTEGER NOT NULL, status TEXT NOT NULL DEFAULT 'pending', "
+                "attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, lease_expires REAL, "
+                "output_hash TEXT, result TEXT, error TEXT, queued_at REAL NOT NULL, "
+                "started_at REAL, finished_at REAL, duration REAL, "
+                "PRIMARY KEY (spec_key, stage));"
+                "CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, spec_index, position);"
+            )
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(specs)")}
+            if 'spec_hash' not in columns:
+                # Stores created before specs were hashed
+                self._conn.execute("ALTER TABLE specs ADD COLUMN spec_hash TEXT")
+        return self._conn
+
+    def _read(self, sql, params=()):
+        # Workers call the store from several threads; the connection is used by one at a time
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def _transaction(self, work):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    def reset(self):
+        """Forget every job, spec and option of the previous run."""
+        def work(conn):
+            for table in ('jobs', 'specs', 'stage_deps', 'options'):
+                conn.execute(f"DELETE FROM {table}")
+        self._transaction(work)
+
+    def set_options(self, **options):
+        """Run options every worker of the store follows, e.g. `force`."""
+        def work(conn):
+            conn.executemany("INSERT OR REPLACE INTO options (name, value) VALUES (?, ?)",
+                             [(name, json.dumps(value)) for name, value in options.items()])
+        self._transaction(work)
+
+    def options(self):
+        rows = self._read("SELECT name, value FROM options")
+        return {row['name']: json.loads(row['value']) for row in rows}
+
+    def enqueue(self, route_specs, stage_inputs, prune=False):
+        """
+        Add a pending job for every stage of every spec. Jobs of specs already
+        in the store are left as they are, so re-enqueuing the same specs
+        resumes them; a spec whose content changed gets all its jobs anew.
+        With `prune`, the specs of the store missing from `route_specs` and
+        their jobs are dropped. Returns the number of jobs added.
+        """
+        order = StageGraph([Stage(name, None, deps) for name, deps in stage_inputs.items()]).order
+        now = time.time()
+
+        def work(conn):
+            conn.executemany("INSERT OR IGNORE INTO stage_deps (stage, dep) VALUES (?, ?)",
+                             [(stage, dep) for stage, deps in stage_inputs.items() for dep in deps])
+            stored = {row['spec_key']: row['spec_hash']
+                      for row in conn.execute("SELECT spec_key, spec_hash FROM specs").fetchall()}
+            keys = set()
+            added = 0
+            for index, route_spec in enumerate(route_specs):
+                key = spec_key(route_spec)
+                keys.add(key)
+                # Key order is kept, since the prompts are rendered from it
+                spec_json = json.dumps(route_spec)
+                spec_hash = hash_content(spec_json)
+                if key in stored and stored[key] != spec_hash:
+                    logger.info(f"Spec {key} changed since it was queued; queuing all its stages again")
+                    conn.execute("DELETE FROM jobs WHERE spec_key = ?", (key,))
+                conn.execute("INSERT OR REPLACE INTO specs (spec_key, spec_index, spec, spec_hash) VALUES (?, ?, ?, ?)",
+                             (key, index, spec_json, spec_hash))
+                conn.execute("UPDATE jobs SET spec_index = ? WHERE spec_key = ?", (index, key))
+                for position, stage in enumerate(order):
+                    added += conn.execute(
+                        "INSERT OR IGNORE INTO jobs (spec_key, stage, spec_index, position, queued_at) "
+                        "VALUES (?, ?, ?, ?, ?)", (key, stage, index, position, now)).rowcount
+            if prune:
+                removed = [(key,) for key in stored if key not in keys]
+                if removed:
+                    logger.info(f"Dropping the jobs of {len(removed)} specs no longer in the spec set")
+                conn.executemany("DELETE FROM jobs WHERE spec_key = ?", removed)
+                conn.executemany("DELETE FROM specs WHERE spec_key = ?", removed)
+            return added
+        return self._transaction(work)
+
+    def claim(self, worker):
+        """
+        Lease the first pending job whose dependencies are all done, in spec
+        order so specs finish one after another. Returns the job as a dict, or
+        None when no job is ready.
+        """
+        def work(conn):
+            row = conn.execute(
+                "SELECT spec_key, stage, spec_index, attempts FROM jobs j WHERE status = 'pending' "
+                "AND NOT EXISTS (SELECT 1 FROM stage_deps d JOIN jobs u "
+                "ON u.spec_key = j.spec_key AND u.stage = d.dep "
+                "WHERE d.stage = j.stage AND u.status != 'done') "
+                "ORDER BY spec_index, position LIMIT 1").fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, lease_expires = ?, "
+                "started_at = ?, error = NULL WHERE spec_key = ? AND stage = ?",
+                (worker, now + self.lease_seconds, now, row['spec_key'], row['stage']))
+            return {'spec_key': row['spec_key'], 'stage': row['stage'], 'spec_index': row['spec_index'],
+                    'attempt': row['attempts'] + 1, 'started_at': now}
+        return self._transaction(work)
+
+    def complete(self, job, result):
+        """Mark a job done and store its output for the stages that depend on it."""
+        now = time.time()
+        stored = {name: value for name, value in result.items() if name != 'rebuilt'}
+
+        def work(conn):
+            conn.execute(
+                "UPDATE jobs SET status = 'done', worker = NULL, lease_expires = NULL, output_hash = ?, "
+                "result = ?, finished_at = ?, duration = ? WHERE spec_key = ? AND stage = ?",
+                (hash_content(result['content']), json.dumps(stored), now, now - job['started_at'],
+                 job['spec_key'], job['stage']))
+        self._transaction(work)
+
+    def fail(self, job, error):
+        """
+        Put a failed job back in the queue, or once it has used up its
+        attempts mark it failed and skip the jobs that depend on it.
+        Returns True when the job will be retried.
+        """
+        now = time.time()
+
+        def work(conn):
+            retry = job['attempt'] < self.max_attempts
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, error = ?, finished_at = ?, "
+                "duration = ? WHERE spec_key = ? AND stage = ?",
+                ('pending' if retry else 'failed', str(error), now, now - job['started_at'],
+                 job['spec_key'], job['stage']))
+            if not retry:
+                self._skip_dependents(conn, job['spec_key'], job['stage'])
+            return retry
+        return self._transaction(work)
+
+    @staticmethod
+    def _skip_dependents(conn, key, stage):
+        pending = [stage]
+        while pending:
+            failed = pending.pop()
+            for row in conn.execute("SELECT stage FROM stage_deps WHERE dep = ?", (failed,)).fetchall():
+                skipped = conn.execute(
+                    "UPDATE jobs SET status = 'skipped', error = ? WHERE spec_key = ? AND stage = ? "
+                    "AND status = 'pending'", (f"{failed} failed", key, row['stage'])).rowcount
+                if skipped:
+                    pending.append(row['stage'])
+
+    def release(self, worker):
+        """Put the jobs a worker still holds back in the queue, e.g. when it is interrupted."""
+        def work(conn):
+            return conn.execute(
+                "UPDATE jobs SET status = 'pending', worker = NULL, lease_expires = NULL, "
+                "attempts = MAX(attempts - 1, 0) WHERE status = 'running' AND worker = ?", (worker,)).rowcount
+        return self._transaction(work)
+
+    def requeue_stale(self):
+        """
+        Put back the running jobs whose lease expired or whose worker process
+        on this machine is gone. Returns the number of jobs requeued.
+        """
+        host = socket.gethostname()
+
+        def work(conn):
+            now = time.time()
+            stale = []
+            for row in conn.execute("SELECT spec_key, stage, worker, lease_expires FROM jobs "
+                                    "WHERE status = 'running'").fetchall():
+                worker_host, _, pid = (row['worker'] or '').rpartition(':')
+                dead = worker_host == host and pid.isdigit() and not _process_alive(int(pid))
+                if dead or (row['lease_expires'] or 0) < now:
+                    stale.append((row['spec_key'], row['stage']))
+            conn.executemany("UPDATE jobs SET status = 'pending', worker = NULL, lease_expires = NULL "
+                             "WHERE spec_key = ? AND stage = ?", stale)
+            return len(stale)
+        return self._transaction(work)
+
+    def retry_failed(self):
+        """Give the failed and skipped jobs a new set of attempts. Returns how many there were."""
+        def work(conn):
+            return conn.execute("UPDATE jobs SET status = 'pending', attempts = 0, error = NULL "
+                                "WHERE status IN ('failed', 'skipped')").rowcount
+        return self._transaction(work)
+
+    def spec(self, key):
+        rows = self._read("SELECT spec FROM specs WHERE spec_key = ?", (key,))
+        return json.loads(rows[0]['spec']) if rows else None
+
+    def outputs(self, key):
+        """The stored outputs of a spec's done jobs, keyed by stage."""
+        rows = self._read("SELECT stage, result FROM jobs WHERE spec_key = ? AND status = 'done'", (key,))
+        return {row['stage']: dict(json.loads(row['result']), rebuilt=False) for row in rows}
+
+    def active(self):
+        """Number of jobs that are pending or running."""
+        return self._read("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')")[0][0]
+
+    def summary(self):
+        """Job counts by status, and the count and mean duration of done jobs by stage."""
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        for row in self._read("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+            counts[row['status']] = row['n']
+        stages = {
+            row['stage']: {'count': row['n'], 'mean_duration': row['mean']}
+            for row in self._read("SELECT stage, COUNT(*) AS n, AVG(duration) AS mean FROM jobs "
+                                  "WHERE status = 'done' GROUP BY stage ORDER BY MIN(position)")
+        }
+        return {'jobs': counts, 'stages': stages}
+
+    def failures(self):
+        """(spec key, stage, error) of every failed job."""
+        return [(row['spec_key'], row['stage'], row['error']) for row in self._read(
+            "SELECT spec_key, stage, error FROM jobs WHERE status = 'failed' ORDER BY spec_index, position")]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class QueueWorker:
+    """
+    Claims jobs from a JobQueue and runs them with an AIAgent, up to
+    `concurrency` at a time, until the queue has no pending or running jobs
+    left. Upstream outputs come from the store, so a worker can pick up any
+    stage whatever process ran the ones before it. Store calls run in
+    threads, so waiting for the store's write lock never blocks the event
+    loop and the jobs in flight.
+    """
+
+    def __init__(self, agent, queue, name=None, concurrency=4, poll_interval=1.0, max_jobs=None):
+        self.agent = agent
+        self.queue = queue
+        self.name = name or worker_name()
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        # Stop claiming after this many jobs; None works until the queue is empty
+        self.max_jobs = max_jobs
+        self.stats = {'done': 0, 'retried': 0, 'failed': 0, 'inconsistent': 0}
+        self._claimed = 0
+
+    async def run(self):
+        try:
+            await asyncio.gather(*(self._work() for _ in range(self.concurrency)))
+        finally:
+            self.agent.manifest.save()
+            released = await asyncio.to_thread(self.queue.release, self.name)
+            if released:
+                logger.info(f"Worker {self.name} released {released} unfinished jobs")
+        logger.info(f"Worker {self.name} finished: {self.stats}")
+        return self.stats
+
+    async def _work(self):
+        force = (await asyncio.to_thread(self.queue.options)).get('force', False)
+        while self.max_jobs is None or self._claimed < self.max_jobs:
+            job = await asyncio.to_thread(self.queue.claim, self.name)
+            if job is None:
+                if not await asyncio.to_thread(self.queue.active):
+                    return
+                # Waiting for upstream jobs held by other workers, unless those died
+                await asyncio.to_thread(self.queue.requeue_stale)
+                await asyncio.sleep(self.poll_interval)
+                continue
+            self._claimed += 1
+            await self.run_job(job, force)
+
+    async def run_job(self, job, force=False):
+        route_spec = await asyncio.to_thread(self.queue.spec, job['spec_key'])
+        self.agent.tracer.set_lane(f"spec {job['spec_index'] + 1}: {route_spec['route_details']['path']}")
+        try:
+            outputs = await asyncio.to_thread(self.queue.outputs, job['spec_key'])
+            result = await self.agent._arun_stage(job['stage'], route_spec, outputs, force)
+        except Exception as e:
+            if await asyncio.to_thread(self.queue.fail, job, e):
+                logger.warning(f"{job['stage']} failed for {job['spec_key']} (attempt {job['attempt']}), "
+                               f"retrying: {str(e)}")
+                self.stats['retried'] += 1
+            else:
+                logger.error(f"{job['stage']} failed for {job['spec_key']}: {str(e)}")
+                self.stats['failed'] += 1
+            return
+        await asyncio.to_thread(self.queue.complete, job, result)
+        self.stats['done'] += 1
+        if job['stage'] == 'test' and getattr(self.agent, 'generation_mode', None) == 'contract':
+            outputs = await asyncio.to_thread(self.queue.outputs, job['spec_key'])
+            if self.agent.check_contract(route_spec, outputs):
+                self.stats['inconsistent'] += 1
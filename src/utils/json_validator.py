@@ -1,22 +1,49 @@
 # src/utils/json_validator.py
 
 import json
+import logging
 import jsonschema
-from jsonschema import validate
+from jsonschema.validators import validator_for
+
+logger = logging.getLogger(__name__)
+
+# Compiled validators keyed by the schema's canonical JSON
+_validators = {}
 
 def load_json_schema(file_path):
     with open(file_path, 'r') as file:
-        content = file.read()
-        print(f"Content of {file_path}: {content}")  # Debugging statement
-        print(f"Length of content: {len(content)}")  # Debugging statement
-        schema = json.loads(content)
+        schema = json.load(file)
+    logger.debug(f"Loaded JSON schema from {file_path}")
     return schema
 
+def compile_json_schema(schema):
+    """
+    Check `schema` once and return a validator for it that can be reused for
+    any number of instances. Raises jsonschema.exceptions.SchemaError.
+    """
+    key = json.dumps(schema, sort_keys=True)
+    validator = _validators.get(key)
+    if validator is None:
+        cls = validator_for(schema)
+        cls.check_schema(schema)
+        validator = _validators[key] = cls(schema)
+    return validator
+
+def format_json_error(error):
+    location = '.'.join(str(part) for part in error.absolute_path)
+    return f"{location}: {error.message}" if location else error.message
+
+def collect_json_errors(validator, instance):
+    """Every validation error of `instance`, in document order."""
+    errors = sorted(validator.iter_errors(instance), key=lambda error: [str(part) for part in error.absolute_path])
+    return [format_json_error(error) for error in errors]
+
 def validate_json(instance, schema):
     try:
-        validate(instance=instance, schema=schema)
-    except jsonschema.exceptions.ValidationError as err:
-        return False, err.message
+        validator = compile_json_schema(schema)
     except jsonschema.exceptions.SchemaError as err:
         return False, err.message
+    error = jsonschema.exceptions.best_match(validator.iter_errors(instance))
+    if error is not None:
+        return False, error.message
     return True, None
@@ -0,0 +1,98 @@
+# src/utils/model_router.py
+
+import os
+import re
+from typing import Any, Dict, Optional
+from src.utils.contract import PATH_PARAMETER
+
+# Tiers from cheapest to strongest. 'template' specs are rendered from local
+# code templates, 'fast' ones go to the default generation model and
+# 'strong' ones to the strongest model.
+TIERS = ('template', 'fast', 'strong')
+
+# How much each part of a spec adds to its complexity score
+SCORE_WEIGHTS = {
+    'logical_steps': 2.0,
+    'required_tables': 2.0,
+    'required_middleware': 1.0,
+    'input': 0.5,
+}
+
+# Highest score routed to each tier; anything above the last goes to 'strong'
+DEFAULT_THRESHOLDS = {
+    'template': 8.0,
+    'fast': 16.0,
+}
+
+# Methods the code templates can implement, and whether they need a path parameter
+TEMPLATE_METHODS = {'GET': False, 'POST': False, 'PUT': True, 'PATCH': True, 'DELETE': True}
+# Leading verbs of the logical steps the templates implement: validation and
+# plain reads and writes of the spec's one table
+CRUD_VERBS = ('validate', 'ensure', 'find', 'get', 'fetch', 'load', 'retrieve', 'read', 'list', 'create',
+              'insert', 'add', 'save', 'write', 'update', 'edit', 'modify', 'delete', 'remove', 'return')
+# Words marking work the templates would silently drop
+NON_CRUD_WORDS = re.compile(
+    r'\b(?:password|hash\w*|encrypt\w*|token|email|mail|send|notif\w*|firebase|upload|payment|permission\w*|'
+    r'role|duplicate\w*|unique|related|invit\w*|log|audit|transaction|external|api|verif\w*|calculat\w*)\b',
+    re.IGNORECASE)
+
+
+def _count(route_spec: Dict[str, Any], field: str) -> int:
+    return len(route_spec.get(field) or [])
+
+
+def score_spec(route_spec: Dict[str, Any]) -> float:
+    """Complexity of a spec: a weighted count of its steps, tables, middleware and inputs."""
+    return sum(weight * _count(route_spec, field) for field, weight in SCORE_WEIGHTS.items())
+
+
+def is_crud_step(step: Any) -> bool:
+    """Whether a logical step is plain validation or a read or write of a record."""
+    if isinstance(step, dict):
+        title, text = str(step.get('step', '')), f"{step.get('step', '')} {step.get('description', '')}"
+    else:
+        title = text = str(step)
+    words = title.split()
+    return bool(words) and words[0].lower() in CRUD_VERBS and not NON_CRUD_WORDS.search(text)
+
+
+def is_templatable(route_spec: Dict[str, Any]) -> bool:
+    """
+    Whether the code templates can implement the spec: plain CRUD on a
+    single table, with the record addressed by a path parameter for
+    updates and deletes, no utils, and only CRUD logical steps.
+    """
+    details = route_spec.get('route_details', {})
+    method = str(details.get('method', '')).upper()
+    if method not in TEMPLATE_METHODS or _count(route_spec, 'required_tables') != 1:
+        return False
+    if _count(route_spec, 'required_utils') or not all(map(is_crud_step, route_spec.get('logical_steps') or [])):
+        return False
+    return not TEMPLATE_METHODS[method] or PATH_PARAMETER.search(str(details.get('path', ''))) is not None
+
+
+class ModelRouter:
+    """
+    Routes each spec to a model tier by its complexity score. Specs that
+    score low enough for the template tier but that the templates can't
+    implement go to the fast tier instead.
+    """
+
+    def __init__(self, thresholds: Optional[Dict[str, float]] = None):
+        self.thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+
+    @classmethod
+    def from_env(cls) -> 'ModelRouter':
+        """Thresholds from ROUTING_<TIER>_MAX_SCORE, e.g. ROUTING_FAST_MAX_SCORE=20."""
+        return cls({
+            tier: float(os.environ[f"ROUTING_{tier.upper()}_MAX_SCORE"])
+            for tier in DEFAULT_THRESHOLDS if os.getenv(f"ROUTING_{tier.upper()}_MAX_SCORE")
+        })
+
+    def tier(self, route_spec: Dict[str, Any]) -> str:
+        score = score_spec(route_spec)
+        if score <= self.thresholds['template'] and is_templatable(route_spec):
+            return 'template'
+        if score <= self.thresholds['fast']:
+            return 'fast'
+        return 'strong'
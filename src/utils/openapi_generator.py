@@ -0,0 +1,310 @@
+# src/utils/openapi_generator.py
+
+import copy
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+OPENAPI_VERSION = '3.0.3'
+DEFAULT_DOCUMENT_PATH = os.path.join('generated', 'swaggerDocs.json')
+# Bump when the generated documents change so build manifests rebuild them
+GENERATOR_VERSION = 1
+
+# db_schema column types to OpenAPI schemas
+COLUMN_TYPES = {
+    'int': {'type': 'integer'},
+    'integer': {'type': 'integer'},
+    'smallint': {'type': 'integer'},
+    'tinyint': {'type': 'integer'},
+    'bigint': {'type': 'integer', 'format': 'int64'},
+    'decimal': {'type': 'number'},
+    'numeric': {'type': 'number'},
+    'float': {'type': 'number', 'format': 'float'},
+    'double': {'type': 'number', 'format': 'double'},
+    'varchar': {'type': 'string'},
+    'char': {'type': 'string'},
+    'text': {'type': 'string'},
+    'boolean': {'type': 'boolean'},
+    'bool': {'type': 'boolean'},
+    'date': {'type': 'string', 'format': 'date'},
+    'timestamp': {'type': 'string', 'format': 'date-time'},
+    'datetime': {'type': 'string', 'format': 'date-time'},
+    'json': {'type': 'object'},
+    'jsonb': {'type': 'object'},
+    'uuid': {'type': 'string', 'format': 'uuid'},
+}
+
+# Spec input types to OpenAPI schemas, for inputs that match no column
+INPUT_TYPES = {
+    'string': {'type': 'string'},
+    'str': {'type': 'string'},
+    'text': {'type': 'string'},
+    'integer': {'type': 'integer'},
+    'int': {'type': 'integer'},
+    'number': {'type': 'number'},
+    'float': {'type': 'number'},
+    'decimal': {'type': 'number'},
+    'boolean': {'type': 'boolean'},
+    'bool': {'type': 'boolean'},
+    'array': {'type': 'array', 'items': {}},
+    'list': {'type': 'array', 'items': {}},
+    'object': {'type': 'object'},
+    'email': {'type': 'string', 'format': 'email'},
+    'password': {'type': 'string', 'format': 'password'},
+    'date': {'type': 'string', 'format': 'date'},
+    'datetime': {'type': 'string', 'format': 'date-time'},
+    'uuid': {'type': 'string', 'format': 'uuid'},
+    'file': {'type': 'string', 'format': 'binary'},
+}
+
+BODY_METHODS = ('POST', 'PUT', 'PATCH')
+# Path segments that say nothing about the resource
+PATH_PREFIXES = {'app', 'api', 'v1', 'v2', 'v3'}
+AUTH_MIDDLEWARE = re.compile(r'auth|jwt|role|permission', re.IGNORECASE)
+PATH_PARAMETER = re.compile(r':(\w+)|\{(\w+)\}')
+
+ERROR_SCHEMA = {'type': 'object', 'properties': {'message': {'type': 'string'}}}
+ERROR_RESPONSES = {
+    '400': "Invalid input",
+    '401': "Missing or invalid authentication",
+    '403': "Not allowed for this user",
+    '404': "Not found",
+    '500': "Internal server error",
+}
+
+
+def openapi_path(path: str) -> str:
+    """Express-style `/users/:id` to OpenAPI `/users/{id}`."""
+    return PATH_PARAMETER.sub(lambda match: f"{{{match.group(1) or match.group(2)}}}", path)
+
+
+def path_parameters(path: str) -> List[str]:
+    return [match.group(1) or match.group(2) for match in PATH_PARAMETER.finditer(path)]
+
+
+def _words(text: str) -> List[str]:
+    return [word.lower() for word in re.findall(r'[A-Za-z][a-z]*|[0-9]+', text)]
+
+
+def _pascal_case(text: str) -> str:
+    return ''.join(word.capitalize() for word in _words(text))
+
+
+def _snake_case(text: str) -> str:
+    return re.sub(r'(?<=[a-z0-9])([A-Z])', r'_\1', text).lower()
+
+
+def tag_for(path: str) -> str:
+    """The resource a route belongs to, e.g. `Admin` for `/app/admin/mentor-register`."""
+    for segment in path.strip('/').split('/'):
+        if segment and segment.lower() not in PATH_PREFIXES and not PATH_PARAMETER.fullmatch(segment):
+            return ' '.join(word.capitalize() for word in _words(segment))
+    return 'Default'
+
+
+def operation_id(route_spec: Dict[str, Any]) -> str:
+    route_file = route_spec.get('file_names', {}).get('route', '')
+    if route_file:
+        name = re.sub(r'(Route)?\.js$', '', os.path.basename(route_file))
+        if name:
+            return name
+    details = route_spec.get('route_details', {})
+    words = _words(details.get('method', '')) + [word for word in _words(details.get('path', ''))
+                                                 if word not in PATH_PREFIXES]
+    return words[0] + ''.join(word.capitalize() for word in words[1:]) if words else 'operation'
+
+
+class OpenAPIGenerator:
+    """
+    Builds OpenAPI operations straight from route specs. Inputs whose names
+    match a column of the spec's required tables take the column's type,
+    length and allowed values; other inputs use their declared type. Each
+    spec becomes a fragment (a partial OpenAPI document holding its one
+    operation) that OpenAPIDocument merges into the combined document.
+    """
+
+    def __init__(self, db_schema: Dict[str, Any]):
+        self.tables = {
+            table: {column['name']: column for column in details.get('columns', [])}
+            for table, details in db_schema.get('tables', {}).items()
+        }
+
+    @staticmethod
+    def column_schema(column: Dict[str, Any]) -> Dict[str, Any]:
+        schema = dict(COLUMN_TYPES.get(str(column.get('type', '')).lower(), {'type': 'string'}))
+        if column.get('values'):
+            schema['enum'] = list(column['values'])
+        if column.get('length') and schema['type'] == 'string':
+            schema['maxLength'] = column['length']
+        return schema
+
+    def table_schema(self, table: str) -> Dict[str, Any]:
+        columns = self.tables[table]
+        schema = {
+            'type': 'object',
+            'properties': {name: self.column_schema(column) for name, column in columns.items()},
+        }
+        required = [name for name, column in columns.items()
+                    if column.get('not_null') or column.get('primary_key')]
+        if required:
+            schema['required'] = required
+        return schema
+
+    def input_schema(self, field: Dict[str, Any], tables: List[str]) -> Dict[str, Any]:
+        name = str(field.get('name', ''))
+        schema = None
+        for table in tables:
+            column = self.tables.get(table, {}).get(name) or self.tables.get(table, {}).get(_snake_case(name))
+            if column:
+                schema = self.column_schema(column)
+                break
+        if schema is None:
+            schema = dict(INPUT_TYPES.get(str(field.get('type', '')).lower(), {'type': 'string'}))
+        if field.get('description'):
+            schema['description'] = field['description']
+        return schema
+
+    def operation(self, route_spec: Dict[str, Any], prose: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        details = route_spec['route_details']
+        method = details['method'].upper()
+        tables = [table for table in route_spec.get('required_tables', []) or [] if table in self.tables]
+        inputs = [field for field in route_spec.get('input', []) or [] if isinstance(field, dict)]
+        path_names = path_parameters(details['path'])
+        middleware = (route_spec.get('required_middleware') or []) + (route_spec.get('middleware') or [])
+        secured = any(AUTH_MIDDLEWARE.search(str(name)) for name in middleware)
+
+        steps = [step for step in route_spec.get('logical_steps', []) or [] if isinstance(step, dict)]
+        description = '\n'.join(f"{i}. {step.get('step', '')}: {step.get('description', '')}"
+                                for i, step in enumerate(steps, 1))
+        prose = prose or {}
+        operation = {
+            'operationId': operation_id(route_spec),
+            'summary': prose.get('summary') or details.get('description', ''),
+            'description': prose.get('description') or description or details.get('description', ''),
+            'tags': [tag_for(details['path'])],
+        }
+
+        parameters = []
+        by_name = {str(field.get('name')): field for field in inputs}
+        for name in path_names:
+            parameters.append({'name': name, 'in': 'path', 'required': True,
+                               'schema': self.input_schema(by_name.get(name, {'name': name}), tables)})
+        other_inputs = [field for field in inputs if field.get('name') not in path_names]
+        if method in BODY_METHODS and other_inputs:
+            properties = {str(field['name']): self.input_schema(field, tables) for field in other_inputs}
+            required = [str(field['name']) for field in other_inputs if field.get('required', True)]
+            body_schema = {'type': 'object', 'properties': properties}
+            if required:
+                body_schema['required'] = required
+            operation['requestBody'] = {'required': True, 'content': {'application/json': {'schema': body_schema}}}
+        else:
+            for field in other_inputs:
+                parameters.append({'name': str(field['name']), 'in': 'query', 'required': bool(field.get('required', False)),
+                                   'schema': self.input_schema(field, tables)})
+        if parameters:
+            operation['parameters'] = parameters
+
+        success = {'type': 'object', 'properties': {'message': {'type': 'string'}}}
+        if method == 'GET' and tables:
+            resource = {'$ref': f"#/components/schemas/{_pascal_case(tables[0])}"}
+            success['properties']['data'] = resource if path_names else {'type': 'array', 'items': resource}
+        responses = {'201' if method == 'POST' else '200': {
+            'description': prose.get('success') or "Success",
+            'content': {'application/json': {'schema': success}},
+        }}
+        codes = ['400'] if inputs else []
+        codes += ['401', '403'] if secured else []
+        codes += ['404'] if path_names else []
+        codes.append('500')
+        for code in codes:
+            responses[code] = {'description': ERROR_RESPONSES[code],
+                               'content': {'application/json': {'schema': {'$ref': '#/components/schemas/Error'}}}}
+        operation['responses'] = responses
+        if secured:
+            operation['security'] = [{'bearerAuth': []}]
+        return operation
+
+    def fragment(self, route_spec: Dict[str, Any], prose: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """A partial OpenAPI document with the spec's operation and the schemas it refers to."""
+        details = route_spec['route_details']
+        operation = self.operation(route_spec, prose)
+        schemas = {'Error': ERROR_SCHEMA}
+        tables = [table for table in route_spec.get('required_tables', []) or [] if table in self.tables]
+        if details['method'].upper() == 'GET' and tables:
+            schemas[_pascal_case(tables[0])] = self.table_schema(tables[0])
+        components = {'schemas': schemas}
+        if 'security' in operation:
+            components['securitySchemes'] = {'bearerAuth': {'type': 'http', 'scheme': 'bearer', 'bearerFormat': 'JWT'}}
+        return {
+            'openapi': OPENAPI_VERSION,
+            'paths': {openapi_path(details['path']): {details['method'].lower(): operation}},
+            'components': components,
+        }
+
+
+class OpenAPIDocument:
+    """
+    The combined OpenAPI document of every spec. It starts from the document
+    already on disk, so each run only replaces the operations of the specs
+    it generated and keeps the rest.
+    """
+
+    def __init__(self, path: str = DEFAULT_DOCUMENT_PATH, info: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.document = {
+            'openapi': OPENAPI_VERSION,
+            'info': info or {'title': 'API', 'version': '1.0.0'},
+            'paths': {},
+            'components': {'schemas': {}},
+        }
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                existing = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            logger.warning(f"{self.path} is not an OpenAPI JSON document; starting a new one")
+            return
+        except Exception as e:
+            logger.error(f"Error loading OpenAPI document {self.path}: {str(e)}")
+            return
+        if isinstance(existing, dict) and 'openapi' in existing:
+            existing.setdefault('paths', {})
+            existing.setdefault('components', {}).setdefault('schemas', {})
+            self.document = existing
+
+    def merge(self, fragment: Dict[str, Any]):
+        with self._lock:
+            for path, operations in fragment.get('paths', {}).items():
+                self.document['paths'].setdefault(path, {}).update(copy.deepcopy(operations))
+            for section, entries in fragment.get('components', {}).items():
+                self.document['components'].setdefault(section, {}).update(copy.deepcopy(entries))
+
+    def to_json(self) -> str:
+        with self._lock:
+            document = dict(self.document, paths=dict(sorted(self.document['paths'].items())))
+            return json.dumps(document, indent=2) + '\n'
+
+
+def parse_prose(text: str) -> Optional[Dict[str, str]]:
+    """The summary and description an LLM wrote for an operation, if it returned usable JSON."""
+    if not text:
+        return None
+    text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text.strip())
+    try:
+        prose = json.loads(text)
+    except ValueError:
+        logger.warning("OpenAPI prose was not valid JSON; keeping the generated text")
+        return None
+    if not isinstance(prose, dict):
+        return None
+    return {key: str(value) for key, value in prose.items() if key in ('summary', 'description', 'success') and value}
@@ -0,0 +1,187 @@
+# src/utils/output_sink.py
+
+import asyncio
+import atexit
+import contextvars
+import hashlib
+import logging
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import Future
+from src.utils.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class OutputSink:
+    """
+    Writes generated files on a background thread. Each file is written to a
+    temp file next to its target and renamed into place, and the write is
+    skipped when the file already holds the same content, so unchanged
+    outputs keep their mtime and don't wake up watchers and test runners.
+    Writes are applied in the order they were queued; a write that a later
+    one to the same path supersedes is dropped. Everything still queued is
+    flushed at interpreter exit.
+    """
+
+    def __init__(self):
+        self.stats = {'written': 0, 'unchanged': 0, 'failed': 0, 'bytes_written': 0}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        # path -> [latest queued content, number of queued writes]
+        self._pending = {}
+        # path -> (mtime_ns, size, sha256) of files this sink wrote or hashed
+        self._digests = {}
+        atexit.register(self.close)
+
+    def write(self, path, content):
+        """
+        Queue `content` for writing to `path`. `content` may be a callable
+        returning the text, which is only called if the write isn't
+        superseded, for documents that are rewritten often. Returns a Future
+        resolving to True if the file was written and False if it was
+        already up to date or superseded.
+        """
+        future = Future()
+        with self._lock:
+            entry = self._pending.setdefault(path, [content, 0])
+            entry[0] = content
+            entry[1] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='output-sink', daemon=True)
+                self._thread.start()
+        # Carry the caller's trace context over to the write span
+        self._queue.put((contextvars.copy_context(), path, content, future))
+        return future
+
+    async def awrite(self, path, content):
+        """Write `content` to `path` without blocking the event loop."""
+        return await asyncio.wrap_future(self.write(path, content))
+
+    def pending_content(self, path):
+        """The content queued for `path` but not written yet, or None."""
+        with self._lock:
+            entry = self._pending.get(path)
+        if entry is None:
+            return None
+        return entry[0]() if callable(entry[0]) else entry[0]
+
+    def replace(self, tmp_path, path, content):
+        """
+        Move a finished temp file into place, or drop it when `path` already
+        holds `content`. Used for output that was streamed straight to disk.
+        """
+        data = content.encode('utf-8')
+        if self._is_unchanged(path, data):
+            os.remove(tmp_path)
+            self._count(unchanged=1)
+            return False
+        os.replace(tmp_path, path)
+        self._remember(path, data)
+        self._count(written=1, bytes_written=len(data))
+        return True
+
+    def flush(self):
+        """Block until every queued write has been applied."""
+        self._queue.join()
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            context, path, content, future = item
+            try:
+                with self._lock:
+                    superseded = self._pending[path][1] > 1
+                if superseded:
+                    future.set_result(False)
+                else:
+                    if callable(content):
+                        content = content()
+                    future.set_result(context.run(self._write, path, content))
+            except Exception as e:
+                logger.error(f"Error saving file {path}: {str(e)}")
+                self._count(failed=1)
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    entry = self._pending[path]
+                    entry[1] -= 1
+                    if entry[1] == 0:
+                        del self._pending[path]
+                self._queue.task_done()
+
+    def _write(self, path, content):
+        data = content.encode('utf-8')
+        with get_tracer().span('write', 'io', path=path) as span:
+            if self._is_unchanged(path, data):
+                logger.debug(f"File {path} is unchanged, not rewriting it")
+                span.set(unchanged=True)
+                self._count(unchanged=1)
+                return False
+
+            directory = os.path.dirname(path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._remember(path, data)
+            span.set(bytes_written=len(data))
+            self._count(written=1, bytes_written=len(data))
+            logger.debug(f"File saved successfully at {path}")
+            return True
+
+    def _is_unchanged(self, path, data):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != len(data):
+            return False
+        known = self._digests.get(path)
+        if known is None or known[:2] != (stat.st_mtime_ns, stat.st_size):
+            with open(path, 'rb') as f:
+                known = (stat.st_mtime_ns, stat.st_size, _digest(f.read()))
+            self._digests[path] = known
+        return known[2] == _digest(data)
+
+    def _remember(self, path, data):
+        stat = os.stat(path)
+        self._digests[path] = (stat.st_mtime_ns, stat.st_size, _digest(data))
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self.stats[name] += value
+
+
+_output_sink = None
+
+def get_output_sink():
+    """Shared sink, so every writer in the process flushes through one queue."""
+    global _output_sink
+    if _output_sink is None:
+        _output_sink = OutputSink()
+    return _output_sink
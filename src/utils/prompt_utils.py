@@ -1,7 +1,11 @@
-from langchain_core.prompts import ChatPromptTemplate
+def _chat_prompt(messages):
+    # langchain_core is slow to import; only load it once a prompt is built
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages(messages)
+
 
 def get_route_generation_chat_prompt():
-    return ChatPromptTemplate.from_messages([
+    return _chat_prompt([
         ("system", """You are an expert API developer. Your task is to generate a route file based on given specifications."""),
         ("human", """Given the following route details:
         {route_details}
@@ -21,7 +25,7 @@ def get_route_generation_chat_prompt():
     ])
 
 def get_controller_generation_chat_prompt():
-    return ChatPromptTemplate.from_messages([
+    return _chat_prompt([
         ("system", """You are an expert API developer. Your task is to generate a controller file based on a given route file."""),
         ("human", """Given the following route file:
         {route_file}
@@ -47,7 +51,7 @@ def get_controller_generation_chat_prompt():
 
 
 def get_service_generation_chat_prompt():
-    return ChatPromptTemplate.from_messages([
+    return _chat_prompt([
         ("system", """You are an expert API developer. Your task is to generate a service file based on given route and controller files."""),
         ("human", """Given the following route file:
         {route_file}
@@ -72,22 +76,8 @@ def get_service_generation_chat_prompt():
         Generated Service File:"""),
     ])
 
-def get_swagger_docs_prompt():
-    return ChatPromptTemplate.from_messages([
-        ("system", """You are an expert API developer. Your task is to generate Swagger documentation based on a given route file."""),
-        ("human", """Given the following generated route:
-        {generated_route}
-
-        And this example Swagger documentation:
-        {example_swagger}
-
-        Generate Swagger documentation that follows the style and structure of the example, implementing the details of the generated route.
-
-        Generated Swagger Documentation:"""),
-    ])
-
 def get_test_suite_generation_prompt():
-    return ChatPromptTemplate.from_messages([
+    return _chat_prompt([
         ("system", "You are an expert in writing comprehensive Jest test suites for API routes."),
         ("human", """
         Given the following generated files:
@@ -111,4 +101,165 @@ def get_test_suite_generation_prompt():
         
         Generated Test Suite:
         """)
-    ])
\ No newline at end of file
+    ])
+
+# Prompt layouts. 'legacy' keeps the original prompts, where per-spec content
+# comes first. 'prefix' puts the static project context first, in the same
+# byte-identical form for every spec and stage, so providers can serve it
+# from their prompt cache, and puts the per-spec content last.
+PROMPT_LAYOUTS = ('legacy', 'prefix')
+
+# 'staged' generates route, controller and service one after another, each
+# from the files before it. 'unified' asks for all three in one response.
+# 'contract' derives their interface from the spec first and generates the
+# three files at the same time against it.
+GENERATION_MODES = ('staged', 'unified', 'contract')
+
+STATIC_CONTEXT_PREFIX = """You are an expert API developer working on the following project.
+
+Project information:
+{project_info}
+
+Project structure:
+{project_structure}
+"""
+
+def _prefix_layout_prompt(task, example_label, example_slot, human):
+    return _chat_prompt([
+        ("system", STATIC_CONTEXT_PREFIX + f"""
+{task}
+
+{example_label}:
+{{{example_slot}}}"""),
+        ("human", human),
+    ])
+
+def get_route_generation_prefix_prompt():
+    return _prefix_layout_prompt(
+        "Your task is to generate a route file based on given specifications.",
+        "Example route file", "example_route",
+        """Given the following route details:
+{route_details}
+
+Generate a route file that follows the style and structure of the example, implementing the specified route details. Ensure proper error handling and follow RESTful principles.
+
+Generated Route File:""")
+
+def get_controller_generation_prefix_prompt():
+    return _prefix_layout_prompt(
+        "Your task is to generate a controller file based on a given route file.",
+        "Example controller file", "example_controller",
+        """Given the following route file:
+{route_file}
+
+Route path:
+{route_path}
+
+Generate a controller file that follows the style and structure of the example, implementing the necessary methods to handle the routes defined in the route file. Ensure proper error handling and follow best practices for controller design.
+
+IMPORTANT: You MUST include the route path '{route_path}' in your comments or method names. For example, create a method named 'handleUserRequest' for a '/users' route.
+
+Generated Controller File:""")
+
+def get_service_generation_prefix_prompt():
+    return _prefix_layout_prompt(
+        "Your task is to generate a service file based on given route and controller files.",
+        "Example service file", "example_service",
+        """Given the following route file:
+{route_file}
+
+And the following controller file:
+{controller_file}
+
+Database schema:
+{db_schema}
+
+Generate a service file that follows the style and structure of the example, implementing the necessary methods to handle the business logic required by the controller. Ensure proper error handling, database interactions based on the provided schema, and follow best practices for service layer design.
+
+Generated Service File:""")
+
+def get_test_suite_generation_prefix_prompt():
+    return _prefix_layout_prompt(
+        "You are also an expert in writing comprehensive Jest test suites for API routes.",
+        "Example test file", "example_test_file",
+        """Given the following generated files:
+
+Route file:
+{route_file}
+
+Controller file:
+{controller_file}
+
+Service file:
+{service_file}
+
+Generate a complete Jest test suite that covers all potential cases for the given route, controller, and service. Include tests for happy paths, error cases, edge cases, and any middleware functionality. Ensure proper mocking of dependencies and external services.
+
+Generated Test Suite:""")
+
+def get_openapi_prose_prompt():
+    return _chat_prompt([
+        ("system", """You are an expert API developer writing OpenAPI documentation. The operation's paths, parameters, request body and responses are generated from the route specification; you only write the prose.
+
+Reply with a JSON object with these keys and nothing else:
+- "summary": one short sentence naming what the endpoint does
+- "description": a paragraph describing its behaviour, validation and side effects
+- "success": a short description of the successful response"""),
+        ("human", """Route specification:
+{route_spec}"""),
+    ])
+
+def get_unified_generation_prompt():
+    from src.utils.template_manager import get_template
+
+    return _chat_prompt([
+        ("system", """You are an expert API developer. Your task is to generate the route, controller and service files of an API endpoint in one response."""),
+        ("human", get_template('unified_template')),
+    ])
+
+# Label, example slot and instructions of each file generated against a contract
+CONTRACT_FILES = {
+    'route': ("route file", "example_route",
+              "Register the route with the middleware listed in the contract, in that order, and hand the request to the controller handler the contract names."),
+    'controller': ("controller file", "example_controller",
+                   "Export the handler the contract names. Read the inputs from the request, call the service function with the parameters in the contract, and turn its result and errors into responses."),
+    'service': ("service file", "example_service",
+                "Export the service function with the signature in the contract and implement the logical steps of the specification, using the database schema and the utils listed in the contract."),
+}
+
+CONTRACT_INSTRUCTIONS = """The route, controller and service files of this endpoint are generated at the same time by separate requests. They only fit together if each follows this interface contract exactly: use its file names, require paths, function names and signatures."""
+
+def get_contract_generation_prompt(stage, layout='legacy'):
+    label, example_slot, task = CONTRACT_FILES[stage]
+    schema = """
+
+Database schema:
+{db_schema}""" if stage == 'service' else ""
+    request = f"""Route specification:
+{{route_spec}}
+
+{CONTRACT_INSTRUCTIONS}
+
+Interface contract:
+{{contract}}{schema}
+
+Generate the {label} that follows the style and structure of the example. {task} Ensure proper error handling.
+
+Generated {label.title()}:"""
+
+    if layout == 'prefix':
+        return _prefix_layout_prompt(f"Your task is to generate a {label} against a given interface contract.",
+                                     f"Example {label}", example_slot, request)
+    return _chat_prompt([
+        ("system", f"You are an expert API developer. Your task is to generate a {label} against a given interface contract."),
+        ("human", request + f"""
+
+Example {label}:
+{{{example_slot}}}
+
+Project information:
+{{project_info}}
+
+Project structure:
+{{project_structure}}"""),
+    ])
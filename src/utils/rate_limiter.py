@@ -0,0 +1,240 @@
+# src/utils/rate_limiter.py
+
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Per-minute limits used until the provider's rate-limit headers say otherwise
+DEFAULT_LIMITS = {
+    'gpt-4o-mini': {'rpm': 500, 'tpm': 200000},
+    'gpt-3.5-turbo': {'rpm': 3500, 'tpm': 200000},
+}
+FALLBACK_LIMITS = {'rpm': 500, 'tpm': 200000}
+
+# Lower runs first. Stages on the route -> controller -> service -> test
+# critical path go ahead of swagger, which nothing waits on.
+STAGE_PRIORITIES = {
+    'route': 0,
+    'controller': 0,
+    'service': 0,
+    'test': 0,
+    'unified': 0,
+    'swagger': 1,
+}
+DEFAULT_PRIORITY = 1
+
+
+def retryable_errors():
+    # Imported here so that loading the scheduler doesn't pull in openai
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )
+
+
+def limit_concurrency(semaphore, call):
+    """
+    Wrap an async call passed to RateLimitScheduler.run so `semaphore` is
+    held only while a request attempt runs, not while the scheduler waits
+    for tokens or backs off before a retry.
+    """
+    async def run():
+        async with semaphore:
+            return await call()
+    return run
+
+
+def parse_reset_duration(value):
+    """Parse reset headers such as '1s', '6m0s', '20ms' or '0.5' into seconds."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+    parts = re.findall(r'([\d.]+)(ms|h|m|s)', value)
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Bucket refilled continuously at `capacity` per minute."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` is available. Requests above capacity wait for a full bucket."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.capacity
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+    def observe(self, limit=None, remaining=None, reset_seconds=None, now=None):
+        """Align the bucket with the limit and remaining budget reported by the provider."""
+        now = now or time.monotonic()
+        self._refill(now)
+        if limit:
+            self.capacity = limit
+        if remaining is not None:
+            self.level = min(self.level, remaining)
+        if remaining == 0 and reset_seconds:
+            # Nothing left until the reported reset
+            self.level = -reset_seconds * self.capacity / 60.0
+
+
+class RateLimitScheduler:
+    """
+    Shared gate for every LLM call. Keeps requests-per-minute and
+    tokens-per-minute buckets per model, lets higher-priority stages go first
+    when a model is saturated, and retries rate-limited or transient failures
+    with jittered exponential backoff.
+    """
+
+    def __init__(self, limits=None, max_retries=6, base_delay=1.0, max_delay=60.0):
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._buckets = {}
+        self._waiting = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+        self.stats = defaultdict(lambda: {'requests': 0, 'retries': 0, 'rate_limited': 0, 'wait_seconds': 0.0})
+
+    def _model_buckets(self, model):
+        if model not in self._buckets:
+            limits = self.limits.get(model, FALLBACK_LIMITS)
+            self._buckets[model] = {'requests': TokenBucket(limits['rpm']), 'tokens': TokenBucket(limits['tpm'])}
+        return self._buckets[model]
+
+    def _try_acquire(self, model, tokens, priority):
+        """Take a request slot and `tokens` if available, otherwise return how long to wait."""
+        with self._lock:
+            if any(count for level, count in self._waiting[model].items() if level < priority):
+                # Let waiting higher-priority calls go first
+                return 0.05
+            now = time.monotonic()
+            buckets = self._model_buckets(model)
+            wait = max(buckets['requests'].wait_time(1, now), buckets['tokens'].wait_time(tokens, now))
+            if wait > 0:
+                return wait
+            buckets['requests'].consume(1, now)
+            buckets['tokens'].consume(tokens, now)
+            return 0.0
+
+    def _set_waiting(self, model, priority, delta):
+        with self._lock:
+            self._waiting[model][priority] += delta
+
+    def observe_headers(self, model, headers):
+        """Update the buckets of `model` from x-ratelimit-* response headers."""
+        if 'x-ratelimit-remaining-requests' not in headers and 'x-ratelimit-remaining-tokens' not in headers:
+            return
+        with self._lock:
+            buckets = self._model_buckets(model)
+            for kind, bucket in (('requests', buckets['requests']), ('tokens', buckets['tokens'])):
+                limit = headers.get(f'x-ratelimit-limit-{kind}')
+                remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+                bucket.observe(
+                    limit=int(limit) if limit else None,
+                    remaining=int(remaining) if remaining is not None else None,
+                    reset_seconds=parse_reset_duration(headers.get(f'x-ratelimit-reset-{kind}'))
+                )
+
+    def _retry_delay(self, model, error, attempt):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        response = getattr(error, 'response', None)
+        if response is not None:
+            self.observe_headers(model, response.headers)
+            retry_after = parse_reset_duration(response.headers.get('retry-after'))
+            retry_after_ms = response.headers.get('retry-after-ms')
+            if retry_after_ms:
+                retry_after = float(retry_after_ms) / 1000
+            if retry_after:
+                delay = max(delay, retry_after)
+        return delay
+
+    def _record_failure(self, model, error, attempt):
+        import openai
+
+        if attempt >= self.max_retries or not isinstance(error, retryable_errors()):
+            return None
+        stats = self.stats[model]
+        stats['retries'] += 1
+        if isinstance(error, openai.RateLimitError):
+            stats['rate_limited'] += 1
+        delay = self._retry_delay(model, error, attempt)
+        logger.warning(f"{type(error).__name__} from {model}, retrying in {delay:.1f}s (attempt {attempt + 1})")
+        return delay
+
+    async def run(self, model, tokens, call, priority=DEFAULT_PRIORITY):
+        """Await `call()` once the model's buckets allow it, retrying transient failures."""
+        attempt = 0
+        while True:
+            self._set_waiting(model, priority, 1)
+            try:
+                while True:
+                    wait = self._try_acquire(model, tokens, priority)
+                    if wait <= 0:
+                        break
+                    self.stats[model]['wait_seconds'] += wait
+                    await asyncio.sleep(wait)
+            finally:
+                self._set_waiting(model, priority, -1)
+
+            self.stats[model]['requests'] += 1
+            try:
+                return await call()
+            except Exception as e:
+                delay = self._record_failure(model, e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def run_sync(self, model, tokens, call, priority=DEFAULT_PRIORITY):
+        """Blocking counterpart of `run` for the synchronous generation path."""
+        attempt = 0
+        while True:
+            self._set_waiting(model, priority, 1)
+            try:
+                while True:
+                    wait = self._try_acquire(model, tokens, priority)
+                    if wait <= 0:
+                        break
+                    self.stats[model]['wait_seconds'] += wait
+                    time.sleep(wait)
+            finally:
+                self._set_waiting(model, priority, -1)
+
+            self.stats[model]['requests'] += 1
+            try:
+                return call()
+            except Exception as e:
+                delay = self._record_failure(model, e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
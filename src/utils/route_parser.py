@@ -1,55 +1,241 @@
 # src/utils/route_parser.py
 
+import glob
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 import yaml
-from typing import List, Dict, Any
+from src.utils.schema_validator import get_spec_validator, schema_fingerprint
 
-def parse_route_specs(file_path: str) -> List[Dict[str, Any]]:
+logger = logging.getLogger(__name__)
+
+# libyaml's loader is several times faster; fall back to the pure-Python one
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+SPEC_FILE_EXTENSIONS = ('.yaml', '.yml')
+DEFAULT_SPEC_CACHE_PATH = '.spec_cache/route_specs.json'
+# Bump when parsing or validation code changes so cached results are
+# discarded; schema edits are picked up through the schema fingerprint
+SPEC_CACHE_VERSION = 2
+
+
+def resolve_spec_files(source: str) -> List[str]:
+    """Expand a spec file, a directory of spec files or a glob pattern into sorted file paths."""
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(source)
+            for name in names if name.endswith(SPEC_FILE_EXTENSIONS)
+        )
+    if glob.has_magic(source):
+        return sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+    return [source]
+
+
+def load_yaml_with_lines(text: str) -> Tuple[Any, List[int]]:
+    """
+    Parse a YAML document, also returning the 1-based line each top-level
+    list item starts on (or the document's line if it is a single mapping).
+    """
+    loader = SafeLoader(text)
+    try:
+        node = loader.get_single_node()
+        if node is None:
+            return None, []
+        data = loader.construct_document(node)
+    finally:
+        loader.dispose()
+    if isinstance(node, yaml.SequenceNode):
+        return data, [item.start_mark.line + 1 for item in node.value]
+    return data, [node.start_mark.line + 1]
+
+
+def parse_route_specs(file_path: str) -> Optional[List[Dict[str, Any]]]:
     with open(file_path, 'r') as file:
         try:
-            route_specs = yaml.safe_load(file)
+            route_specs, _ = load_yaml_with_lines(file.read())
             return route_specs
         except yaml.YAMLError as e:
-            print(f"Error parsing YAML file: {e}")
+            logger.error(f"Error parsing YAML file {file_path}: {e}")
             return None
 
 def validate_route_spec(route_spec: Dict[str, Any]) -> List[str]:
-    errors = []
-    required_fields = ['route_details', 'logical_steps']
-    
-    for field in required_fields:
-        if field not in route_spec:
-            errors.append(f"Missing required field: {field}")
-    
-    if 'route_details' in route_spec:
-        if 'path' not in route_spec['route_details']:
-            errors.append("Missing 'path' in route_details")
-        elif not route_spec['route_details']['path'].startswith('/'):
-            errors.append("Path must start with a '/'")
-        
-        if 'method' not in route_spec['route_details']:
-            errors.append("Missing 'method' in route_details")
-        elif route_spec['route_details']['method'] not in ['GET', 'POST', 'PUT', 'DELETE', 'PATCH']:
-            errors.append("Invalid HTTP method")
-    
-    if 'logical_steps' in route_spec:
-        if not isinstance(route_spec['logical_steps'], list):
-            errors.append("logical_steps must be a list")
-    
-    return errors
-
-def parse_and_validate_route_specs(file_path: str) -> List[Dict[str, Any]]:
-    route_specs = parse_route_specs(file_path)
+    return get_spec_validator().validate(route_spec)
+
+
+def load_spec_file(file_path: str) -> Dict[str, Any]:
+    """
+    Parse and validate one spec file. Runs in a worker process, so it only
+    returns plain data: the valid specs with their line numbers, and error
+    messages prefixed with the file and line they refer to.
+    """
+    result = {'specs': [], 'lines': [], 'errors': []}
+    try:
+        with open(file_path, 'r') as f:
+            route_specs, lines = load_yaml_with_lines(f.read())
+    except yaml.YAMLError as e:
+        mark = getattr(e, 'problem_mark', None)
+        location = f"{file_path}:{mark.line + 1}" if mark else file_path
+        result['errors'].append(f"{location}: Error parsing YAML: {getattr(e, 'problem', None) or e}")
+        return result
+    except OSError as e:
+        result['errors'].append(f"{file_path}: Error reading spec file: {e}")
+        return result
+
     if route_specs is None:
-        return None
-    
-    valid_specs = []
-    for spec in route_specs:
-        errors = validate_route_spec(spec)
+        return result
+    if isinstance(route_specs, dict):
+        route_specs = [route_specs]
+    if not isinstance(route_specs, list):
+        result['errors'].append(f"{file_path}:{lines[0]}: Expected a list of route specifications")
+        return result
+
+    for spec, line, errors in zip(route_specs, lines, get_spec_validator().validate_many(route_specs)):
         if errors:
-            print(f"Invalid route specification for path '{spec.get('route_details', {}).get('path', 'unknown')}':")
+            path = spec.get('route_details', {}).get('path', 'unknown') if isinstance(spec, dict) else 'unknown'
             for error in errors:
-                print(f"- {error}")
+                result['errors'].append(f"{file_path}:{line}: Invalid route specification for path '{path}': {error}")
         else:
+            result['specs'].append(spec)
+            result['lines'].append(line)
+    return result
+
+
+def _file_hash(file_path: str) -> str:
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class SpecCache:
+    """
+    Parsed and validated spec files keyed by path. An entry is reused while
+    the file's mtime and size are unchanged, or when its content hash still
+    matches after a touch or checkout. The whole cache is discarded when the
+    schemas the specs were validated against change.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_SPEC_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        if path:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == SPEC_CACHE_VERSION and data.get('schema') == schema_fingerprint():
+                self.entries = data.get('files', {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error loading spec cache {self.path}: {str(e)}")
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': SPEC_CACHE_VERSION, 'schema': schema_fingerprint(), 'files': self.entries}, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not save spec cache {self.path}: {str(e)}")
+
+    def get(self, file_path: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(file_path)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        if entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return entry['result']
+        if _file_hash(file_path) == entry['sha256']:
+            entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            self.dirty = True
+            return entry['result']
+        return None
+
+    def set(self, file_path: str, result: Dict[str, Any]):
+        try:
+            stat = os.stat(file_path)
+            sha256 = _file_hash(file_path)
+        except OSError:
+            return
+        self.entries[file_path] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                                   'sha256': sha256, 'result': result}
+        self.dirty = True
+
+
+def load_route_specs(source: str, max_workers: Optional[int] = None,
+                     cache_path: Optional[str] = DEFAULT_SPEC_CACHE_PATH) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Load every valid route spec from a YAML file, a directory of YAML files
+    or a glob pattern. Files missing from the cache are parsed and validated
+    in a process pool. Returns the valid specs and the errors that kept the
+    others out, each prefixed with its file and line; errors are also logged.
+    """
+    files = resolve_spec_files(source)
+    if not files:
+        logger.error(f"No route spec files found for {source}")
+        return [], [f"{source}: No route spec files found"]
+
+    cache = SpecCache(cache_path)
+    results = {}
+    misses = []
+    for file_path in files:
+        cached = cache.get(file_path)
+        if cached is not None:
+            results[file_path] = cached
+        else:
+            misses.append(file_path)
+
+    workers = min(max_workers or os.cpu_count() or 1, len(misses))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            loaded = pool.map(load_spec_file, misses, chunksize=max(1, len(misses) // 32))
+            results.update(zip(misses, loaded))
+    else:
+        results.update((file_path, load_spec_file(file_path)) for file_path in misses)
+
+    for file_path in misses:
+        # A file that could not be read may appear later; don't remember the failure
+        if os.path.isfile(file_path):
+            cache.set(file_path, results[file_path])
+    cache.save()
+    logger.debug(f"Loaded {len(files)} spec files ({len(files) - len(misses)} from cache)")
+
+    valid_specs = []
+    errors = []
+    seen = {}
+    for file_path in files:
+        result = results[file_path]
+        for error in result['errors']:
+            logger.error(error)
+            errors.append(error)
+        for spec, line in zip(result['specs'], result['lines']):
+            details = spec['route_details']
+            key = f"{details.get('method')} {details.get('path')}"
+            if key in seen:
+                logger.warning(f"{file_path}:{line}: Duplicate route {key}, first defined at {seen[key]}")
+            else:
+                seen[key] = f"{file_path}:{line}"
             valid_specs.append(spec)
-    
-    return valid_specs
+
+    return valid_specs, errors
+
+
+def parse_and_validate_route_specs(source: str, max_workers: Optional[int] = None,
+                                   cache_path: Optional[str] = DEFAULT_SPEC_CACHE_PATH) -> List[Dict[str, Any]]:
+    """The valid specs of `source`; see load_route_specs."""
+    return load_route_specs(source, max_workers, cache_path)[0]
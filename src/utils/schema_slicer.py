@@ -0,0 +1,80 @@
+# src/utils/schema_slicer.py
+
+import json
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaIndex:
+    """
+    Index of the tables, columns and foreign-key relations in a db_schema,
+    used to cut the schema down to the tables a spec actually touches.
+
+    Only the tables a table references are followed by default; with
+    `follow_incoming` the tables referencing it are followed too, which
+    pulls in much more of the schema for widely referenced tables.
+    """
+
+    def __init__(self, db_schema: Dict[str, Any], fk_hops: int = 1, follow_incoming: bool = False):
+        self.db_schema = db_schema
+        self.fk_hops = fk_hops
+        self.follow_incoming = follow_incoming
+        self.tables = db_schema.get('tables', {})
+        self.columns = {}
+        self.neighbours = {table: set() for table in self.tables}
+        self._slices = {}
+
+        for table, details in self.tables.items():
+            self.columns[table] = {column['name']: column for column in details.get('columns', [])}
+            for column in details.get('columns', []):
+                target = column.get('foreign_key', '').split('.')[0]
+                if target in self.tables and target != table:
+                    self.neighbours[table].add(target)
+                    if follow_incoming:
+                        self.neighbours[target].add(table)
+
+    def closure(self, tables: Iterable[str], hops: Optional[int] = None) -> set:
+        """Return the given tables plus every table within `hops` foreign-key hops."""
+        hops = self.fk_hops if hops is None else hops
+        selected = {table for table in tables if table in self.tables}
+        frontier = set(selected)
+        for _ in range(hops):
+            frontier = {n for table in frontier for n in self.neighbours[table]} - selected
+            if not frontier:
+                break
+            selected |= frontier
+        return selected
+
+    def slice(self, tables: Optional[Iterable[str]], hops: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Return a schema containing only the requested tables and their
+        foreign-key neighbours. Falls back to the full schema when no known
+        tables are requested.
+        """
+        hops = self.fk_hops if hops is None else hops
+        key = (frozenset(tables or ()), hops)
+        if key in self._slices:
+            return self._slices[key]
+
+        unknown = sorted(table for table in key[0] if table not in self.tables)
+        if unknown:
+            logger.warning(f"Tables not found in db schema: {', '.join(unknown)}")
+
+        selected = self.closure(key[0], hops)
+        if not selected:
+            sliced = self.db_schema
+        else:
+            # Keep the schema's own table order so slices serialize stably
+            sliced = {'tables': {table: details for table, details in self.tables.items() if table in selected}}
+
+        self._slices[key] = sliced
+        return sliced
+
+    def slice_json(self, tables: Optional[Iterable[str]], hops: Optional[int] = None) -> str:
+        hops = self.fk_hops if hops is None else hops
+        key = ('json', frozenset(tables or ()), hops)
+        if key not in self._slices:
+            self._slices[key] = json.dumps(self.slice(tables, hops), indent=2)
+        return self._slices[key]
@@ -1,66 +1,146 @@
 # src/utils/schema_validator.py
 
-import yaml
-from cerberus import Validator
-from utils.json_validator import load_json_schema, validate_json
-
-# Define the schema for route specifications
-route_schema = {
-    'path': {'type': 'string', 'required': True},
-    'method': {'type': 'string', 'required': True, 'allowed': ['GET', 'POST', 'PUT', 'DELETE']},
-    'description': {'type': 'string', 'required': True},
+import hashlib
+import json
+import logging
+import os
+import sys
+from src.utils.json_validator import load_json_schema, compile_json_schema, collect_json_errors
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INPUT_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                         'schemas', 'input_schema.json')
+
+HTTP_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'PATCH']
+
+string_list = {'type': 'array', 'items': {'type': 'string'}}
+
+
+def _record(properties, required=()):
+    """An object with the given properties and no others, so misspelled keys are errors."""
+    schema = {'type': 'object', 'properties': properties, 'additionalProperties': False}
+    if required:
+        schema['required'] = list(required)
+    return schema
+
+
+# JSON Schema for route specifications
+route_schema = _record({
+    'route_details': _record({
+        'path': {'type': 'string', 'pattern': '^/.*$'},
+        'method': {'type': 'string', 'enum': HTTP_METHODS},
+        'description': {'type': 'string'},
+    }, required=('path', 'method', 'description')),
+    'file_names': {
+        'type': 'object',
+        'propertyNames': {'enum': ['route', 'controller', 'service', 'swagger', 'test']},
+        'additionalProperties': {'type': 'string', 'pattern': r'^[\w./-]+$'},
+    },
+    'required_tables': string_list,
     'input': {
-        'type': 'list',
-        'schema': {
-            'type': 'dict',
-            'schema': {
-                'name': {'type': 'string', 'required': True},
-                'type': {'type': 'string', 'required': True, 'allowed': ['string', 'number', 'boolean', 'object', 'array']},
-                'description': {'type': 'string', 'required': True}
-            }
-        }
+        'type': 'array',
+        'items': _record({
+            'name': {'type': 'string'},
+            'type': {'type': 'string'},
+            'description': {'type': 'string'},
+        }, required=('name', 'type')),
     },
-    'logicalSteps': {
-        'type': 'list',
-        'schema': {
-            'type': 'dict',
-            'schema': {
-                'step': {'type': 'string', 'required': True},
-                'description': {'type': 'string', 'required': True}
-            }
-        }
+    'logical_steps': {
+        'type': 'array',
+        'items': _record({
+            'step': {'type': 'string'},
+            'description': {'type': 'string'},
+        }, required=('step', 'description')),
     },
-    'middleware': {
-        'type': 'list',
-        'schema': {'type': 'string'}
-    }
-}
+    'required_middleware': string_list,
+    'required_utils': string_list,
+    'middleware': string_list,
+}, required=('route_details', 'logical_steps'))
+
+
+class SpecValidator:
+    """
+    Validates route specs against the route schema and the JSON input
+    schema. Both are compiled into one validator when the SpecValidator is
+    created and reused for every spec, and every error of a spec is
+    collected rather than stopping at the first one.
+    """
+
+    def __init__(self, route_schema=route_schema, input_schema=None):
+        if input_schema is None:
+            input_schema = load_json_schema(DEFAULT_INPUT_SCHEMA_PATH)
+        # input_schema.json describes the whole spec file; specs are its items
+        if input_schema.get('type') == 'array' and 'items' in input_schema:
+            input_schema = input_schema['items']
+        self._validator = compile_json_schema({'allOf': [route_schema, input_schema]})
+
+    def validate(self, spec):
+        """Return every error found in `spec`; an empty list means it is valid."""
+        if not isinstance(spec, dict):
+            return ["Route specification must be a mapping"]
+        errors = []
+        for message in collect_json_errors(self._validator, spec):
+            # Both schemas often report the same problem
+            if message not in errors:
+                errors.append(message)
+        return errors
+
+    def validate_many(self, specs):
+        """Validate a batch of specs, returning one error list per spec."""
+        return [self.validate(spec) for spec in specs]
+
+
+_spec_validator = None
+_schema_fingerprint = None
+
+def schema_fingerprint():
+    """
+    Hash of the route schema and the input schema file, so results cached
+    from validating against older schemas can be told apart.
+    """
+    global _schema_fingerprint
+    if _schema_fingerprint is None:
+        digest = hashlib.sha256(json.dumps(route_schema, sort_keys=True).encode('utf-8'))
+        try:
+            with open(DEFAULT_INPUT_SCHEMA_PATH, 'rb') as f:
+                digest.update(f.read())
+        except OSError as e:
+            logger.error(f"Error reading input schema {DEFAULT_INPUT_SCHEMA_PATH}: {str(e)}")
+        _schema_fingerprint = digest.hexdigest()
+    return _schema_fingerprint
+
+def get_spec_validator():
+    """Shared validator, compiled on first use (once per process)."""
+    global _spec_validator
+    if _spec_validator is None:
+        _spec_validator = SpecValidator()
+    return _spec_validator
+
+
+def validate_yaml(file_path, route_schema=route_schema, input_schema=None):
+    from src.utils.route_parser import load_yaml_with_lines
 
-def validate_yaml(file_path, route_schema, input_schema):
     with open(file_path, 'r') as file:
-        data = yaml.safe_load(file)
-    
-    v = Validator(route_schema)
-    for entry in data:
-        if not v.validate(entry, route_schema):
-            print(f"Validation errors in {entry['path']}: {v.errors}")
-            return False
-        
-        for input_spec in entry.get('input', []):
-            valid, message = validate_json(input_spec, input_schema)
-            if not valid:
-                print(f"Input validation error in {entry['path']}: {message}")
-                return False
-                
-    return True
+        data, lines = load_yaml_with_lines(file.read())
+
+    validator = SpecValidator(route_schema, input_schema)
+    valid = True
+    for entry, line, errors in zip(data or [], lines, validator.validate_many(data or [])):
+        path = entry.get('route_details', {}).get('path', 'unknown') if isinstance(entry, dict) else 'unknown'
+        for error in errors:
+            logger.error(f"{file_path}:{line}: Validation error in {path}: {error}")
+        valid = valid and not errors
+    return valid
 
 # Ensure schema is available for import
 schema = route_schema
 
 if __name__ == "__main__":
-    specs_file_path = 'data/route_specs.yaml'
-    input_schema = load_json_schema('src/schemas/input_schema.json')
-    if validate_yaml(specs_file_path, route_schema, input_schema):
+    logging.basicConfig(level=logging.INFO)
+    specs_file_path = sys.argv[1] if len(sys.argv) > 1 else 'data/route_specs.yaml'
+    if validate_yaml(specs_file_path):
         print("YAML file is valid")
     else:
         print("YAML file is invalid")
+        sys.exit(1)
@@ -0,0 +1,145 @@
+# src/utils/stage_graph.py
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StageSkipped(Exception):
+    """Raised for a stage whose inputs could not be produced."""
+
+
+class StreamingOutput:
+    """
+    Output of a stage that is still being produced. Handed to consumers that
+    declared the stage in `prefix_inputs`, so they can start once the part
+    they need has arrived instead of waiting for the whole output.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.done = False
+        self._changed = asyncio.Condition()
+
+    async def append(self, chunk: str):
+        async with self._changed:
+            self.text += chunk
+            self._changed.notify_all()
+
+    async def finish(self):
+        async with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    async def wait_for(self, predicate: Callable[[str], bool]) -> str:
+        """Wait until `predicate(text)` holds or the output is complete."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.done or predicate(self.text))
+            return self.text
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[..., Awaitable[Any]]
+    inputs: List[str] = field(default_factory=list)
+    # Inputs this stage can consume while they are still streaming. The stage
+    # receives a StreamingOutput for them instead of the finished output.
+    prefix_inputs: List[str] = field(default_factory=list)
+
+
+class StageGraph:
+    """
+    Runs a set of async stages as a DAG. Every stage starts as soon as all of
+    its declared inputs are available and receives them in memory as a dict
+    keyed by the upstream stage name.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage name: {stage.name}")
+            self.stages[stage.name] = stage
+
+        for stage in stages:
+            for dep in stage.inputs + stage.prefix_inputs:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+        self.streamed = {dep for stage in stages for dep in stage.prefix_inputs}
+
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order = []
+        state = {}
+
+        def visit(name, chain):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Cycle detected in stage graph: {' -> '.join(chain + [name])}")
+            state[name] = 'visiting'
+            for dep in self.stages[name].inputs + self.stages[name].prefix_inputs:
+                visit(dep, chain + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def dependents(self, name: str) -> List[str]:
+        """Return every stage that directly or transitively consumes `name`."""
+        found = []
+        for candidate in self.order:
+            stage = self.stages[candidate]
+            deps = stage.inputs + stage.prefix_inputs
+            if name in deps or any(dep in found for dep in deps):
+                found.append(candidate)
+        return found
+
+    async def run(self) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+        """
+        Execute all stages. Returns the outputs of the stages that succeeded
+        and the errors of those that failed or were skipped because an input
+        failed. Stages that others consume as a prefix are called with a
+        StreamingOutput as a second argument to publish their partial output.
+        """
+        results = {}
+        errors = {}
+        tasks = {}
+        streams = {name: StreamingOutput() for name in self.streamed}
+
+        async def run_stage(stage):
+            if stage.inputs:
+                await asyncio.gather(*(tasks[dep] for dep in stage.inputs), return_exceptions=True)
+            failed = [dep for dep in stage.inputs if dep in errors]
+            if failed:
+                errors[stage.name] = StageSkipped(f"Skipped because {', '.join(failed)} failed")
+                if stage.name in streams:
+                    await streams[stage.name].finish()
+                return
+
+            inputs = {dep: results[dep] for dep in stage.inputs}
+            inputs.update({dep: streams[dep] for dep in stage.prefix_inputs})
+            try:
+                if stage.name in streams:
+                    results[stage.name] = await stage.run(inputs, streams[stage.name])
+                else:
+                    results[stage.name] = await stage.run(inputs)
+            except Exception as e:
+                logger.error(f"Stage '{stage.name}' failed: {str(e)}")
+                errors[stage.name] = e
+            finally:
+                if stage.name in streams:
+                    await streams[stage.name].finish()
+
+        for name in self.order:
+            tasks[name] = asyncio.ensure_future(run_stage(self.stages[name]))
+        await asyncio.gather(*tasks.values())
+
+        return results, errors
@@ -36,17 +36,5 @@ def get_template(template_type):
 
         Separate each file with "--- FILE SEPARATOR ---" and start each file with a comment indicating its type (route, controller, or service).
         """
-    elif template_type == 'swagger_template':
-        return """
-        Given the following route file:
-        {route_file}
-
-        And the following example Swagger documentation:
-        {example_swagger}
-
-        Generate Swagger documentation that describes the API endpoints defined in the route file, following the style and structure of the example Swagger documentation.
-
-        Generated Swagger Documentation:
-        """
     else:
         raise ValueError(f"Unknown template type: {template_type}")
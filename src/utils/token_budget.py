@@ -0,0 +1,145 @@
+# src/utils/token_budget.py
+
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Maximum prompt tokens per stage, leaving room for the completion
+DEFAULT_STAGE_BUDGETS = {
+    'route': 12000,
+    'controller': 16000,
+    'service': 24000,
+    'swagger': 8000,
+    'test': 24000,
+    # Route, controller and service in one call (generation mode 'unified')
+    'unified': 24000,
+}
+
+# Slots that may be trimmed for each stage, lowest priority first. Slots not
+# listed here (the spec itself and upstream outputs) are never trimmed.
+TRIMMABLE_SLOTS = {
+    'route': ['project_structure', 'example_route', 'project_info'],
+    'controller': ['project_structure', 'example_controller', 'project_info'],
+    'service': ['project_structure', 'example_service', 'project_info', 'db_schema'],
+    'swagger': ['db_schema'],
+    'test': ['example_test_file', 'project_structure'],
+    'unified': ['middleware_utils', 'example_service', 'example_controller', 'example_route', 'db_schema'],
+}
+
+# Below this many tokens a trimmed slot is dropped rather than truncated
+MIN_SLOT_TOKENS = 256
+
+TRUNCATED_MARKER = "\n... (truncated to fit the context budget)"
+OMITTED_MARKER = "(omitted to fit the context budget)"
+
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken, falling back to a 4-characters-per-token
+    estimate when the encoding is unavailable (e.g. no network to fetch it).
+    """
+
+    def __init__(self):
+        self._encodings = {}
+
+    def _encoding(self, model):
+        if model not in self._encodings:
+            try:
+                import tiktoken
+                try:
+                    self._encodings[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self._encodings[model] = tiktoken.get_encoding('cl100k_base')
+            except Exception as e:
+                logger.warning(f"tiktoken encoding for {model} unavailable, estimating token counts: {str(e)}")
+                self._encodings[model] = None
+        return self._encodings[model]
+
+    def count(self, text, model=None):
+        encoding = self._encoding(model or 'gpt-4o-mini')
+        if encoding is None:
+            return (len(text) + 3) // 4
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text, max_tokens, model=None):
+        encoding = self._encoding(model or 'gpt-4o-mini')
+        if encoding is None:
+            return text[:max_tokens * 4]
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+class TokenBudget:
+    """
+    Fits prompt inputs into a per-stage token budget by truncating or dropping
+    the lowest-priority slots, and records the per-slot token counts of every
+    call.
+    """
+
+    def __init__(self, budgets=None, trimmable_slots=None, counter=None):
+        self.budgets = dict(DEFAULT_STAGE_BUDGETS, **(budgets or {}))
+        self.trimmable_slots = dict(TRIMMABLE_SLOTS, **(trimmable_slots or {}))
+        self.counter = counter or TokenCounter()
+        self.usage = []
+
+    def fit(self, stage, inputs, overhead=0, model=None):
+        """
+        Return a copy of `inputs` that fits the stage's budget, and the
+        resulting prompt token count. `overhead` is the token count of the
+        prompt template itself.
+        """
+        counts = {slot: self.counter.count(str(value), model) for slot, value in inputs.items()}
+        budget = self.budgets.get(stage)
+        total = overhead + sum(counts.values())
+        fitted = dict(inputs)
+        trimmed = {}
+
+        if budget is not None and total > budget:
+            for slot in self.trimmable_slots.get(stage, []):
+                excess = total - budget
+                if excess <= 0:
+                    break
+                if slot not in fitted or counts[slot] == 0:
+                    continue
+
+                keep = counts[slot] - excess - self.counter.count(TRUNCATED_MARKER, model)
+                if keep < MIN_SLOT_TOKENS:
+                    fitted[slot] = OMITTED_MARKER
+                    trimmed[slot] = 'dropped'
+                else:
+                    fitted[slot] = self.counter.truncate(str(fitted[slot]), keep, model) + TRUNCATED_MARKER
+                    trimmed[slot] = 'truncated'
+                new_count = self.counter.count(fitted[slot], model)
+                total -= counts[slot] - new_count
+                counts[slot] = new_count
+
+            if total > budget:
+                logger.warning(f"{stage} prompt is {total} tokens, over its budget of {budget} after trimming")
+            else:
+                logger.info(f"Trimmed {stage} prompt to fit {budget} tokens: {trimmed}")
+
+        self.usage.append({
+            'stage': stage,
+            'model': model,
+            'budget': budget,
+            'total_tokens': total,
+            'overhead_tokens': overhead,
+            'slot_tokens': counts,
+            'trimmed': trimmed,
+        })
+        return fitted, total
+
+    def reset(self):
+        self.usage = []
+
+    def summary(self):
+        """Aggregate the recorded usage per stage and slot."""
+        stages = defaultdict(lambda: {'calls': 0, 'total_tokens': 0, 'trimmed_calls': 0, 'slot_tokens': defaultdict(int)})
+        for record in self.usage:
+            stage = stages[record['stage']]
+            stage['calls'] += 1
+            stage['total_tokens'] += record['total_tokens']
+            stage['trimmed_calls'] += 1 if record['trimmed'] else 0
+            for slot, count in record['slot_tokens'].items():
+                stage['slot_tokens'][slot] += count
+        return {name: dict(values, slot_tokens=dict(values['slot_tokens'])) for name, values in stages.items()}
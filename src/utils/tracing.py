@@ -0,0 +1,250 @@
+# src/utils/tracing.py
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'ai_agent'
+
+# Span arguments summed into Prometheus counters, with their help text
+COUNTED_ARGS = {
+    'prompt_tokens': "Prompt tokens sent to the LLM",
+    'completion_tokens': "Completion tokens returned by the LLM",
+    'retries': "LLM calls retried after a rate-limit or transient error",
+    'bytes_written': "Bytes written to generated files",
+    'cache_hit': "LLM calls answered from the response cache",
+}
+
+# Payload logging: fraction of eligible payloads logged and how much of each
+PAYLOAD_SAMPLE_RATE = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '0.1'))
+MAX_PAYLOAD_CHARS = 500
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_current_lane = contextvars.ContextVar('trace_lane', default='main')
+
+
+class Span:
+    __slots__ = ('name', 'category', 'start', 'end', 'args', 'lane', 'thread')
+
+    def __init__(self, name, category, args, lane):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.lane = lane
+        self.thread = threading.get_ident()
+        self.start = time.perf_counter()
+        self.end = None
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def add(self, name, value):
+        self.args[name] = self.args.get(name, 0) + value
+
+
+class _NullSpan:
+    """Stands in for the current span outside any span, so callers need no checks."""
+
+    def set(self, **args):
+        pass
+
+    def add(self, name, value):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Records nested spans (stages, LLM calls, file writes, reviews) with their
+    wall time and counters such as tokens, queue wait and bytes written. The
+    spans can be exported as a Chrome trace (chrome://tracing, Perfetto) and
+    summarised as Prometheus text-format metrics.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, category='stage', **args):
+        if not self.enabled:
+            yield NULL_SPAN
+            return
+        parent = _current_span.get()
+        if parent is not None and 'stage' not in args and 'stage' in parent.args:
+            # Writes and LLM calls inside a stage are attributed to it
+            args['stage'] = parent.args['stage']
+        span = Span(name, category, args, _current_lane.get())
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.args['error'] = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current_span.reset(token)
+            with self._lock:
+                self.spans.append(span)
+
+    @staticmethod
+    def set_lane(name):
+        """
+        Put the spans started from now on in the current context, e.g. the
+        asyncio task of one spec, onto their own trace row.
+        """
+        _current_lane.set(name)
+
+    @staticmethod
+    def current():
+        return _current_span.get() or NULL_SPAN
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+        self._origin = time.perf_counter()
+
+    def to_chrome_trace(self):
+        lanes = {}
+        events = []
+        for span in sorted(self.spans, key=lambda span: span.start):
+            lane = lanes.setdefault(span.lane, len(lanes) + 1)
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': round((span.start - self._origin) * 1e6, 1),
+                'dur': round(span.duration * 1e6, 1),
+                'pid': os.getpid(),
+                'tid': lane,
+                'args': {name: value for name, value in span.args.items() if value is not None},
+            })
+        events.extend({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': str(lane)}}
+                      for lane, tid in lanes.items())
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        _write_atomic(path, json.dumps(self.to_chrome_trace()))
+        logger.info(f"Chrome trace with {len(self.spans)} spans written to {path}")
+
+    def to_prometheus(self):
+        durations = defaultdict(lambda: [0, 0.0])
+        queue_waits = defaultdict(lambda: [0, 0.0])
+        counters = defaultdict(lambda: defaultdict(float))
+        for span in self.spans:
+            stage = span.args.get('stage', span.name)
+            summary = durations[(span.category, stage)]
+            summary[0] += 1
+            summary[1] += span.duration
+            if 'queue_wait_seconds' in span.args:
+                wait = queue_waits[stage]
+                wait[0] += 1
+                wait[1] += span.args['queue_wait_seconds']
+            for name in COUNTED_ARGS:
+                value = span.args.get(name)
+                if value:
+                    counters[name][stage] += value
+
+        lines = [
+            f"# HELP {METRIC_PREFIX}_span_duration_seconds Wall time of traced spans",
+            f"# TYPE {METRIC_PREFIX}_span_duration_seconds summary",
+        ]
+        for (category, stage), (count, total) in sorted(durations.items()):
+            labels = f'category="{category}",stage="{stage}"'
+            lines.append(f"{METRIC_PREFIX}_span_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{METRIC_PREFIX}_span_duration_seconds_count{{{labels}}} {count}")
+
+        lines.append(f"# HELP {METRIC_PREFIX}_queue_wait_seconds Time LLM calls waited for a concurrency or rate-limit slot")
+        lines.append(f"# TYPE {METRIC_PREFIX}_queue_wait_seconds summary")
+        for stage, (count, total) in sorted(queue_waits.items()):
+            lines.append(f'{METRIC_PREFIX}_queue_wait_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{METRIC_PREFIX}_queue_wait_seconds_count{{stage="{stage}"}} {count}')
+
+        for name, help_text in COUNTED_ARGS.items():
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for stage, value in sorted(counters[name].items()):
+                lines.append(f'{metric}{{stage="{stage}"}} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        _write_atomic(path, self.to_prometheus())
+        logger.info(f"Metrics written to {path}")
+
+
+def _write_atomic(path, content):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+# Off until a run asks for a trace or metrics, since every span is kept in memory
+_tracer = Tracer(enabled=False)
+
+def get_tracer():
+    return _tracer
+
+
+def traced(name, category='stage'):
+    """Decorator recording each call of a sync or async function as a span."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().span(name, category, stage=name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(name, category, stage=name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _truncate(value, limit):
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= limit else f"{text[:limit]}... ({len(text)} chars)"
+
+
+def log_payload(log, label, payload, sample_rate=None, limit=MAX_PAYLOAD_CHARS):
+    """
+    Log a large payload (prompt inputs, generated content) at DEBUG level.
+    Nothing is formatted unless DEBUG is enabled and the payload is sampled;
+    dicts are logged with each value truncated to `limit` characters.
+    """
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= (PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate):
+        return
+    if callable(payload):
+        payload = payload()
+    if isinstance(payload, dict):
+        text = ', '.join(f"{key}={_truncate(value, limit)}" for key, value in payload.items())
+    else:
+        text = _truncate(payload, limit)
+    log.debug(f"{label}: {text}")
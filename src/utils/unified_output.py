@@ -0,0 +1,98 @@
+# src/utils/unified_output.py
+
+import re
+from typing import Callable, Dict, List, Optional
+
+FILE_SEPARATOR = '--- FILE SEPARATOR ---'
+UNIFIED_STAGES = ('route', 'controller', 'service')
+
+SEPARATOR_LINE = re.compile(r'^[ \t]*-{3,}[ \t]*FILE SEPARATOR[ \t]*-{3,}[ \t]*(?:\n|$)', re.MULTILINE)
+FENCE_LINE = re.compile(r'^\s*```')
+COMMENT_LINE = re.compile(r'^\s*(?://|/\*|\*|#)')
+FILE_TYPE = re.compile(r'route|controller|service', re.IGNORECASE)
+
+
+def strip_fences(text: str) -> str:
+    """Drop markdown code fences the model may have wrapped a file in."""
+    lines = [line for line in text.strip().splitlines() if not FENCE_LINE.match(line)]
+    return '\n'.join(lines).strip() + '\n' if lines else ''
+
+
+def section_type(text: str) -> Optional[str]:
+    """The file type named by the comment a section starts with, if any."""
+    for line in [line for line in text.splitlines() if line.strip() and not FENCE_LINE.match(line)][:3]:
+        if COMMENT_LINE.match(line):
+            match = FILE_TYPE.search(line)
+            if match:
+                return match.group(0).lower()
+    return None
+
+
+class SectionParser:
+    """
+    Splits a unified response into its files while it streams in. A section
+    is complete once the separator after it arrives, and is handed to
+    `on_section(stage, content)` right away. Sections are matched to files by
+    the comment they start with, or by their position when the model left
+    those comments out.
+    """
+
+    def __init__(self, on_section: Optional[Callable[[str, str], None]] = None):
+        self.on_section = on_section
+        self.reset()
+
+    def reset(self):
+        """Start over, e.g. when a failed call is retried."""
+        self.text = ''
+        self.sections = {}
+        self._scanned = 0
+        self._unmarked: List[str] = []
+        self._marked = False
+        self._separated = False
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        while True:
+            match = SEPARATOR_LINE.search(self.text, self._scanned)
+            # A separator at the very end may still be followed by more of its line
+            if match is None or (match.end() == len(self.text) and not match.group(0).endswith('\n')):
+                return
+            self._separated = True
+            self._add(self.text[self._scanned:match.start()])
+            self._scanned = match.end()
+
+    def finish(self) -> Dict[str, str]:
+        """Complete the last section; returns every file found, keyed by stage."""
+        self._add(self.text[self._scanned:])
+        self._scanned = len(self.text)
+        if not self._marked and self._separated:
+            # No type comments: take the sections in the order the prompt asks for them
+            for stage, content in zip(UNIFIED_STAGES, self._unmarked):
+                self._emit(stage, content)
+        self._unmarked = []
+        return self.sections
+
+    def _add(self, text: str):
+        content = strip_fences(text)
+        if not content:
+            return
+        stage = section_type(content)
+        if stage is None:
+            self._unmarked.append(content)
+            return
+        self._marked = True
+        self._emit(stage, content)
+
+    def _emit(self, stage: str, content: str):
+        if stage in self.sections:
+            return
+        self.sections[stage] = content
+        if self.on_section is not None:
+            self.on_section(stage, content)
+
+
+def split_sections(text: str) -> Dict[str, str]:
+    """The files of a complete unified response, keyed by stage."""
+    parser = SectionParser()
+    parser.feed(text)
+    return parser.finish()
@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class BatchServerStub:
+    """
+    Local stand-in for the OpenAI files and batches endpoints. Every batch
+    completes on its second status poll; each request is answered by
+    `respond(custom_id, body)`.
+    """
+
+    def __init__(self, respond=None):
+        self.respond = respond or (lambda custom_id, body: f"// generated for {custom_id}\n")
+        self.files = {}
+        self.batches = {}
+        self.polls = {}
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _add_file(self, content, filename, purpose):
+        file_id = f"file-{len(self.files) + 1}"
+        self.files[file_id] = content
+        return {
+            'id': file_id, 'object': 'file', 'bytes': len(content), 'created_at': int(time.time()),
+            'filename': filename, 'purpose': purpose, 'status': 'processed',
+        }
+
+    def _complete(self, batch):
+        lines = []
+        for line in self.files[batch['input_file_id']].decode().splitlines():
+            request = json.loads(line)
+            content = self.respond(request['custom_id'], request['body'])
+            lines.append(json.dumps({
+                'id': f"resp-{request['custom_id']}",
+                'custom_id': request['custom_id'],
+                'response': {'status_code': 200, 'request_id': 'req', 'body': {
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}}],
+                    'usage': {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15},
+                }},
+                'error': None,
+            }))
+        output = self._add_file('\n'.join(lines).encode(), 'output.jsonl', 'batch_output')
+        batch.update(status='completed', output_file_id=output['id'])
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload, raw=False):
+                body = payload if raw else json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream' if raw else 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                if self.path == '/v1/files':
+                    message = BytesParser(policy=default).parsebytes(
+                        f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+                    fields = {part.get_param('name', header='content-disposition'): part for part in message.iter_parts()}
+                    upload = fields['file']
+                    self._send(stub._add_file(upload.get_payload(decode=True), upload.get_filename(),
+                                              fields['purpose'].get_content().strip()))
+                elif self.path == '/v1/batches':
+                    request = json.loads(body)
+                    batch_id = f"batch-{len(stub.batches) + 1}"
+                    stub.batches[batch_id] = {
+                        'id': batch_id, 'object': 'batch', 'endpoint': request['endpoint'],
+                        'input_file_id': request['input_file_id'], 'completion_window': request['completion_window'],
+                        'created_at': int(time.time()), 'status': 'in_progress',
+                    }
+                    stub.polls[batch_id] = 0
+                    self._send(stub.batches[batch_id])
+                else:
+                    self.send_error(404)
+
+            def do_GET(self):
+                parts = self.path.strip('/').split('/')
+                if parts[:2] == ['v1', 'batches'] and parts[2] in stub.batches:
+                    batch = stub.batches[parts[2]]
+                    stub.polls[parts[2]] += 1
+                    if batch['status'] == 'in_progress' and stub.polls[parts[2]] >= 2:
+                        stub._complete(batch)
+                    self._send(batch)
+                elif parts[:2] == ['v1', 'files'] and parts[-1] == 'content' and parts[2] in stub.files:
+                    self._send(stub.files[parts[2]], raw=True)
+                else:
+                    self.send_error(404)
+
+        return Handler
@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+import time
+import pytest
+import yaml
+from openai import OpenAI
+from src.ai_agent import AIAgent, STAGE_INPUTS
+from src.utils.batch_runner import BatchRunner, stage_waves
+from src.utils.output_sink import OutputSink
+from tests.batch_server_stub import BatchServerStub
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(REPO_ROOT, 'data'), tmp_path / 'data')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    return tmp_path
+
+
+@pytest.fixture
+def server():
+    stub = BatchServerStub().start()
+    yield stub
+    stub.stop()
+
+
+def load_specs():
+    with open('data/route_specs.yaml', 'r') as f:
+        return yaml.safe_load(f)
+
+
+def test_stages_are_grouped_into_dependency_waves():
+    assert stage_waves(STAGE_INPUTS) == [['route', 'swagger'], ['controller'], ['service'], ['test']]
+
+
+def test_batch_run_fans_results_into_stage_outputs(workdir, server):
+    agent = AIAgent(use_cache=False)
+    runner = BatchRunner(agent, STAGE_INPUTS, client=OpenAI(api_key='test-key', base_url=server.base_url),
+                         poll_interval=0)
+    stats = runner.run(load_specs())
+
+    # Swagger is built locally, the other four stages go through the batch API
+    assert stats['succeeded'] == 4
+    assert stats['local'] == 1
+    assert len(server.batches) == 4
+    with open('generated/mentorRegisterController.js') as f:
+        assert f.read() == "// generated for 0:controller\n"
+    assert os.path.exists('generated/tests/test_mentorRegisterRoute.test.js')
+    assert not os.path.exists(runner.state_path)
+    assert all(not rebuild for _, rebuild, _ in agent.plan_spec(load_specs()[0]))
+
+
+def test_interrupted_batch_run_resumes_without_resubmitting(workdir, server):
+    client = OpenAI(api_key='test-key', base_url=server.base_url)
+    first = BatchRunner(AIAgent(use_cache=False), STAGE_INPUTS, client=client, poll_interval=0)
+    first.run_wave(0, first.waves[0], load_specs())
+    first.run_wave(1, first.waves[1], load_specs(), wait=False)
+    assert len(server.batches) == 2
+
+    resumed = BatchRunner(AIAgent(use_cache=False), STAGE_INPUTS, client=client, poll_interval=0)
+    resumed.run(load_specs())
+
+    assert len(server.batches) == 4
+    assert resumed.stats['submitted'] == 2
+    resumed.agent.output_sink.flush()
+    with open('generated/swaggerDocs.json') as f:
+        assert 'post' in json.load(f)['paths']['/app/admin/mentor-register']
+
+
+def test_waves_wait_for_queued_writes_of_earlier_waves(workdir, server, monkeypatch):
+    write = OutputSink._write
+
+    def slow_write(self, path, content):
+        time.sleep(0.05)
+        return write(self, path, content)
+
+    monkeypatch.setattr(OutputSink, '_write', slow_write)
+    agent = AIAgent(use_cache=False, generation_mode='contract')
+    runner = BatchRunner(agent, agent.stage_inputs, client=OpenAI(api_key='test-key', base_url=server.base_url),
+                         poll_interval=0)
+    stats = runner.run(load_specs()[:1])
+
+    assert stats['skipped'] == 0
+    assert os.path.exists('generated/tests/test_mentorRegisterRoute.test.js')
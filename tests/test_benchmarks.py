@@ -0,0 +1,56 @@
+import asyncio
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.run import run_benchmark, compare_results
+from benchmarks.spec_generator import generate_specs
+from src.utils.schema_validator import SpecValidator
+
+
+def test_synthetic_specs_are_valid_and_deterministic():
+    specs = generate_specs(50, seed=3)
+
+    assert specs == generate_specs(50, seed=3)
+    assert len({spec['route_details']['path'] for spec in specs}) == 50
+    assert not any(SpecValidator().validate_many(specs))
+
+
+def test_fake_model_returns_sized_output_with_usage():
+    llm = FakeChatModel(output_chars=300, chunk_chars=100)
+
+    message = llm.invoke("hello")
+    chunks = asyncio.run(_collect(llm.astream("hello")))
+
+    assert len(message.content) == 300
+    assert message.response_metadata['token_usage']['completion_tokens'] == 75
+    assert len(chunks) == 3 and ''.join(chunk.content for chunk in chunks) == message.content
+    assert chunks[-1].usage_metadata['output_tokens'] == 75
+    assert llm.calls == 2
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_benchmark_runs_the_pipeline_offline(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    result = run_benchmark(num_specs=3, latency=0, output_chars=200)
+    metrics = result['metrics']
+
+    assert metrics['specs'] == 3 and metrics['failed_specs'] == 0
+    # Swagger docs are built without an LLM call
+    assert metrics['llm_calls'] == 12
+    assert metrics['stage_latency']['route']['count'] == 3
+    assert metrics['prompt_build']['test']['p95'] is not None
+
+    slower = {**result, 'metrics': {**metrics, 'specs_per_minute': metrics['specs_per_minute'] / 2}}
+    assert [name for name, *_ in compare_results(slower, result)] == ['specs_per_minute']
+    assert compare_results(result, slower) == []
+
+
+def test_unified_mode_benchmark_makes_one_generation_call_per_spec(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    metrics = run_benchmark(num_specs=2, latency=0, output_chars=200, generation_mode='unified')['metrics']
+
+    assert metrics['failed_specs'] == 0
+    # One call for route, controller and service plus one for the test suite
+    assert metrics['llm_calls'] == 4
+    assert metrics['prompt_tokens'] and metrics['completion_tokens']
@@ -0,0 +1,22 @@
+from src.utils.build_manifest import BuildManifest, spec_key
+
+
+def test_stage_is_fresh_until_an_input_or_output_changes(tmp_path):
+    output = tmp_path / 'route.js'
+    output.write_text('router.post()')
+    manifest = BuildManifest(str(tmp_path / 'manifest.json'))
+    hashes = BuildManifest.hash_inputs({'route_details': '{}', 'example_route': 'example'})
+    key = spec_key({'route_details': {'method': 'POST', 'path': '/users'}})
+
+    assert manifest.check(key, 'route', hashes, str(output)) == (False, "not built yet")
+
+    manifest.record(key, 'route', hashes, str(output), 'router.post()')
+    manifest.save()
+    reloaded = BuildManifest(str(tmp_path / 'manifest.json'))
+    assert reloaded.check(key, 'route', hashes, str(output)) == (True, "up to date")
+
+    changed = BuildManifest.hash_inputs({'route_details': '{}', 'example_route': 'edited'})
+    assert reloaded.check(key, 'route', changed, str(output)) == (False, "inputs changed: example_route")
+
+    output.write_text('edited by hand')
+    assert reloaded.check(key, 'route', hashes, str(output)) == (False, "output modified")
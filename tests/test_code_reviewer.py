@@ -0,0 +1,91 @@
+import shutil
+import pytest
+from src.utils.code_reviewer import (CodeIndex, ESLintWorker, ReviewEngine, check_db_schema_usage,
+                                     check_middleware_usage, check_naming_conventions, get_review_engine,
+                                     review_code, review_files)
+
+requires_node = pytest.mark.skipif(shutil.which('node') is None, reason="Node.js is not installed")
+
+VALID_ROUTE = """const express = require('express');
+const router = express.Router();
+
+router.post('/mentor/register', async (req, res) => {
+  try {
+    res.status(201).json({ ok: true });
+  } catch (error) {
+    res.status(500).json({ error: error.message });
+  }
+});
+
+module.exports = router;
+"""
+
+
+@requires_node
+def test_valid_javascript_has_no_lint_issues():
+    assert review_code(VALID_ROUTE, 'route', 'generated/mentorRoute.js')['issues'] == []
+
+
+@requires_node
+def test_syntax_errors_and_lint_rules_are_reported_with_locations():
+    broken, sloppy = review_files([
+        ("const x = ;\n", 'service', 'generated/brokenService.js'),
+        ("// TODO\nconsole.log(\"hi\")\n", 'service', 'generated/sloppyService.js'),
+    ])
+    assert broken['issues'][0].startswith("Syntax error at line 1:11")
+    assert any('(no-console)' in issue for issue in sloppy['issues'])
+    assert any('(no-warning-comments)' in issue for issue in sloppy['issues'])
+    assert any('(quotes)' in issue for issue in sloppy['issues'])
+
+
+@requires_node
+def test_worker_restarts_after_exiting():
+    worker = ESLintWorker()
+    try:
+        assert worker.lint([('generated/a.js', VALID_ROUTE)]) == [[]]
+        worker._process.kill()
+        worker._process.wait()
+        assert worker.lint([('generated/a.js', VALID_ROUTE)]) == [[]]
+    finally:
+        worker.close()
+
+
+def test_index_records_identifiers_members_and_declarations():
+    index = CodeIndex("/**\n * Register\n */\nconst user_name = req.body.name;\nfunction (x) {}\n")
+    assert index.has_jsdoc
+    assert index.identifiers['user_name'] == [4]
+    assert {'req.body', 'body.name'} <= index.members
+    assert index.declarations == ['user_name']
+    assert check_naming_conventions(index) == ["'user_name' is not in camelCase"]
+
+
+def test_engine_checks_schema_and_middleware_from_one_index():
+    db_schema = {'tables': {
+        'mentors': {'columns': [{'name': 'id'}, {'name': 'email'}]},
+        **{f'unused_{i}': {'columns': [{'name': 'id'}]} for i in range(10000)},
+    }}
+    engine = ReviewEngine(db_schema, ['authMiddleware', 'express-validator'])
+    review = engine.review(VALID_ROUTE.replace('ok: true', 'id: mentors.id'), 'route')
+
+    assert review['schema'] == ["The column 'email' of table 'mentors' is defined in the schema but not used in the code"]
+    assert review['middleware'] == []
+    assert check_db_schema_usage("require('express-validator'); mentors.email", db_schema) == [
+        "The column 'id' of table 'mentors' is defined in the schema but not used in the code"]
+
+
+def test_checks_share_one_engine_and_review_files_reports_every_check():
+    db_schema = {'tables': {'mentors': {'columns': [{'name': 'id'}, {'name': 'email'}]}}}
+    middleware = ['authMiddleware']
+    code = "const mentor_id = mentors.id; authMiddleware();"
+    check_db_schema_usage(code, db_schema)
+    assert check_middleware_usage(code, middleware) == ['authMiddleware']
+    engine = get_review_engine()
+    check_db_schema_usage(code, db_schema)
+    check_middleware_usage(code, middleware)
+    assert get_review_engine() is engine
+
+    [review] = review_files([(code, 'service', None)])
+    assert review['naming'] == ["'mentor_id' is not in camelCase"]
+    assert review['formatting'] == ["File should end with a newline"]
+    assert review['schema'] == ["The column 'email' of table 'mentors' is defined in the schema but not used in the code"]
+    assert review['middleware'] == ['authMiddleware']
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+import shutil
+import yaml
+from benchmarks.fake_llm import install_fake_llms
+from src.ai_agent import AIAgent
+from src.utils.contract import build_contract, check_consistency
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROJECT_STRUCTURE = {
+    'root': {
+        'backend': {
+            'controllers': ['adminController.js'],
+            'middleware': {'validation': ['validateInputs.js']},
+            'routes': ['adminRoutes.js'],
+            'services': [],
+        }
+    }
+}
+SPEC = {
+    'route_details': {'method': 'POST', 'path': '/app/admin/register', 'description': "Register an admin"},
+    'file_names': {'route': 'adminRegisterRoute.js'},
+    'input': [{'name': 'email', 'type': 'string'}],
+    'required_middleware': ['validateInputs.js', 'checkToken.js'],
+}
+
+
+def test_contract_is_derived_from_spec_and_project_structure():
+    contract = build_contract(SPEC, PROJECT_STRUCTURE)
+
+    assert contract['route']['file'] == 'routes/adminRegisterRoute.js'
+    assert contract['route']['controller'] == {'require': '../controllers/adminRegisterController',
+                                               'handler': 'handleAdminRegister'}
+    assert [(m['require'], m['exists']) for m in contract['route']['middleware']] == [
+        ('../middleware/validation/validateInputs', True), ('../middleware/checkToken', False)]
+    assert contract['service']['exports'][0]['signature'] == "async function adminRegister({ email })"
+
+
+def test_consistency_check_names_each_mismatch():
+    contract = build_contract(SPEC, PROJECT_STRUCTURE)
+    files = {
+        'route': "const c = require('../controllers/adminRegisterController');\nrouter.post('/', c.handleAdminRegister);\n",
+        'controller': "const s = require('../services/adminRegisterService');\n"
+                      "exports.handleAdminRegister = async (req, res) => res.json(await s.register(req.body));\n",
+        'service': "module.exports = { adminRegister };\n",
+    }
+
+    assert check_consistency(contract, files) == [('controller', "does not call the service function adminRegister")]
+
+
+def test_contract_mode_generates_route_controller_and_service_concurrently(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(REPO_ROOT, 'data'), tmp_path / 'data')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    with open('data/route_specs.yaml') as f:
+        spec = yaml.safe_load(f)[0]
+
+    agent = AIAgent(use_cache=False, generation_mode='contract')
+    install_fake_llms(agent, latency=0.05, output_chars=200)
+    agent.tracer.enabled = True
+    agent.tracer.reset()
+    results, errors = asyncio.run(agent.agenerate_all(spec, force=True))
+    agent.output_sink.flush()
+
+    assert not errors
+    spans = {span.name: span for span in agent.tracer.spans if span.category == 'stage'}
+    # All three start before any of them finishes
+    assert max(spans[stage].start for stage in ('route', 'controller', 'service')) < \
+        min(spans[stage].end for stage in ('route', 'controller', 'service'))
+    with open('generated/contracts/mentorRegister.json') as f:
+        assert json.load(f)['controller']['exports'][0]['name'] == 'handleMentorRegister'
+    assert all(not rebuild for _, rebuild, _ in agent.plan_spec(spec))
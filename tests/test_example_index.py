@@ -0,0 +1,57 @@
+from src.utils.example_index import ExampleIndex, split_into_snippets, spec_query, tokenize
+
+EXAMPLE_TEST = """const request = require('supertest');
+
+describe('Admin Registration Tests', () => {
+  // Valid registration
+  it('should register a valid admin', async () => {
+    const response = await request(app).post('/api/admin/register').send({ email: 'a@b.c' });
+    expect(response.statusCode).toBe(201);
+  });
+
+  // Password Too Short
+  it('should fail with password too short', async () => {
+    const response = await request(app).post('/api/admin/register').send({ password: 'a' });
+    expect(response.statusCode).toBe(400);
+  });
+
+  // Rate limiting
+  it('should reject too many login attempts', async () => {
+    const response = await request(app).post('/api/login').send({ attempts: 10 });
+    expect(response.statusCode).toBe(429);
+  });
+});
+"""
+
+
+def test_files_are_split_at_function_boundaries():
+    parts = split_into_snippets(EXAMPLE_TEST)
+    snippets = [part['text'] for part in parts if part['kind'] == 'snippet']
+
+    assert ''.join(part['text'] for part in parts) == EXAMPLE_TEST
+    assert len(snippets) == 3
+    assert snippets[1].startswith("  // Password Too Short\n  it('should fail with password too short'")
+    assert snippets[1].rstrip().endswith("});")
+
+
+def test_the_most_relevant_snippets_are_selected_in_file_order():
+    index = ExampleIndex({'test': {'example_test.js': EXAMPLE_TEST, 'test/login.test.js': "// empty\n"}})
+
+    selection = index.select('test', "POST /app/login rate limiting: reject repeated login attempts", top_k=1)
+
+    assert "should reject too many login attempts" in selection
+    assert "should register a valid admin" not in selection
+    assert selection.startswith("const request = require('supertest');")
+    assert "describe('Admin Registration Tests'" in selection and "// ...\n" in selection
+
+
+def test_spec_query_and_tokenizer_cover_the_spec_fields():
+    spec = {
+        'route_details': {'path': '/app/admin/mentor-register', 'method': 'POST', 'description': "Register a mentor"},
+        'logical_steps': [{'step': "Check invitation token", 'description': "Verify the token"}],
+        'required_middleware': ['checkInvitationToken.js'],
+    }
+
+    words = tokenize(spec_query(spec))
+
+    assert {'post', 'admin', 'mentor', 'register', 'invitation', 'token', 'check'} <= set(words)
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+from types import SimpleNamespace
+import yaml
+from benchmarks.fake_llm import install_fake_llms
+from src.ai_agent import AIAgent, STAGE_INPUTS
+from src.utils.job_queue import JobQueue, QueueWorker
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SPEC = {'route_details': {'method': 'GET', 'path': '/app/hubs'}}
+
+
+def claim_all(queue, worker):
+    jobs = []
+    while True:
+        job = queue.claim(worker)
+        if job is None:
+            return jobs
+        jobs.append(job)
+
+
+def test_jobs_are_claimed_once_their_dependencies_are_done(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), max_attempts=2)
+    assert queue.enqueue([SPEC], STAGE_INPUTS) == 5
+    assert queue.enqueue([SPEC], STAGE_INPUTS) == 0
+
+    first = claim_all(queue, 'a')
+    assert [job['stage'] for job in first] == ['route', 'swagger']
+    queue.complete(first[0], {'content': 'route', 'file_name': 'r.js', 'rebuilt': True})
+    controller = queue.claim('b')
+    assert controller['stage'] == 'controller'
+    assert queue.outputs('GET /app/hubs') == {'route': {'content': 'route', 'file_name': 'r.js', 'rebuilt': False}}
+
+    # Retried until the attempts run out, then everything after it is skipped
+    assert queue.fail(controller, RuntimeError('boom'))
+    controller = queue.claim('b')
+    assert not queue.fail(controller, RuntimeError('boom'))
+    assert queue.summary()['jobs'] == {'pending': 0, 'running': 1, 'done': 1, 'failed': 1, 'skipped': 2}
+
+    assert queue.retry_failed() == 3
+    assert queue.claim('c')['stage'] == 'controller'
+
+
+def test_changed_specs_are_requeued_and_removed_ones_dropped(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'))
+    other = {'route_details': {'method': 'POST', 'path': '/app/hubs'}}
+    queue.enqueue([SPEC, other], STAGE_INPUTS)
+    for job in claim_all(queue, 'a'):
+        queue.complete(job, {'content': job['stage'], 'file_name': 'f.js'})
+
+    edited = dict(SPEC, logical_steps=[{'step': "List hubs"}])
+    assert queue.enqueue([edited], STAGE_INPUTS, prune=True) == 5
+    assert queue.spec('GET /app/hubs') == edited
+    assert queue.outputs('GET /app/hubs') == {}
+    assert queue.spec('POST /app/hubs') is None
+    assert queue.summary()['jobs']['pending'] == 5
+
+
+def test_jobs_of_dead_workers_are_requeued(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'))
+    queue.enqueue([SPEC], STAGE_INPUTS)
+    finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                              capture_output=True, text=True, check=True)
+    dead_worker = f"{socket.gethostname()}:{finished.stdout.strip()}"
+    claim_all(queue, dead_worker)
+    queue.claim('elsewhere:1')
+
+    assert queue.requeue_stale() == 2
+    assert [job['stage'] for job in claim_all(queue, 'b')] == ['route', 'swagger']
+
+
+def test_worker_keeps_its_event_loop_running_while_the_store_is_locked(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'))
+    queue.enqueue([SPEC], STAGE_INPUTS)
+
+    async def run_stage(stage, route_spec, outputs, force):
+        return {'content': stage, 'file_name': 'f.js'}
+    agent = SimpleNamespace(manifest=SimpleNamespace(save=lambda: None), tracer=SimpleNamespace(set_lane=lambda name: None),
+                            _arun_stage=run_stage)
+
+    # Another process holds the write lock for a while
+    other = sqlite3.connect(queue.path, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, lambda: other.execute("COMMIT")).start()
+
+    async def main():
+        ticks = 0
+        worker = asyncio.ensure_future(QueueWorker(agent, queue, concurrency=2, poll_interval=0.01).run())
+        while not worker.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return ticks, worker.result()
+
+    ticks, stats = asyncio.run(main())
+    other.close()
+    assert ticks >= 10
+    assert stats['done'] == 5
+
+
+def test_resumed_run_only_generates_the_unfinished_stages(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(REPO_ROOT, 'data'), tmp_path / 'data')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    with open('data/route_specs.yaml') as f:
+        spec = yaml.safe_load(f)[0]
+    queue = JobQueue('.jobs/jobs.sqlite3')
+    queue.enqueue([spec], STAGE_INPUTS)
+
+    calls = 0
+    for max_jobs in (2, None):
+        agent = AIAgent(use_cache=False)
+        install_fake_llms(agent, output_chars=200)
+        asyncio.run(QueueWorker(agent, queue, concurrency=1, max_jobs=max_jobs).run())
+        calls += agent.llm_generation.calls
+    agent.output_sink.flush()
+
+    # route, controller, service and test, each generated once; swagger is built locally
+    assert calls == 4
+    assert queue.summary()['jobs']['done'] == 5
+    assert all(not rebuild for _, rebuild, _ in agent.plan_spec(spec))
@@ -0,0 +1,41 @@
+from src.utils.llm_cache import LLMCache
+
+
+def test_cache_hits_after_set_and_counts_misses(tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'cache.sqlite3'))
+    key = LLMCache.make_key({'model': 'gpt-4o-mini', 'temperature': 0.7}, [('human', 'hello')])
+
+    assert cache.get(key) is None
+    cache.set(key, 'response', 'gpt-4o-mini')
+    assert cache.get(key) == 'response'
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_key_depends_on_params_and_prompt():
+    base = LLMCache.make_key({'model': 'gpt-4o-mini', 'temperature': 0.7}, [('human', 'hello')])
+
+    assert base != LLMCache.make_key({'model': 'gpt-3.5-turbo', 'temperature': 0.7}, [('human', 'hello')])
+    assert base != LLMCache.make_key({'model': 'gpt-4o-mini', 'temperature': 0.0}, [('human', 'hello')])
+    assert base != LLMCache.make_key({'model': 'gpt-4o-mini', 'temperature': 0.7}, [('human', 'hello!')])
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'cache.sqlite3'), max_bytes=20)
+    cache.set('a', 'x' * 10)
+    cache.set('b', 'y' * 10)
+    cache.get('a')
+    cache.set('c', 'z' * 10)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'x' * 10
+    assert cache.get('c') == 'z' * 10
+    assert cache.stats()['evictions'] == 1
+
+
+def test_disabled_cache_bypasses_store(tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'cache.sqlite3'), enabled=False)
+    cache.set('a', 'value')
+
+    assert cache.get('a') is None
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
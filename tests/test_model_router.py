@@ -0,0 +1,101 @@
+import asyncio
+import json
+import os
+import shutil
+import pytest
+from benchmarks.fake_llm import install_fake_llms
+from src.ai_agent import AIAgent
+from src.utils.code_reviewer import review_code
+from src.utils.code_templates import render_file
+from src.utils.contract import build_contract, check_consistency
+from src.utils.model_router import ModelRouter, score_spec
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIMPLE_SPEC = {
+    'route_details': {'method': 'PUT', 'path': '/app/hubs/:hubId', 'description': "Update a learning hub"},
+    'file_names': {'route': 'hubUpdateRoute.js', 'controller': 'hubUpdateController.js',
+                   'service': 'hubUpdateService.js'},
+    'required_tables': ['learning_hubs'],
+    'logical_steps': [{'step': "Update hub", 'description': "Update the hub"}],
+    'input': [{'name': 'name', 'type': 'string'}],
+    'required_middleware': ['validateInputs.js'],
+}
+COMPLEX_SPEC = dict(SIMPLE_SPEC, required_tables=['learning_hubs', 'admin', 'supervisor_hubs'],
+                    logical_steps=[{'step': f"Step {n}"} for n in range(6)])
+
+
+def test_specs_are_routed_by_score_and_templatability():
+    router = ModelRouter()
+
+    assert score_spec(SIMPLE_SPEC) == 5.5
+    assert router.tier(SIMPLE_SPEC) == 'template'
+    # Cheap, but a PUT without a path parameter doesn't fit the templates
+    assert router.tier(dict(SIMPLE_SPEC, route_details=dict(SIMPLE_SPEC['route_details'], path='/app/hubs'))) == 'fast'
+    assert router.tier(COMPLEX_SPEC) == 'strong'
+    # Same score as a CRUD spec, but the templates would drop the hashing and the email
+    signup = dict(SIMPLE_SPEC, route_details={'method': 'POST', 'path': '/app/users'}, required_tables=['users'],
+                  logical_steps=[{'step': "Hash password", 'description': "Hash the password with bcrypt"},
+                                 {'step': "Send welcome email", 'description': "Email the new user"}],
+                  input=[{'name': 'email'}, {'name': 'password'}])
+    assert score_spec(signup) == 8
+    assert router.tier(signup) == 'fast'
+    assert router.tier(dict(SIMPLE_SPEC, required_utils=['sendEmail'])) == 'fast'
+    assert ModelRouter({'fast': 100}).tier(COMPLEX_SPEC) == 'fast'
+
+
+def test_rendered_files_match_their_contract():
+    with open(os.path.join(REPO_ROOT, 'data', 'project_structure.json')) as f:
+        project_structure = json.load(f)
+    with open(os.path.join(REPO_ROOT, 'data', 'db_schema.json')) as f:
+        db_schema = json.load(f)
+
+    for method, path in (('GET', '/app/hubs'), ('GET', '/app/hubs/:hubId'), ('POST', '/app/hubs'),
+                         ('PATCH', '/app/hubs/:hubId'), ('DELETE', '/app/hubs/:hubId')):
+        spec = dict(SIMPLE_SPEC, route_details=dict(SIMPLE_SPEC['route_details'], method=method, path=path))
+        contract = build_contract(spec, project_structure)
+        files = {stage: render_file(stage, spec, contract, db_schema, project_structure)
+                 for stage in ('route', 'controller', 'service')}
+        assert check_consistency(contract, files) == []
+    assert "const { LearningHub } = require('../models');" in files['service']
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason="Node.js is not installed")
+def test_rendered_files_pass_the_project_lint_rules():
+    with open(os.path.join(REPO_ROOT, 'data', 'project_structure.json')) as f:
+        project_structure = json.load(f)
+    with open(os.path.join(REPO_ROOT, 'data', 'db_schema.json')) as f:
+        db_schema = json.load(f)
+
+    # Long enough for every call and destructuring to wrap
+    wide = dict(SIMPLE_SPEC, input=[{'name': name} for name in ('name', 'description', 'location', 'capacityLimit')],
+                required_middleware=['validateInputs.js', 'authenticateJWT.js', 'checkRole.js'])
+    for spec in (SIMPLE_SPEC, wide):
+        for method, path in (('GET', '/app/hubs'), ('GET', '/app/hubs/:hubId'), ('POST', '/app/hubs'),
+                             ('PATCH', '/app/learning-hubs/:learningHubId/settings'), ('DELETE', '/app/hubs/:hubId')):
+            spec = dict(spec, route_details=dict(spec['route_details'], method=method, path=path))
+            contract = build_contract(spec, project_structure)
+            for stage in ('route', 'controller', 'service'):
+                code = render_file(stage, spec, contract, db_schema, project_structure)
+                issues = review_code(code, stage, f"generated/{stage}.js")['issues']
+                assert [issue for issue in issues if issue.startswith(('ESLint', 'Syntax'))] == [], code
+
+
+def test_template_tier_only_calls_a_model_for_the_test_suite(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(REPO_ROOT, 'data'), tmp_path / 'data')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+
+    agent = AIAgent(use_cache=False, model_routing=True)
+    install_fake_llms(agent, output_chars=200)
+    results, errors = asyncio.run(agent.agenerate_all(SIMPLE_SPEC, force=True))
+    agent.output_sink.flush()
+
+    assert not errors
+    assert agent.llm_generation.calls == 1 and agent.llm_strong.calls == 0
+    assert set(agent.llm_usage) == {'test'}
+    assert "controller.handleHubUpdate" in results['route']['content']
+    assert all(not rebuild for _, rebuild, _ in agent.plan_spec(SIMPLE_SPEC))
+
+    asyncio.run(agent.agenerate_all(COMPLEX_SPEC, force=True))
+    assert agent.llm_strong.calls == 4
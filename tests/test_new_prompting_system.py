@@ -37,7 +37,7 @@ def test_new_prompting_system():
             elif file_type == 'service':
                 assert "module.exports" in file_info['content'], "Service file content is missing exports"
             elif file_type == 'swagger':
-                assert "swagger" in file_info['content'], "Swagger file content is missing swagger definitions"
+                assert '"paths"' in file_info['content'], "Swagger file content is missing OpenAPI paths"
             
             print(f"\nGenerated {file_type} file content:")
             print(file_info['content'][:500])  # Print the first 500 characters for debugging
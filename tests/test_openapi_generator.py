@@ -0,0 +1,70 @@
+import json
+from src.utils.openapi_generator import OpenAPIGenerator, OpenAPIDocument, openapi_path, operation_id, parse_prose
+
+DB_SCHEMA = {
+    'tables': {
+        'users': {
+            'columns': [
+                {'name': 'id', 'type': 'INT'},
+                {'name': 'username', 'type': 'VARCHAR(50)'},
+                {'name': 'is_active', 'type': 'BOOLEAN'},
+            ]
+        }
+    }
+}
+
+
+def make_spec(method, path, inputs, middleware=()):
+    return {
+        'route_details': {'method': method, 'path': path, 'description': f"{method} {path}"},
+        'file_names': {'route': 'userRoute.js'},
+        'required_tables': ['users'],
+        'input': inputs,
+        'required_middleware': list(middleware),
+    }
+
+
+def test_post_spec_becomes_request_body_with_column_types():
+    spec = make_spec('POST', '/app/users', [
+        {'name': 'username', 'type': 'string'},
+        {'name': 'isActive', 'type': 'string'},
+    ], ['authMiddleware.js'])
+    fragment = OpenAPIGenerator(DB_SCHEMA).fragment(spec)
+
+    operation = fragment['paths']['/app/users']['post']
+    properties = operation['requestBody']['content']['application/json']['schema']['properties']
+    assert properties['username']['type'] == 'string'
+    # Matched to the is_active column rather than the declared type
+    assert properties['isActive']['type'] == 'boolean'
+    assert set(operation['responses']) == {'201', '400', '401', '403', '500'}
+    assert operation['security'] == [{'bearerAuth': []}]
+    assert operation['operationId'] == operation_id(spec) == 'user'
+
+
+def test_get_spec_uses_path_and_query_parameters():
+    spec = make_spec('GET', '/app/users/:id', [{'name': 'id', 'type': 'integer'}, {'name': 'fields', 'type': 'string'}])
+    fragment = OpenAPIGenerator(DB_SCHEMA).fragment(spec)
+
+    operation = fragment['paths'][openapi_path('/app/users/:id')]['get']
+    assert [(p['name'], p['in']) for p in operation['parameters']] == [('id', 'path'), ('fields', 'query')]
+    assert '404' in operation['responses']
+    assert 'Users' in fragment['components']['schemas']
+
+
+def test_document_merges_fragments_and_keeps_existing_paths(tmp_path):
+    generator = OpenAPIGenerator(DB_SCHEMA)
+    path = str(tmp_path / 'openapi.json')
+    document = OpenAPIDocument(path)
+    document.merge(generator.fragment(make_spec('POST', '/app/users', [])))
+    with open(path, 'w') as f:
+        f.write(document.to_json())
+
+    reloaded = OpenAPIDocument(path)
+    reloaded.merge(generator.fragment(make_spec('GET', '/app/users', [])))
+    paths = json.loads(reloaded.to_json())['paths']
+    assert set(paths['/app/users']) == {'post', 'get'}
+
+
+def test_prose_is_read_from_fenced_json():
+    assert parse_prose('```json\n{"summary": "Create a user", "extra": 1}\n```') == {'summary': 'Create a user'}
+    assert parse_prose("not json") is None
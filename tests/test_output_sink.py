@@ -0,0 +1,66 @@
+import asyncio
+import os
+from src.utils.file_utils import save_generated_files
+from src.utils.output_sink import OutputSink
+
+
+def test_unchanged_files_are_not_rewritten(tmp_path):
+    sink = OutputSink()
+    path = str(tmp_path / 'generated' / 'userRoute.js')
+
+    assert sink.write(path, "module.exports = router;\n").result() is True
+    mtime = os.stat(path).st_mtime_ns
+    assert asyncio.run(sink.awrite(path, "module.exports = router;\n")) is False
+    assert os.stat(path).st_mtime_ns == mtime
+    assert sink.write(path, "module.exports = app;\n").result() is True
+    sink.close()
+
+    with open(path) as f:
+        assert f.read() == "module.exports = app;\n"
+    assert sink.stats['written'] == 2 and sink.stats['unchanged'] == 1
+    assert os.listdir(tmp_path / 'generated') == ['userRoute.js']
+
+
+def test_queued_content_is_readable_until_flushed(tmp_path):
+    sink = OutputSink()
+    paths = [str(tmp_path / f"file{i}.js") for i in range(20)]
+
+    for i, path in enumerate(paths):
+        sink.write(path, f"// {i}\n")
+    assert sink.pending_content(paths[-1]) in ("// 19\n", None)
+    sink.flush()
+
+    assert sink.pending_content(paths[-1]) is None
+    assert all(os.path.exists(path) for path in paths)
+    sink.close()
+
+
+def test_write_errors_are_reported_on_the_future(tmp_path):
+    sink = OutputSink()
+    (tmp_path / 'blocker').write_text("")
+
+    future = sink.write(str(tmp_path / 'blocker' / 'file.js'), "x")
+
+    assert isinstance(future.exception(), OSError)
+    assert sink.stats['failed'] == 1
+    sink.close()
+
+
+def test_streamed_output_replaces_only_changed_files(tmp_path):
+    sink = OutputSink()
+    path = tmp_path / 'route.js'
+    path.write_text("same")
+    tmp = tmp_path / 'route.js.partial'
+    tmp.write_text("same")
+
+    assert sink.replace(str(tmp), str(path), "same") is False
+    assert not tmp.exists()
+    tmp.write_text("new")
+    assert sink.replace(str(tmp), str(path), "new") is True
+    assert path.read_text() == "new"
+
+
+def test_save_generated_files_writes_through_the_sink(tmp_path):
+    save_generated_files({'/app/users': {'route': "a", 'controller': "b"}}, str(tmp_path))
+
+    assert sorted(os.listdir(tmp_path)) == ['app_users_controller.js', 'app_users_route.js']
@@ -0,0 +1,75 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from src.utils.rate_limiter import RateLimitScheduler, TokenBucket, limit_concurrency, parse_reset_duration
+
+
+def rate_limit_error(headers):
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    response = httpx.Response(429, headers=headers, request=request)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_reset_durations_are_parsed_to_seconds():
+    assert parse_reset_duration('6m0s') == 360
+    assert parse_reset_duration('20ms') == pytest.approx(0.02)
+    assert parse_reset_duration('1.5') == 1.5
+    assert parse_reset_duration('soon') is None
+
+
+def test_bucket_waits_until_refilled():
+    bucket = TokenBucket(60)
+    bucket.consume(60, now=bucket.updated)
+    assert bucket.wait_time(30, now=bucket.updated) == pytest.approx(30)
+    assert bucket.wait_time(30, now=bucket.updated + 30) == 0
+
+
+def test_rate_limited_call_is_retried_after_retry_after():
+    scheduler = RateLimitScheduler(base_delay=0)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise rate_limit_error({'retry-after-ms': '10', 'x-ratelimit-remaining-requests': '0',
+                                    'x-ratelimit-reset-requests': '10ms'})
+        return 'done'
+
+    assert asyncio.run(scheduler.run('gpt-4o-mini', 100, call)) == 'done'
+    assert scheduler.stats['gpt-4o-mini']['rate_limited'] == 1
+    assert len(attempts) == 2
+
+
+def test_non_retryable_errors_are_raised():
+    scheduler = RateLimitScheduler()
+
+    def call():
+        raise ValueError("bad prompt")
+
+    with pytest.raises(ValueError):
+        scheduler.run_sync('gpt-4o-mini', 100, call)
+    assert scheduler.stats['gpt-4o-mini']['retries'] == 0
+
+
+def test_calls_waiting_on_a_retry_do_not_hold_the_concurrency_cap():
+    scheduler = RateLimitScheduler(base_delay=0)
+    finished = []
+
+    def call(name, fail_first, semaphore):
+        attempts = []
+
+        async def run():
+            attempts.append(1)
+            if fail_first and len(attempts) == 1:
+                raise rate_limit_error({'retry-after-ms': '200'})
+            finished.append(name)
+        return limit_concurrency(semaphore, run)
+
+    async def main():
+        semaphore = asyncio.Semaphore(1)
+        await asyncio.gather(scheduler.run('gpt-4o', 100, call('backing off', True, semaphore)),
+                             scheduler.run('gpt-4o-mini', 100, call('ready', False, semaphore)))
+
+    asyncio.run(main())
+    assert finished == ['ready', 'backing off']
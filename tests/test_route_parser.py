@@ -0,0 +1,69 @@
+import logging
+import os
+from src.utils import schema_validator
+from src.utils.route_parser import SpecCache, parse_and_validate_route_specs, resolve_spec_files
+
+SPEC = """- route_details:
+    path: "/{name}"
+    method: "{method}"
+    description: "Route {name}"
+  logical_steps: []
+"""
+
+
+def write_spec(path, name, method='GET'):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(SPEC.format(name=name, method=method))
+
+
+def test_directory_of_spec_files_is_loaded_in_parallel(tmp_path):
+    for i in range(4):
+        write_spec(tmp_path / 'specs' / f'team{i % 2}' / f'route{i}.yaml', f'route{i}')
+    cache_path = str(tmp_path / 'cache.json')
+
+    specs = parse_and_validate_route_specs(str(tmp_path / 'specs'), max_workers=2, cache_path=cache_path)
+    assert [spec['route_details']['path'] for spec in specs] == ['/route0', '/route2', '/route1', '/route3']
+    assert len(resolve_spec_files(str(tmp_path / 'specs' / '*' / 'route[01].yaml'))) == 2
+    assert os.path.exists(cache_path)
+
+
+def test_errors_are_reported_with_file_and_line(tmp_path, caplog):
+    spec_file = tmp_path / 'specs.yaml'
+    spec_file.write_text(SPEC.format(name='ok', method='GET') + SPEC.format(name='bad', method='FETCH'))
+    broken = tmp_path / 'broken.yaml'
+    broken.write_text("- route_details: [\n")
+
+    with caplog.at_level(logging.ERROR):
+        specs = parse_and_validate_route_specs(str(tmp_path / '*.yaml'), cache_path=None)
+
+    assert [spec['route_details']['path'] for spec in specs] == ['/ok']
+    assert f"{spec_file}:6: Invalid route specification for path '/bad': route_details.method: 'FETCH' is not one of" in caplog.text
+    assert f"{broken}:2: Error parsing YAML" in caplog.text
+
+
+def test_cached_files_are_reparsed_only_when_their_content_changes(tmp_path):
+    spec_file = tmp_path / 'specs.yaml'
+    write_spec(spec_file, 'first')
+    cache_path = str(tmp_path / 'cache.json')
+    parse_and_validate_route_specs(str(spec_file), cache_path=cache_path)
+
+    # Same content with a new mtime is served from the cache
+    os.utime(spec_file, ns=(0, 0))
+    with open(cache_path) as f:
+        assert '/first' in f.read()
+    assert parse_and_validate_route_specs(str(spec_file), cache_path=cache_path)[0]['route_details']['path'] == '/first'
+
+    write_spec(spec_file, 'second')
+    assert parse_and_validate_route_specs(str(spec_file), cache_path=cache_path)[0]['route_details']['path'] == '/second'
+
+
+def test_cached_results_are_dropped_when_the_schemas_change(tmp_path, monkeypatch):
+    spec_file = tmp_path / 'specs.yaml'
+    write_spec(spec_file, 'first')
+    cache_path = str(tmp_path / 'cache.json')
+    parse_and_validate_route_specs(str(spec_file), cache_path=cache_path)
+    assert SpecCache(cache_path).get(str(spec_file)) is not None
+
+    # As if input_schema.json had been edited
+    monkeypatch.setattr(schema_validator, '_schema_fingerprint', 'edited')
+    assert SpecCache(cache_path).get(str(spec_file)) is None
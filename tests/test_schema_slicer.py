@@ -0,0 +1,56 @@
+import json
+import os
+from src.utils.schema_slicer import SchemaIndex
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA = {
+    'tables': {
+        'admin': {'columns': [{'name': 'id', 'type': 'int'}]},
+        'invitations': {'columns': [
+            {'name': 'id', 'type': 'int'},
+            {'name': 'inviter_id', 'type': 'int', 'foreign_key': 'admin.id'},
+        ]},
+        'groups': {'columns': [
+            {'name': 'id', 'type': 'int'},
+            {'name': 'created_by', 'type': 'int', 'foreign_key': 'admin.id'},
+        ]},
+        'plans': {'columns': [{'name': 'id', 'type': 'int'}]},
+    }
+}
+
+
+def test_slice_includes_declared_tables_and_fk_neighbours():
+    index = SchemaIndex(SCHEMA, fk_hops=1)
+
+    assert list(index.slice(['invitations'])['tables']) == ['admin', 'invitations']
+    assert list(index.slice(['invitations'], hops=0)['tables']) == ['invitations']
+    # Tables referencing admin are only followed on request
+    assert list(index.slice(['invitations'], hops=2)['tables']) == ['admin', 'invitations']
+    incoming = SchemaIndex(SCHEMA, follow_incoming=True)
+    assert list(incoming.slice(['invitations'], hops=2)['tables']) == ['admin', 'invitations', 'groups']
+
+
+def test_slices_of_the_project_schema_stay_small():
+    with open(os.path.join(REPO_ROOT, 'data', 'db_schema.json')) as f:
+        db_schema = json.load(f)
+    index = SchemaIndex(db_schema)
+    full_size = len(json.dumps(db_schema, indent=2))
+
+    for table in ('admin', 'students'):
+        sliced = index.slice([table])['tables']
+        assert len(sliced) <= 4
+        assert len(index.slice_json([table])) < full_size / 5
+
+
+def test_slice_falls_back_to_full_schema_without_known_tables():
+    index = SchemaIndex(SCHEMA)
+
+    assert index.slice(None) is SCHEMA
+    assert index.slice(['users']) is SCHEMA
+
+
+def test_slices_are_memoized_per_table_set():
+    index = SchemaIndex(SCHEMA)
+
+    assert index.slice_json(['invitations', 'plans']) is index.slice_json(['plans', 'invitations'])
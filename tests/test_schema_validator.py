@@ -0,0 +1,39 @@
+import os
+import yaml
+from src.utils.schema_validator import SpecValidator
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_spec():
+    with open(os.path.join(REPO_ROOT, 'data', 'route_specs.yaml')) as f:
+        return yaml.safe_load(f)[0]
+
+
+def test_valid_spec_has_no_errors():
+    assert SpecValidator().validate_many([load_spec()]) == [[]]
+
+
+def test_all_errors_of_a_spec_are_collected_once():
+    spec = load_spec()
+    spec['route_details']['method'] = 'FETCH'
+    del spec['route_details']['description']
+    spec['logical_steps'][0].pop('step')
+
+    errors = SpecValidator().validate(spec)
+    assert errors == [
+        "logical_steps.0: 'step' is a required property",
+        "route_details: 'description' is a required property",
+        "route_details.method: 'FETCH' is not one of ['GET', 'POST', 'PUT', 'DELETE', 'PATCH']",
+    ]
+
+
+def test_unknown_keys_are_rejected():
+    spec = load_spec()
+    spec['requried_tables'] = spec.pop('required_tables')
+    spec['logical_steps'][0]['descripton'] = "Typo"
+
+    assert SpecValidator().validate(spec) == [
+        "Additional properties are not allowed ('requried_tables' was unexpected)",
+        "logical_steps.0: Additional properties are not allowed ('descripton' was unexpected)",
+    ]
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from src.utils.stage_graph import Stage, StageGraph, StageSkipped
+
+
+def test_independent_stages_run_concurrently():
+    running = set()
+    overlaps = []
+
+    def make_stage(name, value):
+        async def run(inputs):
+            running.add(name)
+            overlaps.append(set(running))
+            await asyncio.sleep(0.05)
+            running.discard(name)
+            return value + sum(inputs.values())
+        return run
+
+    graph = StageGraph([
+        Stage('route', make_stage('route', 1)),
+        Stage('controller', make_stage('controller', 10), ['route']),
+        Stage('swagger', make_stage('swagger', 100), ['route']),
+        Stage('service', make_stage('service', 1000), ['route', 'controller']),
+    ])
+    results, errors = asyncio.run(graph.run())
+
+    assert not errors
+    assert results == {'route': 1, 'controller': 11, 'swagger': 101, 'service': 1012}
+    assert any({'controller', 'swagger'} <= seen for seen in overlaps)
+
+
+def test_failed_stage_skips_only_its_dependents():
+    async def ok(inputs):
+        return 'ok'
+
+    async def boom(inputs):
+        raise RuntimeError("boom")
+
+    graph = StageGraph([
+        Stage('route', ok),
+        Stage('controller', boom, ['route']),
+        Stage('service', ok, ['controller']),
+        Stage('swagger', ok, ['route']),
+    ])
+    results, errors = asyncio.run(graph.run())
+
+    assert set(results) == {'route', 'swagger'}
+    assert isinstance(errors['controller'], RuntimeError)
+    assert isinstance(errors['service'], StageSkipped)
+    assert graph.dependents('controller') == ['service']
+
+
+def test_cycles_and_unknown_inputs_are_rejected():
+    async def ok(inputs):
+        return None
+
+    with pytest.raises(ValueError):
+        StageGraph([Stage('a', ok, ['b']), Stage('b', ok, ['a'])])
+    with pytest.raises(ValueError):
+        StageGraph([Stage('a', ok, ['missing'])])
+
+
+def test_prefix_consumer_starts_before_producer_finishes():
+    events = []
+
+    async def producer(inputs, stream):
+        await stream.append('header\n')
+        await asyncio.sleep(0.05)
+        await stream.append('body\n')
+        events.append('producer done')
+        return 'header\nbody\n'
+
+    async def consumer(inputs):
+        prefix = await inputs['route'].wait_for(lambda text: '\n' in text)
+        events.append('consumer done')
+        return prefix.split('\n')[0]
+
+    graph = StageGraph([Stage('route', producer), Stage('outline', consumer, prefix_inputs=['route'])])
+    results, errors = asyncio.run(graph.run())
+
+    assert not errors
+    assert results['outline'] == 'header'
+    assert events == ['consumer done', 'producer done']
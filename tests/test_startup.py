@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that only generation needs; importing any of them costs hundreds of milliseconds
+HEAVY_MODULES = ('openai', 'langchain_core', 'langchain_openai', 'tiktoken', 'httpx')
+
+# Generous ceiling on the cumulative import time of src.main, in microseconds
+IMPORT_BUDGET_US = 500_000
+
+
+def import_times(*args):
+    """Run Python with -X importtime and return {module: cumulative microseconds}."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_validate_command_skips_heavy_imports():
+    times = import_times('-m', 'src.main', 'validate', '--specs', os.path.join(REPO_ROOT, 'data', 'route_specs.yaml'))
+
+    assert not [name for name in times if name.split('.')[0] in HEAVY_MODULES]
+    assert 'src.ai_agent' not in times
+
+
+def test_cli_module_imports_within_budget():
+    times = import_times('-c', 'import src.main')
+
+    assert times['src.main'] < IMPORT_BUDGET_US
@@ -0,0 +1,47 @@
+from src.utils.token_budget import TokenBudget, OMITTED_MARKER, TRUNCATED_MARKER, MIN_SLOT_TOKENS
+
+
+class WordCounter:
+    """One token per whitespace-separated word, to keep the test independent of tiktoken."""
+
+    def count(self, text, model=None):
+        return len(text.split())
+
+    def truncate(self, text, max_tokens, model=None):
+        return ' '.join(text.split()[:max_tokens])
+
+
+def words(n):
+    return ' '.join(['w'] * n)
+
+
+def test_inputs_within_budget_are_untouched():
+    budget = TokenBudget(budgets={'test': 1000}, counter=WordCounter())
+    inputs = {'route_file': words(10), 'example_test_file': words(10)}
+
+    assert budget.fit('test', inputs, overhead=5) == (inputs, 25)
+    assert budget.usage[0]['total_tokens'] == 25
+    assert budget.usage[0]['trimmed'] == {}
+
+
+def test_lowest_priority_slots_are_trimmed_first():
+    budget = TokenBudget(budgets={'test': 1000}, counter=WordCounter())
+    inputs = {
+        'route_file': words(400),
+        'example_test_file': words(800),
+        'project_structure': words(300),
+    }
+    fitted, total = budget.fit('test', inputs)
+
+    assert fitted['route_file'] == inputs['route_file']
+    assert fitted['example_test_file'].endswith(TRUNCATED_MARKER)
+    assert fitted['project_structure'] == inputs['project_structure']
+    assert total == budget.usage[0]['total_tokens'] <= 1000
+
+
+def test_slots_too_small_to_keep_are_dropped():
+    budget = TokenBudget(budgets={'test': 500}, counter=WordCounter())
+    fitted, _ = budget.fit('test', {'route_file': words(400), 'example_test_file': words(MIN_SLOT_TOKENS)})
+
+    assert fitted['example_test_file'] == OMITTED_MARKER
+    assert budget.summary()['test']['trimmed_calls'] == 1
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import logging
+from src.utils.tracing import Tracer, log_payload
+
+
+def test_spans_nest_and_inherit_their_stage():
+    tracer = Tracer()
+
+    async def run_spec(name):
+        tracer.set_lane(name)
+        with tracer.span('route', 'stage', stage='route'):
+            with tracer.span('llm', 'llm') as span:
+                span.set(queue_wait_seconds=0.5, retries=1)
+                span.add('prompt_tokens', 120)
+            with tracer.span('write', 'io') as span:
+                span.set(bytes_written=42)
+
+    async def main():
+        await asyncio.gather(run_spec('spec 1'), run_spec('spec 2'))
+
+    asyncio.run(main())
+
+    trace = tracer.to_chrome_trace()
+    spans = [event for event in trace['traceEvents'] if event['ph'] == 'X']
+    lanes = {event['args']['name'] for event in trace['traceEvents'] if event['ph'] == 'M'}
+    assert len(spans) == 6 and lanes == {'spec 1', 'spec 2'}
+    assert all(event['args']['stage'] == 'route' for event in spans)
+    json.dumps(trace)
+
+    metrics = tracer.to_prometheus()
+    assert 'ai_agent_prompt_tokens_total{stage="route"} 240' in metrics
+    assert 'ai_agent_bytes_written_total{stage="route"} 84' in metrics
+    assert 'ai_agent_retries_total{stage="route"} 2' in metrics
+    assert 'ai_agent_queue_wait_seconds_sum{stage="route"} 1.000000' in metrics
+    assert 'ai_agent_span_duration_seconds_count{category="stage",stage="route"} 2' in metrics
+
+
+def test_failed_spans_record_the_error():
+    tracer = Tracer()
+    try:
+        with tracer.span('route'):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert tracer.spans[0].args['error'] == 'ValueError'
+
+
+def test_payloads_are_only_built_when_logged(caplog):
+    log = logging.getLogger('test_tracing')
+    built = []
+
+    def payload():
+        built.append(True)
+        return {'example': 'x' * 1000}
+
+    log.setLevel(logging.INFO)
+    log_payload(log, "inputs", payload, sample_rate=1)
+    log.setLevel(logging.DEBUG)
+    log_payload(log, "inputs", payload, sample_rate=0)
+    assert not built
+
+    with caplog.at_level(logging.DEBUG, logger='test_tracing'):
+        log_payload(log, "inputs", payload, sample_rate=1, limit=10)
+    assert built and "inputs: example=xxxxxxxxxx... (1000 chars)" in caplog.text
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import shutil
+import yaml
+from benchmarks.fake_llm import FakeChatModel, fake_response, install_fake_llms
+from src.ai_agent import AIAgent
+from src.utils.unified_output import FILE_SEPARATOR, SectionParser, split_sections
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESPONSE = f"""```javascript
+// Route file
+const router = require('express').Router();
+```
+{FILE_SEPARATOR}
+// Controller
+exports.register = async (req, res) => {{}};
+{FILE_SEPARATOR}
+// Service file
+exports.register = async () => {{}};
+"""
+
+
+def test_sections_are_emitted_as_soon_as_their_separator_arrives():
+    seen = []
+    parser = SectionParser(lambda stage, content: seen.append(stage))
+    for i in range(0, len(RESPONSE), 7):
+        parser.feed(RESPONSE[i:i + 7])
+        if 'exports.register = async () =>' in parser.text:
+            assert seen == ['route', 'controller']
+    sections = parser.finish()
+
+    assert seen == ['route', 'controller', 'service']
+    assert sections['route'] == "// Route file\nconst router = require('express').Router();\n"
+    assert sections['service'].startswith("// Service file")
+
+
+def test_unmarked_sections_are_matched_by_position():
+    assert list(split_sections(f"a\n{FILE_SEPARATOR}\nb\n")) == ['route', 'controller']
+    # Without separators or type comments there is nothing to go by
+    assert split_sections("const x = 1;\n") == {}
+
+
+class ServicelessModel(FakeChatModel):
+    def _content(self, messages):
+        if any(FILE_SEPARATOR in str(message.content) for message in messages):
+            return f"// route\nrouter.post();\n{FILE_SEPARATOR}\n// controller\nexports.a = 1;\n"
+        return fake_response(self.output_chars)
+
+
+def test_unified_mode_makes_one_call_and_falls_back_for_missing_sections(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(REPO_ROOT, 'data'), tmp_path / 'data')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    with open('data/route_specs.yaml') as f:
+        spec = yaml.safe_load(f)[0]
+
+    agent = AIAgent(use_cache=False, generation_mode='unified')
+    install_fake_llms(agent, output_chars=200)
+    agent.llm_generation = ServicelessModel(output_chars=200)
+    results, errors = asyncio.run(agent.agenerate_all(spec, force=True))
+    agent.output_sink.flush()
+
+    assert not errors
+    assert results['controller']['content'] == "// controller\nexports.a = 1;\n"
+    # One unified call, then per-file calls for the missing service and for the test suite
+    assert agent.llm_generation.calls == 3
+    assert set(agent.llm_usage) == {'unified', 'service', 'test'}
+    with open('generated/mentorRegisterController.js') as f:
+        assert f.read() == "// controller\nexports.a = 1;\n"
+    assert all(not rebuild for _, rebuild, _ in agent.plan_spec(spec))
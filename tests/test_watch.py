@@ -0,0 +1,75 @@
+import asyncio
+import os
+import shutil
+import yaml
+from types import SimpleNamespace
+from benchmarks.fake_llm import install_fake_llms
+from src.ai_agent import AIAgent
+from src.main import regenerate_stale
+from src.utils.file_watcher import FileWatcher
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_watcher_reports_added_modified_and_removed_files(tmp_path):
+    (tmp_path / 'a.json').write_text('{}')
+    (tmp_path / 'b.json').write_text('{}')
+    watcher = FileWatcher([str(tmp_path)], interval=0.01)
+
+    assert watcher.changes() == set()
+    (tmp_path / 'a.json').write_text('{"changed": true}')
+    (tmp_path / 'b.json').unlink()
+    (tmp_path / 'c.json').write_text('{}')
+    assert watcher.changes() == {str(tmp_path / name) for name in ('a.json', 'b.json', 'c.json')}
+
+    (tmp_path / 'c.json').write_text('{"x": 1}')
+    assert asyncio.run(watcher.wait()) == {str(tmp_path / 'c.json')}
+
+
+def test_example_change_only_invalidates_the_stages_that_use_it(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(REPO_ROOT, 'data'), tmp_path / 'data')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    with open('data/route_specs.yaml') as f:
+        spec = yaml.safe_load(f)[0]
+
+    agent = AIAgent(use_cache=False)
+    install_fake_llms(agent, output_chars=200)
+    asyncio.run(agent.agenerate_all(spec))
+    agent.output_sink.flush()
+
+    with open('data/example_files/example_controller.js', 'a') as f:
+        f.write("\n// Controllers return JSON errors\n")
+    assert 'example_index' in agent.reload_data(['data/example_files/example_controller.js'])
+    # Unrelated data stays loaded
+    assert 'db_schema' in agent.__dict__
+
+    plan = {stage: rebuild for stage, rebuild, _ in agent.plan_spec(spec)}
+    assert plan == {'route': False, 'controller': True, 'service': True, 'swagger': False, 'test': True}
+
+
+def test_each_watch_cycle_only_reports_its_own_calls(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(REPO_ROOT, 'data'), tmp_path / 'data')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    with open('data/route_specs.yaml') as f:
+        specs = yaml.safe_load(f)[:1]
+    agent = AIAgent(use_cache=False, stream_output=True)
+    install_fake_llms(agent, output_chars=200)
+    args = SimpleNamespace(max_concurrent_specs=1)
+
+    async def cycles():
+        await regenerate_stale(agent, specs, args)
+        first = (dict(agent.llm_usage), len(agent.stream_metrics))
+        with open('data/example_files/example_controller.js', 'a') as f:
+            f.write("\n// Controllers return JSON errors\n")
+        agent.reload_data(['data/example_files/example_controller.js'])
+        await regenerate_stale(agent, specs, args)
+        return first
+
+    first_usage, first_streams = asyncio.run(cycles())
+    assert set(first_usage) == {'route', 'controller', 'service', 'test'}
+    # The regenerated controller is unchanged, so the stages after it stay up to date
+    assert list(agent.llm_usage) == ['controller'] and agent.llm_usage['controller']['calls'] == 1
+    assert first_streams > 1 and [metric['stage'] for metric in agent.stream_metrics] == ['controller']
+    assert [usage['stage'] for usage in agent.token_budget.usage] == ['controller']